@@ -0,0 +1,216 @@
+import numpy as np
+from tools.calculators import (
+    DEFAULT_ANNUAL_RETURN, amortization_schedule, roi, cagr, xirr, compound_future_value,
+    sip_future_value, sip_projection, required_monthly_investment, portfolio_analysis,
+)
+from user_context import numeric_column
+
+# Positions listed in the portfolio breakdown
+MAX_POSITIONS_LISTED = 10
+
+
+def currency_symbol(question: str) -> str:
+    text = (question or "").lower()
+    return "$" if "$" in text or "dollar" in text or "usd" in text else "₹"
+
+
+def rounded(values, digits: int = 2):
+    """Plain Python floats (or lists of them) for JSON / MessagePack payloads"""
+    return np.round(np.asarray(values, dtype=np.float64), digits).tolist()
+
+
+def yearly_totals(monthly, months: int):
+    """Sum a monthly series into years (the last year may be partial)"""
+    monthly = np.asarray(monthly)[:months]
+    padded = np.pad(monthly, (0, -len(monthly) % 12))
+    return padded.reshape(-1, 12).sum(axis=1)
+
+
+def assumed_rate(params: dict):
+    """The question's rate, or the default expected return and a note saying so"""
+    if params.get("annual_rate") is not None:
+        return params["annual_rate"], ""
+    return DEFAULT_ANNUAL_RETURN, f" (assuming {DEFAULT_ANNUAL_RETURN:g}% a year, since no rate was given)"
+
+
+def calculate_emi(params: dict, cur: str):
+    principal, rate, months = params["principal"], params["annual_rate"], params["months"]
+    schedule = amortization_schedule(principal, rate, months)
+    interest_by_year = yearly_totals(schedule["interest"], months)
+    principal_by_year = yearly_totals(schedule["principal"], months)
+    balance_by_year = schedule["balance"][np.minimum(np.arange(12, months + 12, 12), months) - 1]
+    first_year_interest_share = interest_by_year[0] / (interest_by_year[0] + principal_by_year[0])
+
+    text = (
+        f"**Monthly EMI: {cur}{schedule['emi']:,.0f}** for a loan of {cur}{principal:,.0f} "
+        f"at {rate:g}% a year over {months} months.\n\n"
+        f"- Total interest: {cur}{schedule['total_interest']:,.0f}\n"
+        f"- Total amount paid: {cur}{schedule['total_payment']:,.0f}\n"
+        f"- In the first year, {first_year_interest_share:.0%} of your payments go to interest\n"
+        f"- Prepaying early in the loan saves the most interest, since that is when the balance is highest"
+    )
+    data = {
+        "emi": rounded(schedule["emi"]),
+        "total_interest": rounded(schedule["total_interest"]),
+        "total_payment": rounded(schedule["total_payment"]),
+        "yearly": [
+            {"year": i + 1, "interest": interest, "principal": paid, "balance": balance}
+            for i, (interest, paid, balance) in enumerate(zip(
+                rounded(interest_by_year), rounded(principal_by_year), rounded(balance_by_year)))
+        ],
+    }
+    return text, data
+
+
+def calculate_roi(params: dict, cur: str):
+    initial, final, months = params["initial"], params["final"], params.get("months")
+    total = float(roi(initial, final))
+    text = f"**Total return: {total:+.2f}%** ({cur}{initial:,.0f} to {cur}{final:,.0f}, a gain of {cur}{final - initial:,.0f})."
+    data = {"roi_pct": round(total, 4), "gain": round(final - initial, 2)}
+    if months:
+        annual = float(cagr(initial, final, months / 12))
+        text += f"\n\n- Annualized (CAGR) over {months / 12:g} years: **{annual:.2f}%** a year"
+        data["cagr_pct"] = round(annual, 4)
+    return text, data
+
+
+def calculate_xirr(params: dict, cur: str):
+    flows = params["cash_flows"]
+    amounts = np.array([flow["amount"] for flow in flows], dtype=np.float64)
+    dates = np.array([flow["date"] for flow in flows], dtype="datetime64[D]")
+    rate = float(xirr(amounts, dates))
+    if np.isnan(rate):
+        raise ValueError("XIRR did not converge for these cash flows")
+
+    invested = float(-amounts[amounts < 0].sum())
+    returned = float(amounts[amounts > 0].sum())
+    text = (
+        f"**XIRR: {rate:.2f}% a year** on {len(flows)} cash flows from {dates[0]} to {dates[-1]}.\n\n"
+        f"- Invested: {cur}{invested:,.0f}\n"
+        f"- Withdrawn and current value: {cur}{returned:,.0f}\n"
+        f"- Gain: {cur}{returned - invested:,.0f}\n"
+        f"- XIRR accounts for when each amount went in, so it is the fair annual return for staggered investments"
+    )
+    data = {"xirr_pct": round(rate, 4), "invested": round(invested, 2), "returned": round(returned, 2)}
+    return text, data
+
+
+def project_investment(params: dict, cur: str):
+    amount, months = params["amount"], params["months"]
+    rate, note = assumed_rate(params)
+    years = np.arange(1, int(np.ceil(months / 12)) + 1)
+    if params.get("monthly"):
+        projection = sip_projection(amount, rate, years[-1])
+        invested, values = projection["invested"], projection["value"]
+        final_value = float(sip_future_value(amount, rate, months))
+        total_invested = amount * months
+        text = f"**A monthly SIP of {cur}{amount:,.0f} for {months} months could grow to about {cur}{final_value:,.0f}**{note}."
+    else:
+        invested, values = np.full(len(years), amount), compound_future_value(amount, rate, years)
+        final_value = float(compound_future_value(amount, rate, months / 12))
+        total_invested = amount
+        text = f"**{cur}{amount:,.0f} invested for {months / 12:g} years could grow to about {cur}{final_value:,.0f}**{note}, compounded monthly."
+    text += (
+        f"\n\n- Amount invested: {cur}{total_invested:,.0f}\n"
+        f"- Estimated gains: {cur}{final_value - total_invested:,.0f}\n"
+        f"- Returns are not guaranteed; market-linked investments can fall as well as rise"
+    )
+    data = {
+        "annual_rate": rate,
+        "future_value": round(final_value, 2),
+        "invested": round(total_invested, 2),
+        "yearly": [
+            {"year": int(year), "invested": inv, "value": value}
+            for year, inv, value in zip(years, rounded(invested), rounded(values))
+        ],
+    }
+    return text, data
+
+
+def set_goal(params: dict, cur: str):
+    target, months, current = params["target"], params["months"], params.get("current_savings") or 0.0
+    rate, note = assumed_rate(params)
+    monthly = float(required_monthly_investment(target, rate, months, current))
+    lump_sum = max(0.0, float(target / compound_future_value(1, rate, months / 12)) - current)
+    text = f"**To reach {cur}{target:,.0f} in {months / 12:g} years, invest about {cur}{monthly:,.0f} a month**{note}."
+    if current:
+        text += f"\n\n- This counts your existing {cur}{current:,.0f} growing at the same rate"
+    text += (
+        f"\n- Alternatively, a one-time investment of about {cur}{lump_sum:,.0f} today gets you there"
+        f"\n- Total you would put in monthly: {cur}{monthly * months:,.0f}"
+    )
+    data = {
+        "annual_rate": rate,
+        "required_monthly": round(monthly, 2),
+        "required_lump_sum": round(lump_sum, 2),
+        "target": target,
+        "months": months,
+    }
+    return text, data
+
+
+def analyze_portfolio(user_context: dict, cur: str):
+    holdings = [h for h in (user_context or {}).get("holdings") or [] if isinstance(h, dict)]
+    values = numeric_column([h.get("currentValue", h.get("value")) for h in holdings])
+    costs = numeric_column([h.get("quantity") for h in holdings]) * numeric_column([h.get("avgPrice") for h in holdings])
+    analysis = portfolio_analysis(values, costs)
+    if analysis["total_value"] <= 0:
+        raise ValueError("Holdings have no current value")
+
+    weights = analysis["weights"]
+    top = np.argsort(weights)[::-1][:MAX_POSITIONS_LISTED]
+    names = [str(holdings[i].get("name") or holdings[i].get("symbol") or f"Holding {i + 1}") for i in top]
+    text = (
+        f"**Portfolio value: {cur}{analysis['total_value']:,.0f}** across {len(holdings)} holdings.\n\n"
+        f"- Largest position: {names[0]} at {analysis['top_weight']:.1%}\n"
+        f"- Concentration (HHI): {analysis['hhi']:.3f}, like holding {analysis['effective_holdings']:.1f} equal-sized positions\n"
+    )
+    if not np.isnan(analysis["gain_pct"]):
+        text += f"- Unrealized gain: {cur}{analysis['gain']:,.0f} ({analysis['gain_pct']:+.1f}%) on {cur}{analysis['invested']:,.0f} invested\n"
+    if analysis["top_weight"] > 0.25 or analysis["effective_holdings"] < 5:
+        text += "- Your portfolio is concentrated; spreading it across more holdings or asset classes would reduce risk\n"
+    else:
+        text += "- Your holdings are reasonably spread out; review the mix across asset classes as well\n"
+    data = {
+        "total_value": rounded(analysis["total_value"]),
+        "hhi": rounded(analysis["hhi"], 4),
+        "effective_holdings": rounded(analysis["effective_holdings"]),
+        "top_weight": rounded(analysis["top_weight"], 4),
+        "invested": rounded(analysis["invested"]),
+        "gain": rounded(analysis["gain"]),
+        "positions": [{"name": name, "weight": round(float(weights[i]), 4)} for name, i in zip(names, top)],
+    }
+    return text, data
+
+
+CALCULATORS = {
+    "calculate_emi": calculate_emi,
+    "calculate_roi": calculate_roi,
+    "calculate_xirr": calculate_xirr,
+    "project_investment": project_investment,
+    "set_goal": set_goal,
+}
+
+
+def run_calculator(state: dict) -> dict:
+    """
+    Answers the planner's calculator action exactly from the parsed inputs.
+    Raises ValueError for inputs the calculators cannot use.
+    """
+    question = state.get("question", "")
+    action = state.get("next_step")
+    cur = currency_symbol(question)
+    if action == "analyze_portfolio":
+        text, data = analyze_portfolio(state.get("userContext"), cur)
+    elif action in CALCULATORS:
+        text, data = CALCULATORS[action](state.get("calculation") or {}, cur)
+    else:
+        raise ValueError(f"Unknown calculator action '{action}'")
+    return {
+        "question": question,
+        "action": action,
+        "result": text,
+        "response": text,
+        "structuredData": dict(data, type=action, inputs=state.get("calculation") or {}),
+        "final": True
+    }
@@ -1,12 +1,287 @@
+import re
+import time
+import numpy as np
+
+# Actions answered exactly by the calculator node instead of retrieval + LLM
+CALCULATOR_ACTIONS = {"calculate_emi", "calculate_roi", "calculate_xirr", "project_investment", "set_goal",
+                      "analyze_portfolio"}
+# Actions answered by the Monte Carlo simulation node
+SIMULATION_ACTIONS = {"simulate_retirement", "simulate_goal"}
+
+AMOUNT_UNITS = {
+    "k": 1e3, "thousand": 1e3,
+    "lakh": 1e5, "lakhs": 1e5, "lac": 1e5, "lacs": 1e5,
+    "million": 1e6, "mn": 1e6,
+    "crore": 1e7, "crores": 1e7, "cr": 1e7,
+    "billion": 1e9, "bn": 1e9,
+}
+UNIT_PATTERN = "|".join(sorted(AMOUNT_UNITS, key=len, reverse=True))
+MONEY_PATTERN = r"(?P<currency>₹|rs\.?|inr|\$)?\s*(?P<number>\d+(?:,\d+)*(?:\.\d+)?)(?:\s*(?P<unit>" + UNIT_PATTERN + r"))?\b"
+MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"])}
+DATE_PATTERN = (
+    r"\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/-]\d{1,2}[/-]\d{4}"
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*,?\s+\d{4}"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+(?:\d{1,2}(?:st|nd|rd|th)?,?\s+)?\d{4}"
+)
+
+RATE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:%|percent\b|per cent\b)")
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)[\s-]*(years?|yrs?|months?|mos?)\b")
+TARGET_YEAR_RE = re.compile(r"\b(?:by|in|until|till)\s+(20\d\d)\b")
+AMOUNT_RE = re.compile(MONEY_PATTERN)
+# Bare numbers below this (no currency sign or unit) are counts or ages, not money
+MIN_BARE_AMOUNT = 100
+# Ages ("25 years old", "aged 5, 8 and 12") and counts of things ("3 kids") are not amounts or durations
+AGE_RE = re.compile(r"\b\d{1,3}[\s-]*(?:years?|yrs?)[\s-]*old\b|\b(?:aged?|ages)\s+(?:of\s+)?\d{1,3}(?:\s*(?:,|and|&)\s*\d{1,3})*")
+COUNT_RE = re.compile(
+    r"\b\d+\s+(?:kids?|children|child|sons?|daughters?|people|persons?|members?|dependents?|cars?|houses?"
+    r"|flats?|properties|funds?|stocks?|shares?|units?|cards?|credit cards?|accounts?|policies|times?|days?|weeks?)\b"
+)
+# What an amount is, from the words just before it: earnings, money already saved, or a goal
+INCOME_CUE_RE = re.compile(r"\bsalary\b|\bincome\b|\bearn\w*|\btake[- ]home\b|\bctc\b|\bi make\b|\bpaid\b|\bstipend\b")
+SAVINGS_CUE_RE = re.compile(r"\bi (?:already |currently )?have\b|\bsaved\b|\bsavings\b|\bexisting\b|\bcurrent(?:ly)?\b|\balready\b|\bcorpus is\b")
+SAVINGS_AFTER_RE = re.compile(r"^\s*(?:saved|savings|in savings|already saved|in (?:my )?(?:bank|account|fd|mutual funds?))\b")
+TARGET_CUE_RE = re.compile(r"\bgoal\b|\btarget\b|\breach(?:ing)?\b|\baccumulate\b|\bbuild\b|\bto have\b|\bwill i have\b|\bcorpus of\b|\bneed\b|\bbecome\b|\bgrow to\b")
+MONTHLY_AFTER_RE = re.compile(r"^\s*(?:per month|a month|monthly|every month|each month|/\s*month|pm)\b")
+MONTHLY_BEFORE_RE = re.compile(r"(?:monthly|\bsip of|\bsip)\s*$")
+CLAUSE_BREAK_RE = re.compile(r"[.;!?]|,\s")
+
+EMI_RE = re.compile(r"\bemi\b|monthly (?:payment|installment|instalment)|\binstall?ments?\b|\binstalments?\b|(?:loan|mortgage) (?:payment|repayment)")
+LOAN_RE = re.compile(r"\bloan\b|\bmortgage\b|\bborrow")
+GOAL_RE = re.compile(r"\bgoal\b|\btarget\b|need to (?:save|invest)|how much (?:should|do|must|would|will) i (?:need to )?(?:save|invest)|to (?:reach|accumulate|build|have)\b")
+PROJECTION_RE = re.compile(r"\bsip\b|compound|\binvest(?:ing|ed)?\b.*\b(?:grow|become|worth|get|value)|(?:what|how much) will\b")
+ROI_RE = re.compile(r"\broi\b|\bcagr\b|return on|\breturns?\b.*\b(?:made|make|got|get|earn)|\bnow worth\b|\bgrew\b|\bbecame\b")
+XIRR_RE = re.compile(r"\bx?irr\b")
+PORTFOLIO_RE = re.compile(r"portfolio|holdings|diversif|allocation|concentrat|rebalanc")
+# Questions a formula cannot settle: inflation erodes rather than grows money, and
+# comparisons (prepay or invest, rent vs buy) need advice, not one number
+INFLATION_RE = re.compile(r"inflation|purchasing power|real (?:value|return)")
+COMPARISON_RE = re.compile(
+    r"\bvs\.?\b|\bversus\b|\bprepay|\bpay (?:it |the loan |my loan )?off\b|\bforeclos|\bwhich (?:is|one|option)\b"
+    r"|\bbetter (?:to|option|off|than)\b|\bcompare\b|\bshould i\b.*\bor\b|\bor (?:should|invest|prepay|pay|buy|save|keep|put)\b"
+)
+SIMULATION_RE = re.compile(r"monte carlo|simulat|\bchances?\b|probabilit|\blikely\b|\bodds\b|on track|enough (?:to|for)|can i (?:afford to )?retire|will i (?:have|be able|reach|make it)")
+RETIRE_RE = re.compile(r"\bretir")
+RETIREMENT_AGE_RE = re.compile(r"\bretir\w*\s+(?:at|by)\s+(?:the\s+)?(?:age\s+)?(?:of\s+)?(\d{2})\b")
+
+# Dated cash flows for XIRR: "invested 50,000 on 2021-04-01", "withdrew 1 lakh in march 2023";
+# "... and 20,000 on 2022-01-10" repeats the previous verb
+CASH_FLOW_RE = re.compile(
+    r"(?:(?P<verb>invest\w*|put in|put|bought|added|add|deposit\w*|paid|withdr\w*|redeem\w*|sold|received|got)"
+    r"\s+(?:another\s+|a further\s+|back\s+)?|\band\s+)" + MONEY_PATTERN + r"\s+(?:on|in|dated)\s+(?P<date>" + DATE_PATTERN + r")"
+)
+# The value at the end: "now worth 2 lakh" (today) or "worth 2 lakh on 2024-03-31"
+FINAL_VALUE_RE = re.compile(
+    r"(?:worth|value (?:is|was)|valued at)\s+" + MONEY_PATTERN + r"(?:\s+(?:on|as of|in)\s+(?P<date>" + DATE_PATTERN + r"))?"
+)
+INFLOW_RE = re.compile(r"withdr|redeem|sold|received|got")
+
+
+def parse_rate(text: str):
+    """First percentage in the text, e.g. 8.5 for '8.5%'"""
+    match = RATE_RE.search(text)
+    return float(match.group(1)) if match else None
+
+
+def strip_non_amounts(text: str) -> str:
+    """Remove ages and counts, which look like amounts or durations"""
+    return COUNT_RE.sub(" ", AGE_RE.sub(" ", text))
+
+
+def parse_months(text: str):
+    """Duration in months from '5 years', '36 months' or 'by 2035'"""
+    text = strip_non_amounts(text)
+    match = DURATION_RE.search(text)
+    if match:
+        value, unit = float(match.group(1)), match.group(2)
+        return int(round(value * 12)) if unit.startswith("y") else int(round(value))
+    match = TARGET_YEAR_RE.search(text)
+    if match:
+        years = int(match.group(1)) - time.localtime().tm_year
+        return years * 12 if years > 0 else None
+    return None
+
+
+def money_value(number: str, unit: str) -> float:
+    return float(number.replace(",", "")) * AMOUNT_UNITS.get(unit or "", 1)
+
+
+def parse_money(text: str) -> list:
+    """
+    Money amounts in order of appearance, with lakh/crore/k/million expanded.
+    Each is a dict with its value and what the nearby words say it is:
+    income (salary, earnings), monthly, savings (already saved) or target.
+    """
+    text = strip_non_amounts(TARGET_YEAR_RE.sub(" ", DURATION_RE.sub(" ", RATE_RE.sub(" ", text))))
+    amounts = []
+    previous_end = 0
+    for match in AMOUNT_RE.finditer(text):
+        value = money_value(match.group("number"), match.group("unit"))
+        explicit = match.group("currency") or match.group("unit") or re.match(r"\s*(?:rupees|dollars|inr|usd)\b", text[match.end():])
+        if value <= 0 or (not explicit and value < MIN_BARE_AMOUNT):
+            continue
+        # Words since the previous amount or clause break describe this amount
+        before = text[previous_end:match.start()]
+        breaks = list(CLAUSE_BREAK_RE.finditer(before))
+        if breaks:
+            before = before[breaks[-1].end():]
+        after = text[match.end():match.end() + 30]
+        previous_end = match.end()
+        amounts.append({
+            "value": value,
+            "income": bool(INCOME_CUE_RE.search(before)),
+            "monthly": bool(MONTHLY_AFTER_RE.search(after) or MONTHLY_BEFORE_RE.search(before)),
+            "savings": bool(SAVINGS_CUE_RE.search(before) or SAVINGS_AFTER_RE.search(after)),
+            "target": bool(TARGET_CUE_RE.search(before)),
+        })
+    return amounts
+
+
+def parse_amounts(text: str) -> list:
+    """Values of the money amounts in the text, leaving out salary and other income"""
+    return [amount["value"] for amount in parse_money(text) if not amount["income"]]
+
+
+def parse_date(text: str):
+    """datetime64[D] for '2021-04-01', '01/04/2021', '1 april 2021', 'april 1, 2021' or 'april 2021'"""
+    text = text.replace(",", " ")
+    match = re.fullmatch(r"(\d{4})-(\d{1,2})-(\d{1,2})", text)
+    if match:
+        year, month, day = (int(part) for part in match.groups())
+    elif re.fullmatch(r"\d{1,2}[/-]\d{1,2}[/-]\d{4}", text):
+        day, month, year = (int(part) for part in re.split(r"[/-]", text))
+    else:
+        parts = re.sub(r"(\d)(?:st|nd|rd|th)\b", r"\1", text).split()
+        month = next(MONTH_NAMES[part[:3]] for part in parts if part[:3] in MONTH_NAMES)
+        numbers = [int(part) for part in parts if part.isdigit()]
+        year = numbers[-1]
+        day = numbers[0] if len(numbers) > 1 else 1
+    # Raises ValueError for impossible dates such as 31/02/2021
+    return np.datetime64(f"{year:04d}-{month:02d}-{day:02d}", "D")
+
+
+def parse_cash_flows(text: str):
+    """
+    Dated cash flows for XIRR, investments negative and withdrawals or the
+    final value positive, sorted by date. None unless every flow has a valid
+    date and there is at least one investment followed by an inflow.
+    """
+    flows = []
+    verb = None
+    try:
+        for match in CASH_FLOW_RE.finditer(text):
+            verb = match.group("verb") or verb
+            if verb is None:
+                return None
+            value = money_value(match.group("number"), match.group("unit"))
+            sign = 1 if INFLOW_RE.search(verb) else -1
+            flows.append((parse_date(match.group("date")), sign * value))
+        final = FINAL_VALUE_RE.search(text)
+        if final:
+            date = parse_date(final.group("date")) if final.group("date") else np.datetime64(time.strftime("%Y-%m-%d"), "D")
+            flows.append((date, money_value(final.group("number"), final.group("unit"))))
+    except (ValueError, StopIteration, IndexError):
+        return None
+    flows.sort(key=lambda flow: flow[0])
+    if len(flows) < 2 or flows[0][1] >= 0 or not any(amount > 0 for _, amount in flows):
+        return None
+    return [{"date": str(date), "amount": amount} for date, amount in flows]
+
+
+def has_holdings(user_context) -> bool:
+    return bool(isinstance(user_context, dict) and user_context.get("holdings"))
+
+
+def detect_action(question: str, user_context=None):
+    """
+    Pick the calculator action for a numeric question and extract its inputs.
+    Only an explicit calculation with every input parsed is answered by a
+    formula; anything else returns ("use_rag", {}) so it gets retrieval + LLM.
+    """
+    text = (question or "").lower()
+    retirement_age = RETIREMENT_AGE_RE.search(text)
+    money = [amount for amount in parse_money(RETIREMENT_AGE_RE.sub(" ", text)) if not amount["income"]]
+    amounts = [amount["value"] for amount in money]
+    rate = parse_rate(text)
+    months = parse_months(text)
+
+    if INFLATION_RE.search(text) or COMPARISON_RE.search(text):
+        return "use_rag", {}
+
+    if SIMULATION_RE.search(text) and (RETIRE_RE.search(text) or (amounts and months)):
+        # A per-month amount is a contribution, never the goal
+        contributions = [amount for amount in money if amount["monthly"]]
+        lump_sums = [amount for amount in money if not amount["monthly"]]
+        targets = [amount for amount in lump_sums if amount["target"]]
+        savings = [amount for amount in lump_sums if amount["savings"] and not amount["target"]]
+        unlabelled = [amount for amount in lump_sums if not amount["target"] and not amount["savings"]]
+        # "retire with 2 crore" or "2 crore ... if I invest 20000 a month": the other sum is the goal
+        if not targets and len(unlabelled) == 1 and (RETIRE_RE.search(text) or contributions or savings):
+            targets, unlabelled = unlabelled, []
+        if unlabelled or len(contributions) > 1 or len(savings) > 1 or len(targets) > 1:
+            return "use_rag", {}
+        params = {
+            "target": targets[0]["value"] if targets else None,
+            "months": months,
+            "annual_rate": rate,
+            "current_savings": savings[0]["value"] if savings else None,
+            "monthly_contribution": contributions[0]["value"] if contributions else None,
+            "retirement_age": int(retirement_age.group(1)) if retirement_age else None,
+        }
+        return ("simulate_retirement" if RETIRE_RE.search(text) else "simulate_goal"), params
+
+    if XIRR_RE.search(text):
+        cash_flows = parse_cash_flows(text)
+        return ("calculate_xirr", {"cash_flows": cash_flows}) if cash_flows else ("use_rag", {})
+
+    if EMI_RE.search(text) and LOAN_RE.search(text):
+        if len(amounts) == 1 and rate is not None and months:
+            return "calculate_emi", {"principal": amounts[0], "annual_rate": rate, "months": months}
+        return "use_rag", {}
+
+    if GOAL_RE.search(text):
+        targets = [amount for amount in money if amount["target"]] or [
+            amount for amount in money if not amount["savings"] and not amount["monthly"]]
+        savings = [amount for amount in money if amount["savings"] and all(amount is not t for t in targets)]
+        explained = len(targets) + len(savings) == len(money)
+        if len(targets) == 1 and len(savings) <= 1 and explained and months:
+            return "set_goal", {"target": targets[0]["value"], "months": months, "annual_rate": rate,
+                                "current_savings": savings[0]["value"] if savings else 0.0}
+        return "use_rag", {}
+
+    if ROI_RE.search(text):
+        if len(amounts) == 2:
+            return "calculate_roi", {"initial": amounts[0], "final": amounts[1], "months": months}
+        return "use_rag", {}
+
+    if PROJECTION_RE.search(text) and len(amounts) == 1 and months:
+        return "project_investment", {
+            "amount": amounts[0],
+            "monthly": money[0]["monthly"] or bool(re.search(r"\bsip\b", text)),
+            "annual_rate": rate,
+            "months": months,
+        }
+
+    if PORTFOLIO_RE.search(text) and has_holdings(user_context):
+        return "analyze_portfolio", {}
+
+    return "use_rag", {}
+
+
 def run_planner(state: dict) -> dict:
     """
     Accepts a 'question' as input and returns a plan, next_step, and end=True to stop the graph after one cycle.
-    Always includes 'question' in the returned state.
+    Always includes 'question' in the returned state. Numeric questions get a calculator
+    or simulation next_step and their parsed inputs under 'calculation'.
     """
     question = state.get("question", "")
-    return {
+    action, params = detect_action(question, state.get("userContext"))
+    result = {
         "question": question,
         "plan": f"Determine financial action for: {question}",
-        "next_step": "tool_use",
+        "next_step": action,
         "end": True  # Important: this stops the graph to prevent infinite recursion
-    }
\ No newline at end of file
+    }
+    if action in CALCULATOR_ACTIONS or action in SIMULATION_ACTIONS:
+        result["calculation"] = params
+    return result
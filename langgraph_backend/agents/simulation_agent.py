@@ -0,0 +1,144 @@
+import numpy as np
+from tools.monte_carlo import RISK_PROFILES, risk_profile, simulate
+from agents.calculator_agent import currency_symbol, rounded
+from user_context import numeric_column, nan_mean, to_float
+
+RETIREMENT_AGE = 60
+# Horizon when the question gives no duration and the profile has no age
+DEFAULT_HORIZON_YEARS = 20
+# Retirement corpus as a multiple of annual expenses (the 4% withdrawal rule)
+CORPUS_MULTIPLE = 25
+# Share of income assumed saved, and spent, when there is no monthly data
+DEFAULT_SAVINGS_RATE = 0.2
+DEFAULT_EXPENSE_RATIO = 0.7
+
+
+def profile_number(value) -> float:
+    return float(value) if isinstance(value, (int, float)) else to_float(value)
+
+
+def profile_inputs(user_context) -> dict:
+    """Starting value, monthly cash flows, age and risk profile from the userContext"""
+    user_context = user_context if isinstance(user_context, dict) else {}
+    user_profile = user_context.get("userProfile") or {}
+    detailed_profile = user_context.get("detailedProfile") or {}
+
+    holdings = [h for h in user_context.get("holdings") or [] if isinstance(h, dict)]
+    holdings_value = np.nansum(numeric_column([h.get("currentValue", h.get("value")) for h in holdings]))
+    retirement_savings = profile_number(detailed_profile.get("retirementSavings"))
+
+    rows = [m for m in user_context.get("monthlyData") or [] if isinstance(m, dict)]
+    income = numeric_column([m.get("income") for m in rows])
+    expenses = numeric_column([m.get("expenses") for m in rows])
+    savings = numeric_column([m.get("savings") for m in rows])
+    savings = np.where(np.isnan(savings), income - expenses, savings)
+    # The profile form asks for monthly income
+    profile_income = profile_number(user_profile.get("income"))
+
+    monthly_savings = nan_mean(savings) if (~np.isnan(savings)).any() else None
+    monthly_expenses = nan_mean(expenses) if (~np.isnan(expenses)).any() else None
+    if monthly_savings is None and profile_income > 0:
+        monthly_savings = profile_income * DEFAULT_SAVINGS_RATE
+    if monthly_expenses is None and profile_income > 0:
+        monthly_expenses = profile_income * DEFAULT_EXPENSE_RATIO
+
+    return {
+        "initial": float(holdings_value) + (retirement_savings if retirement_savings > 0 else 0.0),
+        "monthly_savings": max(monthly_savings, 0.0) if monthly_savings is not None else None,
+        "monthly_expenses": monthly_expenses if monthly_expenses and monthly_expenses > 0 else None,
+        "age": profile_number(user_profile.get("age")),
+        "risk": risk_profile(detailed_profile.get("riskTolerance")),
+    }
+
+
+def build_plan(state: dict) -> dict:
+    """
+    Combine the numbers parsed from the question with the user's profile.
+    Numbers in the question win; the profile fills in the rest.
+    """
+    params = state.get("calculation") or {}
+    profile = profile_inputs(state.get("userContext"))
+    retirement = state.get("next_step") == "simulate_retirement"
+
+    months = params.get("months")
+    if not months and retirement and profile["age"] > 0:
+        months = int(max((params.get("retirement_age") or RETIREMENT_AGE) - profile["age"], 1) * 12)
+    months = months or DEFAULT_HORIZON_YEARS * 12
+
+    target = params.get("target")
+    if not target and retirement and profile["monthly_expenses"]:
+        target = profile["monthly_expenses"] * 12 * CORPUS_MULTIPLE
+    if not target:
+        raise ValueError("No target in the question and none can be derived from the profile")
+
+    initial = params["current_savings"] if params.get("current_savings") is not None else profile["initial"]
+    contribution = params.get("monthly_contribution")
+    if contribution is None:
+        contribution = profile["monthly_savings"] or 0.0
+    if initial <= 0 and contribution <= 0:
+        raise ValueError("No savings, holdings or contributions to simulate")
+
+    annual_return, volatility = RISK_PROFILES[profile["risk"]]
+    if params.get("annual_rate") is not None:
+        annual_return = params["annual_rate"]
+    return {
+        "initial": initial,
+        "monthly_contribution": contribution,
+        "months": months,
+        "annual_return": annual_return,
+        "volatility": volatility,
+        "target": target,
+        "risk": profile["risk"],
+    }
+
+
+def run_simulation(state: dict) -> dict:
+    """
+    Answers retirement and goal questions with a Monte Carlo projection.
+    Raises ValueError when there is nothing to project or no target to reach.
+    """
+    question = state.get("question", "")
+    action = state.get("next_step")
+    cur = currency_symbol(question)
+    plan = build_plan(state)
+    risk = plan.pop("risk")
+    result = simulate(**plan)
+    years = result["months"] / 12
+    p = result["percentiles"]
+
+    headline = (f"**Chance of reaching {cur}{result['target']:,.0f} in {years:g} years: "
+                f"{result['success_probability']:.0%}**")
+    text = (
+        f"{headline}\n\n"
+        f"- Median outcome: {cur}{p['p50']:,.0f}; 8 in 10 outcomes fall between "
+        f"{cur}{p['p10']:,.0f} and {cur}{p['p90']:,.0f}\n"
+        f"- You would invest {cur}{result['invested']:,.0f} in total: {cur}{result['initial']:,.0f} today plus "
+        f"{cur}{result['monthly_contribution']:,.0f} a month\n"
+        f"- Chance of ending with less than you invested: {result['below_invested_probability']:.0%}\n"
+        f"- Assumes {result['annual_return']:g}% average yearly returns with {result['volatility']:g}% volatility "
+        f"({risk} risk profile), across {result['paths']:,} simulated market paths"
+    )
+    if action == "simulate_retirement" and not (state.get("calculation") or {}).get("target"):
+        text += f"\n- Target corpus is {CORPUS_MULTIPLE}x your annual expenses, enough to withdraw about 4% a year"
+
+    data = {
+        "paths": result["paths"],
+        "seed": result["seed"],
+        "annual_return": result["annual_return"],
+        "volatility": result["volatility"],
+        "invested": rounded(result["invested"]),
+        "target": rounded(result["target"]),
+        "success_probability": result["success_probability"],
+        "below_invested_probability": result["below_invested_probability"],
+        "mean": rounded(result["mean"]),
+        "percentiles": {key: rounded(value) for key, value in p.items()},
+        "yearly": [{key: rounded(value) for key, value in row.items()} for row in result["yearly"]],
+    }
+    return {
+        "question": question,
+        "action": action,
+        "result": text,
+        "response": text,
+        "structuredData": dict(data, type=action, inputs=dict(plan, risk=risk)),
+        "final": True
+    }
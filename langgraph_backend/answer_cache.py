@@ -0,0 +1,208 @@
+"""
+In-process answer cache for the advice workflow.
+
+Answers are keyed on the normalized question plus a fingerprint of the
+summarized user context, so personalized answers are never shared across
+different profiles. Entries expire after a TTL and the least recently used
+entry is evicted when the cache is full. Optionally, a question that misses
+the exact lookup is matched against cached questions for the same profile
+by embedding similarity, so paraphrases can reuse an answer.
+"""
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from metrics import increment
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE") or 1024)
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL") or 3600)
+# Cosine similarity needed for a paraphrase hit; 0 disables semantic lookup
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY") or 0)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    question = re.sub(r"[^\w\s]", " ", (question or "").lower())
+    return " ".join(question.split())
+
+
+def profile_fingerprint(user_data_summary: str) -> str:
+    """Short hash of the summarized user context; empty for anonymous users"""
+    if not user_data_summary:
+        return ""
+    return hashlib.sha256(user_data_summary.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl_seconds: int = ANSWER_CACHE_TTL,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY, embed_fn=None, embed_many_fn=None):
+        """
+        embed_fn(text) -> vector and embed_many_fn(texts) -> vectors are only
+        needed for semantic lookups. Without either, both come from
+        GeminiEmbeddings on first use; with only embed_fn, batches call it
+        once per text.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._embed_fn = embed_fn
+        self._embed_many_fn = embed_many_fn
+        # Least recently used first
+        self._entries = OrderedDict()
+        # Soonest to expire first; the TTL is fixed, so this is write order.
+        # Times are monotonic, so a wall-clock jump cannot expire or revive entries
+        self._expiry = OrderedDict()
+        # Embeddings of the cached questions per profile, for semantic lookups
+        self._embeddings = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def _embedders(self):
+        if self._embed_fn is None and self._embed_many_fn is None:
+            from tools.rag_tool import GeminiEmbeddings
+            embeddings = GeminiEmbeddings()
+            self._embed_fn, self._embed_many_fn = embeddings.embed_query, embeddings.embed_queries
+        embed_one = self._embed_fn or (lambda text: self._embed_many_fn([text])[0])
+        embed_many = self._embed_many_fn or (lambda texts: [self._embed_fn(text) for text in texts])
+        return embed_one, embed_many
+
+    @staticmethod
+    def _normalize_rows(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def _embed(self, text: str):
+        embed_one, _ = self._embedders()
+        return self._normalize_rows(embed_one(text))[0]
+
+    def _embed_many(self, texts: list) -> np.ndarray:
+        _, embed_many = self._embedders()
+        return self._normalize_rows(embed_many(texts))
+
+    def _remove(self, key):
+        del self._entries[key]
+        del self._expiry[key]
+        profile = self._embeddings.get(key[1])
+        if profile is not None:
+            profile.pop(key, None)
+            if not profile:
+                del self._embeddings[key[1]]
+
+    def _expire(self, now: float):
+        # Stops at the first live entry, so the cost is the number of expired entries
+        while self._expiry:
+            key, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(key)
+            self._stats["expirations"] += 1
+
+    def _hit(self, key, stat: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self._stats[stat] += 1
+        increment(f"answer_cache_{stat}")
+        return entry["value"]
+
+    def get(self, question: str, fingerprint: str = ""):
+        """Return the cached value for this question and profile, or None"""
+        return self.get_many([(question, fingerprint)])[0]
+
+    def get_many(self, requests) -> list:
+        """
+        get() for many (question, fingerprint) pairs, in order. Repeated pairs
+        are looked up once, and the questions left for a semantic lookup are
+        embedded in one batched call.
+        """
+        keys = [(normalize_question(question), fingerprint) for question, fingerprint in requests]
+        found = {}
+        candidates = {}
+        with self._lock:
+            self._expire(time.monotonic())
+            for key in dict.fromkeys(keys):
+                value = self._hit(key, "hits")
+                if value is not None:
+                    found[key] = value
+                elif self.semantic_enabled and self._embeddings.get(key[1]):
+                    candidates[key] = list(self._embeddings[key[1]].items())
+
+        if candidates:
+            texts = list(dict.fromkeys(normalized for normalized, _ in candidates))
+            try:
+                queries = dict(zip(texts, self._embed_many(texts)))
+            except Exception as e:
+                print(f"Answer cache embedding failed: {e}")
+                queries = {}
+            for key, profile in candidates.items():
+                if key[0] not in queries:
+                    continue
+                scores = np.stack([embedding for _, embedding in profile]) @ queries[key[0]]
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    with self._lock:
+                        value = self._hit(profile[best][0], "semantic_hits")
+                    if value is not None:
+                        found[key] = value
+
+        misses = len(set(keys)) - len(found)
+        if misses:
+            with self._lock:
+                self._stats["misses"] += misses
+            increment("answer_cache_misses", misses)
+        return [found.get(key) for key in keys]
+
+    def put(self, question: str, fingerprint: str, value: dict):
+        normalized = normalize_question(question)
+        embedding = None
+        if self.semantic_enabled:
+            try:
+                embedding = self._embed(normalized)
+            except Exception as e:
+                print(f"Answer cache embedding failed: {e}")
+        key = (normalized, fingerprint)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"value": value, "embedding": embedding}
+            self._expiry[key] = time.monotonic() + self.ttl_seconds
+            if embedding is not None:
+                self._embeddings.setdefault(fingerprint, {})[key] = embedding
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+            self._embeddings.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["semantic_hits"] + self._stats["misses"]
+            hits = self._stats["hits"] + self._stats["semantic_hits"]
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl_seconds,
+                semantic_threshold=self.similarity_threshold,
+                hit_rate=round(hits / lookups, 4) if lookups else 0.0,
+            )
+
+
+_answer_cache = AnswerCache()
+
+
+def get_answer_cache() -> AnswerCache:
+    return _answer_cache
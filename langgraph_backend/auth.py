@@ -2,6 +2,11 @@
 Firebase Authentication Module for Backend Security
 """
 import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
 from functools import wraps
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -35,6 +40,158 @@ except Exception as e:
 # Security dependency
 security = HTTPBearer(auto_error=False)
 
+# Verified-token cache settings
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE") or 10000)
+# A cached token is re-verified after this many seconds even if it has not
+# expired, which bounds how long a revoked session keeps working
+TOKEN_CACHE_MAX_TTL = int(os.getenv("AUTH_TOKEN_CACHE_MAX_TTL") or 300)
+# Also ask Firebase whether the session was revoked (one network call per cache miss)
+CHECK_REVOKED = os.getenv("AUTH_CHECK_REVOKED", "false").lower() == "true"
+# How often Google's token signing certificates are refreshed in the background
+CERT_REFRESH_INTERVAL = int(os.getenv("AUTH_CERT_REFRESH_INTERVAL") or 1800)
+# Where Google publishes the ID token signing certificates
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+# Firebase ID tokens live for an hour, so older revocations no longer matter
+ID_TOKEN_LIFETIME = 3600
+
+
+class TokenCache:
+    """
+    Bounded LRU of decoded ID tokens, keyed by a hash of the raw token so
+    tokens themselves are never kept in memory. Entries expire at the
+    token's exp claim or after TOKEN_CACHE_MAX_TTL, whichever is first.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, max_ttl: int = TOKEN_CACHE_MAX_TTL):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()
+        # uid -> time of the last revocation seen by this process
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            decoded_token, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return decoded_token
+
+    def put(self, token: str, decoded_token: dict):
+        expires_at = min(decoded_token.get("exp", 0), time.time() + self.max_ttl)
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[self._key(token)] = (decoded_token, expires_at)
+            self._entries.move_to_end(self._key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, uid: str) -> int:
+        """
+        Drop every cached token belonging to uid and reject their tokens
+        issued before now; returns how many cached tokens were dropped.
+        """
+        now = time.time()
+        with self._lock:
+            keys = [key for key, (decoded, _) in self._entries.items() if decoded.get("uid") == uid]
+            for key in keys:
+                del self._entries[key]
+            self._revoked = {u: at for u, at in self._revoked.items() if at > now - ID_TOKEN_LIFETIME}
+            self._revoked[uid] = now
+            return len(keys)
+
+    def is_revoked(self, decoded_token: dict) -> bool:
+        """Whether the token was issued before its user's sessions were revoked in this process"""
+        with self._lock:
+            revoked_at = self._revoked.get(decoded_token.get("uid"))
+        # iat has whole-second precision, like Firebase's own revocation check
+        return revoked_at is not None and decoded_token.get("iat", 0) < int(revoked_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._revoked.clear()
+
+
+token_cache = TokenCache()
+
+
+def revoke_user_sessions(uid: str) -> int:
+    """
+    Revoke a user's refresh tokens in Firebase and drop their cached ID
+    tokens. This process rejects their older ID tokens at once; other
+    workers do so once their cached copy expires if AUTH_CHECK_REVOKED is on.
+    Returns how many cached tokens were dropped.
+    """
+    if firebase_app:
+        auth.revoke_refresh_tokens(uid, app=firebase_app)
+    dropped = token_cache.invalidate_user(uid)
+    logger.info(f"Revoked sessions for {uid} ({dropped} cached tokens dropped)")
+    return dropped
+
+
+def _cert_request():
+    """
+    The cached HTTP transport firebase_admin verifies tokens with. It has no
+    public handle, so this relies on the layout of the pinned firebase-admin
+    versions and returns None if that changes.
+    """
+    try:
+        return auth._get_client(firebase_app)._token_verifier.request
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def refresh_signing_certs() -> bool:
+    """
+    Fetch Google's ID token signing certificates into firebase_admin's HTTP
+    cache, bypassing any cached copy, so verification on the request path
+    finds them already cached. Returns False when that cache is out of
+    reach; firebase_admin then fetches the certificates on demand.
+    """
+    if not firebase_app:
+        return False
+    request = _cert_request()
+    if request is None:
+        logger.warning("Cannot reach firebase_admin's certificate cache; certificates will be fetched on demand")
+        return False
+    request(ID_TOKEN_CERT_URL, headers={"Cache-Control": "no-cache"})
+    return True
+
+
+_cert_refresh_thread = None
+
+
+def start_cert_refresh(interval: int = CERT_REFRESH_INTERVAL):
+    """Prefetch the signing certificates now and keep them fresh from a daemon thread"""
+    global _cert_refresh_thread
+    if not firebase_app or _cert_refresh_thread is not None:
+        return
+    if not refresh_signing_certs():
+        return
+
+    def refresh_loop():
+        while True:
+            time.sleep(interval)
+            try:
+                refresh_signing_certs()
+            except Exception as e:
+                logger.warning(f"Signing certificate refresh failed: {e}")
+
+    _cert_refresh_thread = threading.Thread(target=refresh_loop, name="firebase-cert-refresh", daemon=True)
+    _cert_refresh_thread.start()
+
 async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Verify Firebase ID token from Authorization header
@@ -57,8 +214,17 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depe
         )
     
     try:
-        # Verify the ID token
-        decoded_token = auth.verify_id_token(credentials.credentials)
+        # Repeat callers are served from the cache; new tokens are verified
+        # off the event loop since verification may fetch certificates
+        token = credentials.credentials
+        decoded_token = token_cache.get(token)
+        if decoded_token is None:
+            decoded_token = await asyncio.to_thread(
+                auth.verify_id_token, token, app=firebase_app, check_revoked=CHECK_REVOKED
+            )
+            if token_cache.is_revoked(decoded_token):
+                raise auth.RevokedIdTokenError("Token was issued before the user's sessions were revoked")
+            token_cache.put(token, decoded_token)
         user_id = decoded_token['uid']
         user_email = decoded_token.get('email', '')
         
@@ -75,6 +241,11 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depe
             status_code=401,
             detail="Token expired"
         )
+    except auth.RevokedIdTokenError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token revoked"
+        )
     except auth.InvalidIdTokenError:
         raise HTTPException(
             status_code=401,
@@ -87,17 +258,20 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depe
             detail="Authentication failed"
         )
 
-async def optional_auth(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def optional_auth(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
-    Optional authentication - allows both authenticated and anonymous users
+    Optional authentication - allows both authenticated and anonymous users.
+    The user is also stored on request.state so rate limits can key on uid.
     """
+    request.state.user = None
     if not credentials:
         return None
     
     try:
-        return await verify_firebase_token(credentials)
+        request.state.user = await verify_firebase_token(credentials)
     except HTTPException:
         return None
+    return request.state.user
 
 def require_auth(f):
     """
@@ -0,0 +1,117 @@
+"""
+Batch advice: answer many question/userContext pairs in one call.
+
+Each item is planned like a single request. Calculations and simulations
+are answered directly. The remaining questions are deduplicated: retrieval
+runs once per distinct question, with every query embedded in one batched
+call and searched in one matrix query, and generation runs once per
+distinct question and profile, with at most BATCH_CONCURRENCY LLM calls at
+a time. Every item gets its own result or error.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from answer_cache import get_answer_cache, normalize_question, profile_fingerprint
+from user_context import summarize_user_context
+from tools.rag_tool import query_rag_batch
+from metrics import increment
+from workflow import DIRECT_ANSWERS, direct_answer, finish_answer, generate_response, planner_node, should_continue
+
+# Items accepted per batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS") or 1000)
+# LLM generations (and direct answers) running at once for one batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY") or 8)
+
+
+def item_error(e: Exception) -> dict:
+    return {"error": {"type": e.__class__.__name__, "detail": str(e)}}
+
+
+def safely(fn, arg):
+    """Run fn(arg), turning an exception into that item's error instead of failing the batch"""
+    try:
+        return fn(arg)
+    except Exception as e:
+        print(f"Batch item failed: {e}")
+        increment("batch_item_errors")
+        return item_error(e)
+
+
+def prepare_item(state: dict) -> dict:
+    """
+    Plan one item. Returns {"node", "payload"} when it is answered without
+    retrieval, otherwise the question and profile fingerprint to retrieve and
+    generate for.
+    """
+    planned = planner_node(state)
+    node = should_continue(planned)
+    if node in DIRECT_ANSWERS:
+        payload = direct_answer(node, planned)
+        if payload is not None:
+            return {"node": node, "payload": payload}
+    summary = summarize_user_context(state.get("userContext", {}))
+    return {"question": state.get("question", ""), "summary": summary, "fingerprint": profile_fingerprint(summary)}
+
+
+def run_batch(states: list, concurrency: int = BATCH_CONCURRENCY):
+    """
+    Answer every state in states. Returns (results, stats): one result per
+    item, in order, holding either {"node", "payload"} with the same payload
+    the graph produces for that node, or {"error"}.
+    """
+    start = time.perf_counter()
+    cache = get_answer_cache()
+    results = [None] * len(states)
+    stats = {"items": len(states), "direct": 0, "cache_hits": 0, "distinct_questions": 0, "generations": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch") as pool:
+        prepared = list(pool.map(lambda state: safely(prepare_item, state), states))
+
+        # Group the items still needing an answer by question + profile
+        answer_items = {}
+        for i, item in enumerate(prepared):
+            if "error" in item or "node" in item:
+                results[i] = item
+                stats["direct"] += "node" in item
+                continue
+            key = (normalize_question(item["question"]), item["fingerprint"])
+            answer_items.setdefault(key, []).append(i)
+
+        # One cache lookup per distinct question + profile, embedded together for paraphrase matching
+        keys = list(answer_items)
+        cached_answers = cache.get_many([(prepared[answer_items[key][0]]["question"], key[1]) for key in keys])
+        generation_items = {}
+        for key, cached in zip(keys, cached_answers):
+            if cached is None:
+                generation_items[key] = answer_items[key]
+                continue
+            for i in answer_items[key]:
+                stats["cache_hits"] += 1
+                results[i] = {"node": "tool_use",
+                              "payload": dict(cached, question=prepared[i]["question"], cached=True, final=True)}
+
+        # One batched retrieval for the distinct questions
+        questions = {}
+        for (normalized, fingerprint), indexes in generation_items.items():
+            questions.setdefault(normalized, prepared[indexes[0]]["question"])
+        contexts = dict(zip(questions, query_rag_batch(questions.values()))) if questions else {}
+        stats["distinct_questions"] = len(questions)
+
+        def generate(key):
+            item = prepared[generation_items[key][0]]
+            rag_context = contexts[key[0]]
+            response, from_model = generate_response(item["question"], rag_context, item["summary"])
+            answer = finish_answer(item["question"], item["fingerprint"], rag_context, response, from_model)
+            return dict(answer, final=True)
+
+        keys = list(generation_items)
+        stats["generations"] = len(keys)
+        for key, generated in zip(keys, pool.map(lambda key: safely(generate, key), keys)):
+            for i in generation_items[key]:
+                if "error" in generated:
+                    results[i] = generated
+                else:
+                    results[i] = {"node": "tool_use", "payload": dict(generated, question=prepared[i]["question"])}
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return results, stats
@@ -0,0 +1,109 @@
+"""Shared helpers for the offline benchmarks: stub backend, timing and result files"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def use_stub_backend(latency_ms: float = 0.0):
+    """Answer and embed with the deterministic stub, with latency_ms per call"""
+    from tools.llm_client import StubBackend, set_llm
+    backend = StubBackend(latency_ms=latency_ms)
+    set_llm(backend)
+    return backend
+
+
+def latency_summary(seconds) -> dict:
+    """Count, mean and tail latencies in milliseconds"""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"count": 0}
+    return {
+        "count": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def time_calls(fn, args, warmup: int = 3) -> list:
+    """Call fn(arg) for every arg and return the duration of each call in seconds"""
+    for arg in args[:warmup]:
+        fn(arg)
+    durations = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+def write_results(name: str, settings: dict, results: list, output_dir: str = RESULTS_DIR) -> str:
+    """
+    Save one run as <output_dir>/<name>-<timestamp>.json. Every entry in
+    results has an 'id' so compare can match entries between runs.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(output_dir, f"{name}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "benchmark": name,
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "environment": environment_info(),
+            "settings": settings,
+            "results": results,
+        }, f, indent=2)
+    return path
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """Numeric leaves of a result entry keyed by their dotted path"""
+    if isinstance(value, dict):
+        items = {}
+        for key, child in value.items():
+            items.update(flatten(child, f"{prefix}.{key}" if prefix else str(key)))
+        return items
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix: value}
+    return {}
+
+
+def compare(old_path: str, new_path: str) -> list:
+    """Rows of (entry id, metric, old, new, change %) for metrics present in both runs"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = {entry["id"]: flatten(entry) for entry in json.load(f)["results"]}
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = {entry["id"]: flatten(entry) for entry in json.load(f)["results"]}
+    rows = []
+    for entry_id in old.keys() & new.keys():
+        for metric in sorted(old[entry_id].keys() & new[entry_id].keys()):
+            before, after = old[entry_id][metric], new[entry_id][metric]
+            change = (after - before) / before * 100 if before else float("nan")
+            rows.append((entry_id, metric, before, after, change))
+    return sorted(rows)
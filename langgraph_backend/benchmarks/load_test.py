@@ -0,0 +1,118 @@
+"""
+End-to-end HTTP load test of /financial-advice.
+
+Starts the API with uvicorn on the stub backend (rate limiting off, its own
+throwaway vector store) unless --url points at a running instance, then
+keeps `concurrency` requests in flight until `requests` have completed.
+Reports throughput, latency percentiles, status codes and the server's own
+per-stage metrics.
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import subprocess
+import httpx
+from benchmarks.common import BACKEND_DIR, latency_summary
+from benchmarks.retrieval import synthetic_queries
+from benchmarks.summarize import synthetic_user_context
+
+SERVER_START_TIMEOUT = 300
+
+
+def start_server(port: int, latency_ms: float, workdir: str, workers: int = 1) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        ENVIRONMENT="development",
+        LLM_BACKEND="stub",
+        STUB_LATENCY_MS=str(latency_ms),
+        RATE_LIMIT_ENABLED="false",
+        VECTORSTORE_DIR=os.path.join(workdir, "vectorstore"),
+        EMBEDDING_CACHE_DIR=os.path.join(workdir, "embedding_cache"),
+        MONTE_CARLO_WORKERS="1",
+        WARMUP_QUERY="",
+    )
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_ready(url: str, server: subprocess.Popen = None, timeout: float = SERVER_START_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{url}/ready", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} was not ready after {timeout}s")
+
+
+async def drive(url: str, bodies: list, concurrency: int) -> tuple:
+    """Send every body with at most concurrency requests in flight; returns (durations, statuses, seconds)"""
+    durations, statuses = [], {}
+    next_body = iter(bodies)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        async def worker():
+            for body in next_body:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/financial-advice", json=body)
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = e.__class__.__name__
+                durations.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return durations, statuses, elapsed
+
+
+def run(requests: int = 500, concurrency: int = 16, latency_ms: float = 50.0, distinct_questions: int = 50,
+        with_context: bool = True, url: str = None, port: int = 8765, workers: int = 1, seed: int = 0) -> list:
+    questions = synthetic_queries(distinct_questions, seed + 1)
+    context = synthetic_user_context(200, seed=seed) if with_context else None
+    bodies = [{"question": questions[i % len(questions)], "userContext": context} for i in range(requests)]
+
+    with tempfile.TemporaryDirectory(prefix="load-test-") as workdir:
+        server = None
+        if url is None:
+            url = f"http://127.0.0.1:{port}"
+            print(f"[load] starting server on {url} (stub latency {latency_ms}ms)")
+            server = start_server(port, latency_ms, workdir, workers)
+        try:
+            wait_until_ready(url, server)
+            # One pass over the questions first, so the run measures steady state
+            asyncio.run(drive(url, bodies[:min(len(questions), concurrency)], concurrency))
+            print(f"[load] {requests} requests, concurrency {concurrency}")
+            durations, statuses, elapsed = asyncio.run(drive(url, bodies, concurrency))
+            server_metrics = httpx.get(f"{url}/metrics/summary", timeout=10).json()
+            cache = httpx.get(f"{url}/cache/stats", timeout=10).json()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    stages = server_metrics.get("advice_stage_seconds", {})
+    return [{
+        "id": f"load/c{concurrency}",
+        "requests": requests,
+        "concurrency": concurrency,
+        "distinct_questions": distinct_questions,
+        "seconds": round(elapsed, 4),
+        "rps": round(requests / elapsed, 2),
+        "latency": latency_summary(durations),
+        "statuses": statuses,
+        "errors": sum(count for status, count in statuses.items() if status != "200"),
+        "answer_cache": cache,
+        "server_stages": {stage.split("=", 1)[-1]: stats for stage, stats in stages.items()},
+    }]
@@ -0,0 +1,130 @@
+"""
+Retrieval micro-benchmarks: query_rag (vector search on the memory-mapped
+index or FAISS), query_rag_simple (BM25 keyword search) and
+query_rag_batch, over synthetic corpora of any number of chunks, with the
+stub (API-shaped) embeddings or an in-process embedding backend.
+"""
+import os
+import time
+import tempfile
+import numpy as np
+from langchain.docstore.document import Document
+from benchmarks.common import latency_summary, time_calls
+
+FINANCE_TERMS = (
+    "mutual fund sip equity debt bond index etf portfolio diversification asset allocation "
+    "retirement pension emergency fund insurance premium term life health tax deduction "
+    "capital gains dividend interest rate inflation loan emi mortgage credit score budget "
+    "savings expense income salary investment risk return volatility market stock share "
+    "gold real estate rent liquidity compounding goal planning advisor fee expense ratio nav"
+).split()
+FILLER_TERMS = "the a of to and in for is on with as by that it can your you are be".split()
+
+
+def synthetic_corpus(chunks: int, seed: int = 0) -> list:
+    """Chunks of 60-180 words over a finance vocabulary, a few lines each"""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(FINANCE_TERMS + FILLER_TERMS * 3)
+    lengths = rng.integers(60, 180, size=chunks)
+    words = vocabulary[rng.integers(0, len(vocabulary), size=int(lengths.sum()))]
+    docs, start = [], 0
+    for i, length in enumerate(lengths):
+        chunk = words[start:start + length]
+        start += length
+        lines = [" ".join(chunk[j:j + 20]) for j in range(0, len(chunk), 20)]
+        docs.append(Document(page_content="\n".join(lines), metadata={"source": f"synthetic/{i // 10}"}))
+    return docs
+
+
+def synthetic_queries(count: int, seed: int = 1) -> list:
+    rng = np.random.default_rng(seed)
+    terms = np.array(FINANCE_TERMS)
+    return [
+        f"How should I think about {' '.join(terms[rng.integers(0, len(terms), size=3)])}?"
+        for _ in range(count)
+    ]
+
+
+def install_corpus(docs, backend: str, workdir: str, embeddings_backend: str = None) -> dict:
+    """
+    Embed docs (stub LLM backend unless embeddings_backend is given), build the chosen vector store and the
+    keyword index, and install both as the process-wide retrievers.
+    Returns build times in seconds.
+    """
+    from langchain_community.vectorstores import FAISS
+    from tools import rag_tool
+    from tools.keyword_index import KeywordIndex
+    from tools.mmap_index import MmapVectorIndex
+
+    timings = {}
+    texts = [doc.page_content for doc in docs]
+    metadatas = [doc.metadata for doc in docs]
+    embeddings = rag_tool.GeminiEmbeddings(use_cache=False, progress=lambda embedded, total: None,
+                                           backend=embeddings_backend)
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    timings["embed_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if backend == "mmap":
+        path = os.path.join(workdir, f"mmap-{len(docs)}")
+        MmapVectorIndex.write(path, vectors, texts, metadatas)
+        vectorstore = MmapVectorIndex(path, embeddings)
+    elif backend == "faiss":
+        vectorstore = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), embeddings, metadatas=metadatas)
+    else:
+        raise ValueError(f"Unknown vector store backend '{backend}'")
+    timings["index_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    keyword_index = KeywordIndex.build(docs)
+    timings["keyword_index_seconds"] = time.perf_counter() - start
+
+    rag_tool._vectorstore = vectorstore
+    rag_tool._keyword_index = keyword_index
+    return {key: round(value, 4) for key, value in timings.items()}
+
+
+def fallback_count() -> float:
+    from metrics import registry
+    return registry.summary().get("advice_events_total", {}).get("event=vectorstore_fallback", 0)
+
+
+def run(sizes, backends=("mmap", "faiss"), queries: int = 200, k: int = 2, seed: int = 0,
+        embeddings_backend: str = None) -> list:
+    from tools.rag_tool import query_rag, query_rag_simple, query_rag_batch
+
+    results = []
+    questions = synthetic_queries(queries, seed + 1)
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        for size in sizes:
+            docs = synthetic_corpus(size, seed)
+            for backend in backends:
+                print(f"[retrieval] {backend} with {size} chunks")
+                build = install_corpus(docs, backend, workdir, embeddings_backend)
+                fallbacks = fallback_count()
+
+                vector = time_calls(lambda q: query_rag(q, k), questions)
+                keyword = time_calls(lambda q: query_rag_simple(q, k), questions)
+                start = time.perf_counter()
+                query_rag_batch(questions, k)
+                batch_seconds = time.perf_counter() - start
+
+                results.append({
+                    "id": f"retrieval/{backend}/{size}",
+                    "backend": backend,
+                    "embeddings": embeddings_backend or "stub",
+                    "chunks": size,
+                    "build": build,
+                    "query_rag": dict(latency_summary(vector), qps=round(len(vector) / sum(vector), 1)),
+                    "query_rag_simple": dict(latency_summary(keyword), qps=round(len(keyword) / sum(keyword), 1)),
+                    "query_rag_batch": {
+                        "queries": len(questions),
+                        "seconds": round(batch_seconds, 4),
+                        "per_query_ms": round(batch_seconds / len(questions) * 1000, 4),
+                    },
+                    # Non-zero means query_rag silently fell back to keyword search
+                    "vectorstore_fallbacks": fallback_count() - fallbacks,
+                })
+    return results
@@ -0,0 +1,108 @@
+"""
+Offline benchmarks for the advice pipeline. No network is used: embeddings
+and answers come from the deterministic stub backend, with optional
+injected latency. Run from langgraph_backend/:
+
+    python -m benchmarks.run retrieval --sizes 10,1000,10000,100000
+    python -m benchmarks.run retrieval --embeddings hashing
+    python -m benchmarks.run summarize --sizes 1000,10000,100000
+    python -m benchmarks.run load --requests 500 --concurrency 16 --latency-ms 50
+    python -m benchmarks.run all
+    python -m benchmarks.run compare benchmarks/results/a.json benchmarks/results/b.json
+
+Each run is saved as JSON under benchmarks/results/ (or --output).
+"""
+import os
+import sys
+import argparse
+import tempfile
+
+# Offline before anything imports the LLM client or the embedding cache
+os.environ["LLM_BACKEND"] = "stub"
+os.environ.setdefault("EMBEDDING_CACHE_DIR", os.path.join(tempfile.gettempdir(), "advice-bench-embeddings"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import RESULTS_DIR, compare, use_stub_backend, write_results
+
+
+def parse_sizes(value: str) -> list:
+    return [int(size) for size in value.split(",") if size.strip()]
+
+
+def run_retrieval(args):
+    from benchmarks import retrieval
+    use_stub_backend(args.latency_ms)
+    results = retrieval.run(args.sizes or [10, 1000, 10000, 100000], args.backends.split(","),
+                            args.queries, args.k, args.seed, args.embeddings)
+    settings = {"sizes": args.sizes, "backends": args.backends, "embeddings": args.embeddings,
+                "queries": args.queries, "k": args.k, "latency_ms": args.latency_ms, "seed": args.seed}
+    return write_results("retrieval", settings, results, args.output)
+
+
+def run_summarize(args):
+    from benchmarks import summarize
+    results = summarize.run(args.sizes or [1000, 10000, 100000], args.repeats, args.seed)
+    return write_results("summarize", {"sizes": args.sizes, "repeats": args.repeats, "seed": args.seed},
+                         results, args.output)
+
+
+def run_load(args):
+    from benchmarks import load_test
+    results = load_test.run(args.requests, args.concurrency, args.latency_ms, args.distinct_questions,
+                            not args.no_context, args.url, args.port, args.workers, args.seed)
+    settings = {key: getattr(args, key) for key in ("requests", "concurrency", "latency_ms", "distinct_questions",
+                                                     "no_context", "url", "workers", "seed")}
+    return write_results("load", settings, results, args.output)
+
+
+def print_comparison(args):
+    rows = compare(args.old, args.new)
+    if not rows:
+        print("No common metrics")
+        return
+    width = max(len(f"{entry_id} {metric}") for entry_id, metric, *_ in rows)
+    for entry_id, metric, before, after, change in rows:
+        print(f"{f'{entry_id} {metric}':<{width}}  {before:>12.4f}  {after:>12.4f}  {change:+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the advice pipeline")
+    parser.add_argument("benchmark", choices=["retrieval", "summarize", "load", "all", "compare"])
+    parser.add_argument("old", nargs="?", help="compare: earlier results file")
+    parser.add_argument("new", nargs="?", help="compare: later results file")
+    parser.add_argument("--sizes", type=parse_sizes, help="chunks (retrieval) or transactions (summarize)")
+    parser.add_argument("--backends", default="mmap,faiss", help="vector stores to benchmark")
+    parser.add_argument("--embeddings", help="in-process embedding backend, e.g. hashing (default: stub)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--distinct-questions", type=int, default=50)
+    parser.add_argument("--no-context", action="store_true", help="send requests without a userContext")
+    parser.add_argument("--url", help="load test a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub latency per LLM/embedding call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    if args.benchmark == "compare":
+        if not (args.old and args.new):
+            parser.error("compare needs two results files")
+        print_comparison(args)
+        return
+
+    runners = {"retrieval": run_retrieval, "summarize": run_summarize, "load": run_load}
+    selected = list(runners) if args.benchmark == "all" else [args.benchmark]
+    for name in selected:
+        if args.benchmark == "all":
+            # Sizes mean different things per benchmark, so 'all' uses the defaults
+            args.sizes = None
+        path = runners[name](args)
+        print(f"[{name}] results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
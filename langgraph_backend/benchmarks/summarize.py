@@ -0,0 +1,64 @@
+"""
+User-context benchmarks: validating a large userContext against the request
+schema and summarizing it for the prompt.
+"""
+import numpy as np
+import orjson
+from pydantic import TypeAdapter
+from benchmarks.common import latency_summary, time_calls
+
+CATEGORIES = ["Food", "Rent", "Travel", "Shopping", "Utilities", "Health", "Education", "Entertainment"]
+
+
+def synthetic_user_context(transactions: int, holdings: int = 50, months: int = 24, seed: int = 0) -> dict:
+    """A profile shaped like the frontend's, with mixed number and string amounts"""
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, months * 30, size=transactions)
+    amounts = np.round(rng.normal(-1500, 4000, size=transactions), 2)
+    return {
+        "userProfile": {"age": 34, "income": 120000, "occupation": "Engineer"},
+        "detailedProfile": {"riskTolerance": "moderate", "financialGoals": ["retirement", "house"],
+                            "emergencyFund": "300000", "currentDebt": 150000},
+        "transactions": [
+            {
+                "date": str(np.datetime64("2023-01-01") + int(day)),
+                "description": f"Transaction {i}",
+                # Every tenth amount arrives as a formatted string
+                "amount": f"{amount:,.2f}" if i % 10 == 0 else float(amount),
+                "category": CATEGORIES[i % len(CATEGORIES)],
+            }
+            for i, (day, amount) in enumerate(zip(days, amounts))
+        ],
+        "holdings": [
+            {"name": f"Fund {i}", "quantity": int(rng.integers(1, 500)), "avgPrice": float(rng.uniform(10, 3000)),
+             "currentValue": float(rng.uniform(1000, 500000))}
+            for i in range(holdings)
+        ],
+        "monthlyData": [
+            {"month": f"{2023 + m // 12}-{m % 12 + 1:02d}", "income": 120000, "expenses": float(rng.uniform(60000, 100000))}
+            for m in range(months)
+        ],
+    }
+
+
+def run(sizes, repeats: int = 20, seed: int = 0) -> list:
+    from schemas import UserContext
+    from user_context import summarize_user_context
+
+    adapter = TypeAdapter(UserContext)
+    results = []
+    for size in sizes:
+        print(f"[summarize] {size} transactions")
+        context = synthetic_user_context(size, seed=seed)
+        body = orjson.dumps({"question": "How am I doing?", "userContext": context})
+        validated = adapter.validate_python(context)
+        payloads = [validated] * repeats
+        results.append({
+            "id": f"summarize/{size}",
+            "transactions": size,
+            "body_bytes": len(body),
+            "parse": latency_summary(time_calls(orjson.loads, [body] * repeats)),
+            "validate": latency_summary(time_calls(adapter.validate_python, [context] * repeats)),
+            "summarize": latency_summary(time_calls(summarize_user_context, payloads)),
+        })
+    return results
@@ -0,0 +1,31 @@
+"""Shared fixtures for the API tests: a stub LLM, fixed retrieval and no rate limits"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from tools import llm_client
+from answer_cache import get_answer_cache
+
+# Long enough for generate_response to ask the model
+CONTEXT = ("Mutual funds pool money from many investors. A systematic investment plan (SIP) invests "
+           "a fixed amount every month, which averages the purchase price over time.")
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    backend = llm_client.StubBackend()
+    monkeypatch.setitem(llm_client._backends, "test-stub", backend)
+    monkeypatch.setattr(llm_client, "LLM_BACKEND", "test-stub")
+    return backend
+
+
+@pytest.fixture
+def client(monkeypatch, stub_llm):
+    import main
+    import workflow
+
+    monkeypatch.setattr(main.limiter, "enabled", False)
+    monkeypatch.setattr(workflow, "run_tool_use", lambda state: {"context": CONTEXT})
+    get_answer_cache().clear()
+    yield TestClient(main.app)
+    get_answer_cache().clear()
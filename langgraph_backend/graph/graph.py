@@ -1,6 +1,8 @@
 from langgraph.graph import StateGraph, END
 from langgraph_backend.agents.planner_agent import run_planner
 from langgraph_backend.agents.tool_use_agent import run_tool_use
+from langgraph_backend.agents.calculator_agent import run_calculator
+from langgraph_backend.agents.simulation_agent import run_simulation
 from typing import Dict, Any, Literal
 
 def get_graph():
@@ -10,12 +12,16 @@ def get_graph():
     # Add nodes
     workflow.add_node("planner", run_planner)
     workflow.add_node("tool_use", run_tool_use)
+    workflow.add_node("calculator", run_calculator)
+    workflow.add_node("simulation", run_simulation)
     
     # Set the entry point
     workflow.set_entry_point("planner")
     
     # Define the edges - always go back to planner after tool use
     workflow.add_edge("tool_use", "planner")
+    workflow.add_edge("calculator", "planner")
+    workflow.add_edge("simulation", "planner")
     
     # Define all possible actions and their routing
     FINANCIAL_ACTIONS = {
@@ -23,12 +29,16 @@ def get_graph():
         "use_rag": "tool_use",
         
         # Calculation actions
-        "calculate_emi": "tool_use",
-        "calculate_roi": "tool_use",
+        "calculate_emi": "calculator",
+        "calculate_roi": "calculator",
+        "calculate_xirr": "calculator",
+        "project_investment": "calculator",
         
         # Planning actions
-        "set_goal": "tool_use",
-        "analyze_portfolio": "tool_use",
+        "set_goal": "calculator",
+        "analyze_portfolio": "calculator",
+        "simulate_retirement": "simulation",
+        "simulate_goal": "simulation",
         
         # Error handling
         "unknown_action": "tool_use",
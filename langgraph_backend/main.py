@@ -1,12 +1,29 @@
 
 import os
+import orjson
+import asyncio
+import logging
+import threading
+import time
+import contextvars
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-from workflow import get_workflow_graph
-from auth import verify_firebase_token, optional_auth
+from typing import List, Optional
+from workflow import get_workflow_graph, stream_advice
+from batch import BATCH_MAX_ITEMS, run_batch
+from tools.llm_client import get_llm
+from tools.rag_tool import get_vectorstore, get_keyword_index
+from tools.monte_carlo import warm_process_pool, shutdown_process_pool
+from answer_cache import get_answer_cache
+from metrics import HTTP_METRIC, TRACE_HEADER, registry, start_trace
+from auth import verify_firebase_token, optional_auth, revoke_user_sessions, start_cert_refresh
+from schemas import UserContext
+from serialization import NegotiatedRoute, OrjsonResponse, negotiated_response
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -21,26 +38,131 @@ elif os.path.exists(os.path.join(os.path.dirname(__file__), '..', '.env')):
 else:
     load_dotenv()  # Load from current directory
 
+logger = logging.getLogger(__name__)
+
 # Get environment settings
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 PORT = int(os.getenv("PORT") or 8000)
+# Max graph runs executing at once per worker; extra requests wait for a slot
+ADVICE_MAX_CONCURRENCY = int(os.getenv("ADVICE_MAX_CONCURRENCY") or 32)
+# Optional question run through the whole workflow before reporting ready
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "")
+# Where rate-limit counters live. memory:// is per process; point every worker
+# and replica at one Redis-protocol server (e.g. redis://localhost:6379/0) so
+# the limits hold across all of them
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# moving-window (exact sliding window), sliding-window-counter (cheaper approximation) or fixed-window
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+# Turn rate limiting off, e.g. for load tests against a private instance
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+
+
+def rate_limit_key(request: Request) -> str:
+    """Limit signed-in users by uid and anonymous callers by client address"""
+    user = getattr(request.state, "user", None)
+    if user and user.get("uid"):
+        return f"user:{user['uid']}"
+    return get_remote_address(request)
+
+
+# Initialize rate limiter; if the shared storage is unreachable, limits fall
+# back to per-process memory instead of failing requests
+limiter = Limiter(
+    key_func=rate_limit_key,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=True,
+    enabled=RATE_LIMIT_ENABLED
+)
+
+# Warm-up progress reported by /ready
+readiness = {"ready": False, "stages": {}}
+
+
+def warm_up():
+    """
+    Load everything the first request would otherwise pay for: the vector
+    index, the keyword index, the LLM client, the token signing
+    certificates and the simulation worker processes, then optionally run
+    a synthetic query. A failed stage is reported but does not block
+    readiness, since the workflow has fallbacks for each of them.
+    """
+    stages = [
+        ("vectorstore", get_vectorstore),
+        ("keyword_index", get_keyword_index),
+        ("llm", get_llm),
+        ("auth_certs", start_cert_refresh),
+        ("simulation_pool", warm_process_pool),
+    ]
+    if WARMUP_QUERY:
+        stages.append(("warmup_query", lambda: run_graph({"question": WARMUP_QUERY, "userContext": None})))
+
+    for name, load in stages:
+        start = time.perf_counter()
+        try:
+            load()
+            status = {"status": "ok"}
+        except Exception as e:
+            print(f"[WARMUP] {name} failed: {e}")
+            status = {"status": "failed", "error": e.__class__.__name__}
+        status["seconds"] = round(time.perf_counter() - start, 3)
+        readiness["stages"][name] = status
+        print(f"[WARMUP] {name}: {status['status']} in {status['seconds']}s")
+    readiness["ready"] = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so /health answers while /ready gates traffic
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(advice_executor, warm_up)
+    yield
+    advice_executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_process_pool()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
 
 app = FastAPI(
     title="AI Finance Advisor API",
     version="1.0.0",
     docs_url="/docs" if ENVIRONMENT != "production" else None,
-    redoc_url="/redoc" if ENVIRONMENT != "production" else None
+    redoc_url="/redoc" if ENVIRONMENT != "production" else None,
+    lifespan=lifespan,
+    default_response_class=OrjsonResponse
 )
+# Parse bodies with orjson and accept MessagePack on every route defined below
+app.router.route_class = NegotiatedRoute
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Give every request a trace ID (reusing the caller's TRACE_HEADER when
+    present), time it until the response headers are sent, and return the ID
+    in the same header.
+    """
+    trace_id = start_trace(request.headers.get(TRACE_HEADER))
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        labels = {"route": getattr(route, "path", "unmatched"), "method": request.method, "status": str(status)}
+        registry.observe(HTTP_METRIC, labels, time.perf_counter() - start)
+    response.headers[TRACE_HEADER] = trace_id
+    return response
+
+
 class Query(BaseModel):
     question: str
-    userContext: Optional[Dict[str, Any]] = None
+    userContext: Optional[UserContext] = None
+
+
+class BatchQuery(BaseModel):
+    items: List[Query]
 
 
 # Health check endpoint for deployment monitoring
@@ -54,20 +176,175 @@ async def health_check():
     }
 
 
+# Readiness endpoint for load balancers: 503 until warm-up has finished
+@app.get("/ready")
+async def readiness_check():
+    """Report ready only once indexes and the LLM client are loaded"""
+    body = {
+        "status": "ready" if readiness["ready"] else "warming_up",
+        "stages": readiness["stages"],
+    }
+    return OrjsonResponse(body, status_code=200 if readiness["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Latency histograms and event counters in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/summary")
+async def metrics_summary():
+    """p50/p95/p99 per stage and route, and every counter, as JSON"""
+    return registry.summary()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss statistics for the advice answer cache"""
+    return get_answer_cache().stats()
+
+
+def question_error(question: str) -> Optional[str]:
+    if not question or len(question.strip()) == 0:
+        return "Question cannot be empty"
+    if len(question) > 2000:  # Limit question length
+        return "Question too long"
+    return None
+
+
 # Security: Add request validation
 async def validate_request(query: Query):
     """Basic request validation and sanitization"""
-    if not query.question or len(query.question.strip()) == 0:
-        raise HTTPException(status_code=400, detail="Question cannot be empty")
-    
-    if len(query.question) > 2000:  # Limit question length
-        raise HTTPException(status_code=400, detail="Question too long")
+    error = question_error(query.question)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
     
     return query
 
 
 graph = get_workflow_graph()
 
+# The graph nodes block on FAISS search and Gemini calls, so graph runs are
+# executed on a bounded thread pool to keep the event loop free for other requests
+advice_executor = ThreadPoolExecutor(
+    max_workers=ADVICE_MAX_CONCURRENCY,
+    thread_name_prefix="advice"
+)
+
+
+def run_graph(state_dict: dict) -> list:
+    """Run the workflow graph to completion and collect every step"""
+    results = []
+    for step in graph.stream(state_dict):
+        results.append(step)
+    return results
+
+
+async def run_graph_async(state_dict: dict) -> list:
+    """Run the workflow graph on the advice executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry the request's trace ID into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(advice_executor, context.run, run_graph, state_dict)
+
+
+# Fields of the final step returned by default; the rest (retrieved context,
+# the duplicate 'result', the echoed question) needs verbose=true or fields=
+FINAL_FIELDS = ("response", "structuredData", "cached")
+# Request inputs the planner step carries forward for later nodes; never echoed back
+CARRIED_FIELDS = ("userContext",)
+
+
+def parse_fields(fields: Optional[str]) -> list:
+    return [field.strip() for field in (fields or "").split(",") if field.strip()]
+
+
+def compact_step(payload: dict, extra_fields=()) -> dict:
+    return {key: payload[key] for key in (*FINAL_FIELDS, *extra_fields) if key in payload}
+
+
+def without_carried_fields(payload: dict) -> dict:
+    return {key: value for key, value in payload.items() if key not in CARRIED_FIELDS}
+
+
+def shape_advice_response(results: list, verbose: bool = False, fields: Optional[str] = None) -> dict:
+    """
+    By default only the final answer and light metadata are returned, in the
+    same final.<node>.response shape clients read. fields= adds named fields
+    of the final step ('intermediate' adds the whole trace); verbose=true
+    returns every graph step, without the userContext the planner carries.
+    """
+    results = [{node: without_carried_fields(payload) for node, payload in step.items()} for step in results]
+    final = results[-1] if results else {}
+    if verbose:
+        return {"intermediate": results, "final": final}
+    requested = parse_fields(fields)
+    body = {
+        "final": {node: compact_step(payload, requested) for node, payload in final.items()},
+        "meta": {"steps": [node for step in results for node in step]},
+    }
+    if "intermediate" in requested:
+        body["intermediate"] = results
+    return body
+
+
+def shape_stream_event(event: str, data: dict, verbose: bool = False) -> dict:
+    """Streaming counterpart of shape_advice_response"""
+    data = without_carried_fields(data)
+    if verbose:
+        return data
+    if event == "planner":
+        return {key: data[key] for key in ("question", "plan") if key in data}
+    if event == "retrieval":
+        return {"context_chars": len(data.get("context") or ""), "cached": data.get("cached", False)}
+    if event in ("tool_use", "calculator", "simulation"):
+        return compact_step(data)
+    return data
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+async def stream_graph_events(state_dict: dict, verbose: bool = False):
+    """
+    Run stream_advice on the advice executor and relay its events as SSE
+    as soon as they are produced. Stops the worker if the client goes away.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for event in stream_advice(state_dict):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        except Exception:
+            logger.exception("Error streaming financial advice")
+            loop.call_soon_threadsafe(
+                queue.put_nowait, ("error", {"detail": "Failed to generate advice"})
+            )
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    worker = loop.run_in_executor(advice_executor, contextvars.copy_context().run, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            event, data = item
+            yield format_sse(event, shape_stream_event(event, data, verbose))
+        yield format_sse("done", {})
+    finally:
+        cancelled.set()
+        await worker
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -80,17 +357,25 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],
+    allow_headers=["Content-Type", "Authorization", TRACE_HEADER],
+    expose_headers=[TRACE_HEADER],
 )
 
 
 @app.post("/financial-advice")
-@limiter.limit("10/minute")  # Allow 10 requests per minute per IP
+@limiter.limit("10/minute")  # Allow 10 requests per minute per user or IP
 async def financial_advice(
     request: Request,
     query: Query = Depends(validate_request),
-    current_user: Optional[dict] = Depends(optional_auth)
+    current_user: Optional[dict] = Depends(optional_auth),
+    verbose: bool = False,
+    fields: Optional[str] = None
 ):
+    """
+    Returns final.<node>.response plus light metadata. Use fields= (comma
+    separated, e.g. context,question or intermediate) to add parts of the
+    trace, or verbose=true for every graph step.
+    """
     # Security: Log only non-sensitive metadata
     print("[DEBUG] Processing financial advice request")
     print(f"[DEBUG] User context provided: {query.userContext is not None}")
@@ -104,11 +389,92 @@ async def financial_advice(
         "question": query.question,
         "userContext": query.userContext
     }
-    results = []
-    for step in graph.stream(state_dict):
-        results.append(step)
-    final = results[-1] if results else {}
-    return {"intermediate": results, "final": final}
+    results = await run_graph_async(state_dict)
+    return negotiated_response(request, shape_advice_response(results, verbose, fields))
+
+
+@app.post("/financial-advice/stream")
+@limiter.limit("10/minute")  # Allow 10 requests per minute per user or IP
+async def financial_advice_stream(
+    request: Request,
+    query: Query = Depends(validate_request),
+    current_user: Optional[dict] = Depends(optional_auth),
+    verbose: bool = False
+):
+    """
+    Stream the workflow as Server-Sent Events: 'planner' and 'retrieval'
+    when those steps finish, 'token' for each piece of the answer as it is
+    generated, 'tool_use' with the complete result, then 'done'. Events
+    carry compact payloads unless verbose=true.
+    """
+    logger.debug("Streaming financial advice (user context: %s, authenticated: %s)",
+                 query.userContext is not None, current_user is not None)
+
+    state_dict = {
+        "question": query.question,
+        "userContext": query.userContext
+    }
+    return StreamingResponse(
+        stream_graph_events(state_dict, verbose),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/financial-advice/batch")
+@limiter.limit("5/minute")  # Each call may carry up to BATCH_MAX_ITEMS questions
+async def financial_advice_batch(
+    request: Request,
+    batch: BatchQuery,
+    current_user: Optional[dict] = Depends(optional_auth),
+    fields: Optional[str] = None
+):
+    """
+    Answer many question/userContext pairs in one call. Identical questions
+    share retrieval and, for the same profile, generation. Returns one entry
+    per item, in order, with the same final.<node> payload as
+    /financial-advice or an error for that item alone.
+    """
+    if not batch.items:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {BATCH_MAX_ITEMS} items)")
+    logger.debug("Batch of %d advice requests (authenticated: %s)", len(batch.items), current_user is not None)
+
+    items = [None] * len(batch.items)
+    states, positions = [], []
+    for i, query in enumerate(batch.items):
+        error = question_error(query.question)
+        if error:
+            items[i] = {"index": i, "error": {"type": "ValidationError", "detail": error}}
+        else:
+            states.append({"question": query.question, "userContext": query.userContext})
+            positions.append(i)
+
+    loop = asyncio.get_running_loop()
+    results, stats = await loop.run_in_executor(advice_executor, contextvars.copy_context().run, run_batch, states)
+    requested = parse_fields(fields)
+    for i, result in zip(positions, results):
+        if "error" in result:
+            items[i] = {"index": i, "error": result["error"]}
+        else:
+            items[i] = {"index": i, "final": {result["node"]: compact_step(result["payload"], requested)}}
+    # run_batch only saw the valid items
+    stats["items"] = len(batch.items)
+    stats["invalid"] = len(batch.items) - len(states)
+    stats["errors"] = sum("error" in item for item in items)
+    return negotiated_response(request, {"results": items, "meta": stats})
+
+
+@app.post("/auth/revoke-sessions")
+@limiter.limit("5/minute")
+async def revoke_sessions(request: Request, current_user: dict = Depends(verify_firebase_token)):
+    """
+    Sign the caller out everywhere: revoke their Firebase refresh tokens and
+    stop accepting the ID tokens they already hold.
+    """
+    dropped = await asyncio.to_thread(revoke_user_sessions, current_user["uid"])
+    return {"status": "revoked", "cached_tokens_dropped": dropped}
 
 
 if __name__ == "__main__":
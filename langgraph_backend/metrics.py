@@ -0,0 +1,210 @@
+"""
+In-process latency and event metrics, exported in the Prometheus text format.
+
+Code wraps a stage in span("name") (or decorates it with timed("name")) to
+record its duration in the advice_stage_seconds histogram, and calls
+increment("event") for things worth counting, such as fallbacks and LLM
+errors. HTTP requests are timed by the middleware in main.py, which also
+assigns each request a trace ID; the ID is available to any code running
+for that request through current_trace_id() and is printed with spans that
+take longer than METRICS_SLOW_SPAN_SECONDS.
+
+Histograms use fixed buckets, so they can be summed across workers by
+Prometheus; Histogram.quantile() estimates p50/p95/p99 from the buckets the same
+way histogram_quantile() does.
+"""
+import os
+import re
+import time
+import uuid
+import bisect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Spans slower than this many seconds are printed with their trace ID; 0 disables
+METRICS_SLOW_SPAN_SECONDS = float(os.getenv("METRICS_SLOW_SPAN_SECONDS") or 5)
+# Response header carrying the trace ID; an incoming value is reused
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Request-ID")
+
+# Upper bounds in seconds, from a keyword lookup to a slow Gemini answer
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+TRACE_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+STAGE_METRIC = "advice_stage_seconds"
+STAGE_ERROR_METRIC = "advice_stage_errors_total"
+EVENT_METRIC = "advice_events_total"
+HTTP_METRIC = "http_request_seconds"
+
+METRIC_HELP = {
+    STAGE_METRIC: "Time spent in each workflow node and external call",
+    STAGE_ERROR_METRIC: "Spans that ended with an exception",
+    EVENT_METRIC: "Fallbacks, errors and cache outcomes",
+    HTTP_METRIC: "HTTP request latency by route",
+}
+
+trace_id_var = contextvars.ContextVar("trace_id", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One count per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation within the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    # Beyond the last bucket all that is known is the lower bound
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: dict, value: float):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, labels: dict, amount: float = 1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip((*LATENCY_BUCKETS, "+Inf"), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """p50/p95/p99, mean and count per histogram series, plus every counter"""
+        with self._lock:
+            histograms = {
+                (name, labels): {
+                    "count": h.count,
+                    "mean": h.sum / h.count if h.count else 0.0,
+                    **{f"p{round(q * 100)}": h.quantile(q) for q in QUANTILES},
+                }
+                for (name, labels), h in self._histograms.items()
+            }
+            counters = dict(self._counters)
+
+        result = {}
+        for (name, labels), stats in sorted(histograms.items()):
+            result.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = {
+                key: round(value, 6) for key, value in stats.items()
+            }
+        for (name, labels), value in sorted(counters.items()):
+            result.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels)] = value
+        return result
+
+
+def format_labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+
+
+def observe(stage: str, seconds: float):
+    registry.observe(STAGE_METRIC, {"stage": stage}, seconds)
+    if METRICS_SLOW_SPAN_SECONDS and seconds >= METRICS_SLOW_SPAN_SECONDS:
+        print(f"[TRACE {current_trace_id() or '-'}] slow {stage}: {seconds:.2f}s")
+
+
+def increment(event: str, amount: float = 1):
+    registry.increment(EVENT_METRIC, {"event": event}, amount)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one observation of stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.increment(STAGE_ERROR_METRIC, {"stage": stage})
+        raise
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id():
+    return trace_id_var.get()
+
+
+def start_trace(incoming: str = None) -> str:
+    """Use the caller's trace ID when it is well formed, otherwise make a new one"""
+    trace_id = incoming if incoming and TRACE_ID_RE.match(incoming) else uuid.uuid4().hex
+    trace_id_var.set(trace_id)
+    return trace_id
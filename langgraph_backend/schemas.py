@@ -0,0 +1,71 @@
+"""
+Typed shape of the userContext sent with advice requests.
+
+These are TypedDicts, so pydantic validates them straight into plain dicts
+(cheap for rows numbering in the tens of thousands, and what the workflow
+already expects). Unknown keys on transaction, holding and monthly rows are
+dropped, which keeps the state carried through the graph compact; profile
+documents keep extra fields since they are small and vary by user.
+"""
+from typing import Any, Dict, List, Optional, Union
+from typing_extensions import TypedDict
+from pydantic import ConfigDict, with_config
+
+# Amounts arrive as numbers or as formatted strings such as "1,250.50"
+Number = Optional[Union[float, str]]
+# ISO / DD/MM/YYYY strings, or a serialized Firestore timestamp
+DateValue = Optional[Union[str, Dict[str, Any]]]
+
+
+@with_config(ConfigDict(extra="allow"))
+class UserProfile(TypedDict, total=False):
+    age: Number
+    income: Number
+    occupation: Optional[str]
+
+
+@with_config(ConfigDict(extra="allow"))
+class DetailedProfile(TypedDict, total=False):
+    employmentStatus: Optional[str]
+    financialGoals: Any
+    riskTolerance: Optional[str]
+    investmentExperience: Optional[str]
+    currentDebt: Number
+    emergencyFund: Number
+    retirementSavings: Number
+
+
+class Transaction(TypedDict, total=False):
+    date: DateValue
+    description: Optional[str]
+    amount: Number
+    balance: Number
+    category: Optional[str]
+    # Older clients: 'income' / 'expense' with a positive amount
+    type: Optional[str]
+
+
+class Holding(TypedDict, total=False):
+    name: Optional[str]
+    symbol: Optional[str]
+    quantity: Number
+    avgPrice: Number
+    currentValue: Number
+    # Older clients sent the position value here
+    value: Number
+    type: Optional[str]
+
+
+class MonthlyData(TypedDict, total=False):
+    month: Optional[str]
+    income: Number
+    expenses: Number
+    savings: Number
+
+
+class UserContext(TypedDict, total=False):
+    userProfile: Optional[UserProfile]
+    detailedProfile: Optional[DetailedProfile]
+    transactions: Optional[List[Transaction]]
+    holdings: Optional[List[Holding]]
+    monthlyData: Optional[List[MonthlyData]]
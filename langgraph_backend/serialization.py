@@ -0,0 +1,86 @@
+"""
+Request and response body encodings for the API.
+
+JSON request bodies are parsed and responses rendered with orjson, which
+is much faster than the standard json module on large profiles. Clients
+may also send MessagePack (Content-Type: application/msgpack) and ask for
+it back (Accept: application/msgpack); MessagePack needs the optional
+ormsgpack package.
+"""
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+
+try:
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def is_msgpack(media_type) -> bool:
+    return (media_type or "").split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def wants_msgpack(request: Request) -> bool:
+    """True when the client lists a MessagePack type in Accept and the server can produce it"""
+    accept = request.headers.get("accept", "")
+    return ormsgpack is not None and any(is_msgpack(part) for part in accept.split(","))
+
+
+class FastBodyRequest(Request):
+    """Decodes the body with orjson, or with ormsgpack for MessagePack requests"""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            body = await self.body()
+            if self.scope.get("msgpack_body"):
+                self._json = ormsgpack.unpackb(body)
+            else:
+                self._json = orjson.loads(body)
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route class that parses bodies with FastBodyRequest. FastAPI only hands
+    JSON content types to Request.json(), so a MessagePack request is
+    relabelled as JSON here and decoded by FastBodyRequest instead.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            scope = request.scope
+            if is_msgpack(request.headers.get("content-type")):
+                if ormsgpack is None:
+                    raise HTTPException(status_code=415, detail="MessagePack is not supported by this server")
+                headers = [(k, v) for k, v in scope["headers"] if k != b"content-type"]
+                headers.append((b"content-type", b"application/json"))
+                scope = dict(scope, headers=headers, msgpack_body=True)
+            return await handler(FastBodyRequest(scope, request.receive))
+
+        return route_handler
+
+
+class OrjsonResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return ormsgpack.packb(content, option=ormsgpack.OPT_NON_STR_KEYS | ormsgpack.OPT_SERIALIZE_NUMPY)
+
+
+def negotiated_response(request: Request, content, status_code: int = 200) -> Response:
+    """Render content as MessagePack when the client asked for it, otherwise as JSON"""
+    response_class = MsgPackResponse if wants_msgpack(request) else OrjsonResponse
+    return response_class(content, status_code=status_code, headers={"Vary": "Accept"})
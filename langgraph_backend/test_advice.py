@@ -0,0 +1,32 @@
+"""Tests for the /financial-advice response shape"""
+
+
+def test_default_response_is_compact(client):
+    body = client.post("/financial-advice", json={"question": "What is a SIP?"}).json()
+    assert set(body) == {"final", "meta"}
+    assert set(body["final"]["tool_use"]) == {"response"}
+    assert body["meta"]["steps"] == ["planner", "tool_use"]
+
+
+def test_fields_adds_parts_of_the_final_step(client):
+    body = client.post("/financial-advice?fields=context,question", json={"question": "What is a SIP?"}).json()
+    assert set(body["final"]["tool_use"]) == {"response", "context", "question"}
+
+
+def test_verbose_trace_does_not_echo_the_user_context(client):
+    context = {"userProfile": {"age": 30, "income": 90000}, "transactions": [{"amount": 250}] * 100}
+    body = client.post("/financial-advice?verbose=true",
+                       json={"question": "What is a SIP?", "userContext": context}).json()
+    planner = body["intermediate"][0]["planner"]
+    assert planner["next_step"] == "use_rag"
+    assert "userContext" not in planner
+    assert all("userContext" not in payload for step in body["intermediate"] for payload in step.values())
+
+
+def test_direct_answers_still_use_the_user_context(client):
+    context = {"holdings": [{"name": "Index fund", "currentValue": 60000, "investedAmount": 50000},
+                            {"name": "Gold", "currentValue": 40000, "investedAmount": 45000}]}
+    body = client.post("/financial-advice?verbose=true",
+                       json={"question": "How diversified is my portfolio?", "userContext": context}).json()
+    assert "calculator" in body["final"]
+    assert body["final"]["calculator"]["structuredData"]["type"] == "analyze_portfolio"
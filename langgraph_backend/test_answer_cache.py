@@ -0,0 +1,133 @@
+"""Tests for the in-process answer cache"""
+
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, normalize_question, profile_fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(answer_cache, "time", fake)
+    return fake
+
+
+def answer(text):
+    return {"context": "", "result": text, "response": text}
+
+
+def test_normalize_question_ignores_case_punctuation_and_spacing():
+    assert normalize_question("  What is a SIP?? ") == normalize_question("what is a sip")
+
+
+def test_profile_fingerprint_is_empty_for_anonymous_users():
+    assert profile_fingerprint("") == ""
+    assert profile_fingerprint("Income: 50000") != profile_fingerprint("Income: 60000")
+
+
+def test_hit_on_normalized_question_for_same_profile_only(clock):
+    cache = AnswerCache()
+    cache.put("What is a SIP?", "profile-a", answer("sip"))
+
+    assert cache.get("what is a sip", "profile-a")["result"] == "sip"
+    assert cache.get("What is a SIP?", "profile-b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("first", "", answer("1"))
+    clock.now += 30
+    cache.put("second", "", answer("2"))
+
+    clock.now += 31
+    assert cache.get("first") is None
+    assert cache.get("second")["result"] == "2"
+    clock.now += 30
+    assert cache.get("second") is None
+    assert cache.stats()["expirations"] == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_rewriting_an_entry_renews_its_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("question", "", answer("old"))
+    clock.now += 50
+    cache.put("question", "", answer("new"))
+    clock.now += 50
+    assert cache.get("question")["result"] == "new"
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AnswerCache(max_entries=2)
+    cache.put("a", "", answer("a"))
+    cache.put("b", "", answer("b"))
+    cache.get("a")
+    cache.put("c", "", answer("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_semantic_lookup_only_considers_the_same_profile(clock):
+    vectors = {
+        "how do i start a sip": np.array([1.0, 0.0]),
+        "how can i begin a sip": np.array([0.9, 0.1]),
+        "what is term insurance": np.array([0.0, 1.0]),
+    }
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return vectors[text]
+
+    cache = AnswerCache(similarity_threshold=0.9, embed_fn=embed)
+    cache.put("How do I start a SIP?", "profile-a", answer("start"))
+
+    assert cache.get("How can I begin a SIP?", "profile-a")["result"] == "start"
+    assert cache.get("What is term insurance?", "profile-a") is None
+    # No cached questions for this profile, so nothing is embedded for the lookup
+    calls = len(embedded)
+    assert cache.get("How can I begin a SIP?", "profile-b") is None
+    assert len(embedded) == calls
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_expired_entries_leave_the_semantic_index(clock):
+    cache = AnswerCache(ttl_seconds=10, similarity_threshold=0.5, embed_fn=lambda text: np.array([1.0, 0.0]))
+    cache.put("question one", "p", answer("1"))
+    clock.now += 11
+    assert cache.get("question two", "p") is None
+    assert cache._embeddings == {}
+
+
+def test_get_many_looks_up_repeated_questions_once(clock):
+    embedded = []
+
+    def embed_many(texts):
+        embedded.append(list(texts))
+        return np.array([[1.0, 0.0]] * len(texts))
+
+    cache = AnswerCache(similarity_threshold=0.99, embed_many_fn=embed_many)
+    cache.put("cached question", "p", answer("cached"))
+    embedded.clear()
+
+    values = cache.get_many([("Cached question?", "p"), ("new one", "p"), ("New one!", "p"), ("new one", "q")])
+    assert [value and value["result"] for value in values] == ["cached", "cached", "cached", None]
+    # The profile without cached questions needs no embedding
+    assert embedded == [["new one"]]
+    stats = cache.stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
@@ -0,0 +1,90 @@
+"""Tests for the article scraper: robots.txt, per-host pacing and the resumable queue"""
+
+import asyncio
+import os
+import time
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from tools import articles_scaraper
+from tools.articles_scaraper import ScrapeQueue, scrape
+from tools.fetcher import AsyncFetcher, TokenBucket
+
+ARTICLE = "<html><title>What is a SIP</title><body><article>" + "A SIP invests a fixed amount every month. " * 10 + "</article></body></html>"
+ROBOTS = "User-agent: *\nDisallow: /private\nCrawl-delay: 0.01\n"
+
+
+def robots(text: str) -> RobotFileParser:
+    parser = RobotFileParser()
+    parser.parse(text.splitlines())
+    return parser
+
+
+def test_data_paths_do_not_depend_on_the_working_directory():
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(articles_scaraper.__file__)))
+    for path in (articles_scaraper.SAVE_DIR, articles_scaraper.QUEUE_FILE):
+        assert os.path.isabs(path)
+        assert os.path.commonpath([os.path.abspath(path), package_dir]) == package_dir
+
+
+def test_scrape_honours_robots_txt(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        if request.url.path == "/robots.txt":
+            return httpx.Response(200, text=ROBOTS)
+        if request.url.path == "/short":
+            return httpx.Response(200, text="<p>Too short</p>")
+        return httpx.Response(200, text=ARTICLE)
+
+    urls = ["https://blog.test/sip", "https://blog.test/private/draft", "https://blog.test/short"]
+    queue = asyncio.run(scrape(urls, save_dir=str(tmp_path / "articles"), queue_path=str(tmp_path / "queue.json"),
+                               parse_workers=0, transport=httpx.MockTransport(handler)))
+
+    assert requests.count("/robots.txt") == 1
+    assert "/private/draft" not in requests
+    assert list(queue.done) == ["https://blog.test/sip"]
+    assert queue.failed["https://blog.test/private/draft"]["error"] == "disallowed by robots.txt"
+    assert queue.failed["https://blog.test/short"]["error"] == "insufficient content"
+    assert queue.pending == []
+    with open(tmp_path / "articles" / "What_is_a_SIP.txt", encoding="utf-8") as f:
+        assert f.readline() == "Title: What is a SIP\n"
+
+
+def test_host_rate_is_capped_by_robots_txt():
+    fetcher = AsyncFetcher(rate_per_host=4.0)
+    assert fetcher._host_rate(None) == 4.0
+    assert fetcher._host_rate(robots("User-agent: *\nCrawl-delay: 2\n")) == 0.5
+    assert fetcher._host_rate(robots("User-agent: *\nRequest-rate: 1/5\n")) == 0.2
+    # A host asking for less delay than our own limit does not speed us up
+    assert fetcher._host_rate(robots("User-agent: *\nCrawl-delay: 0.1\n")) == 4.0
+    assert AsyncFetcher()._host_rate(None) is None
+
+
+def test_token_bucket_paces_requests_after_the_burst():
+    async def acquire(bucket, count):
+        start = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire(TokenBucket(rate=20, capacity=3), 3)) < 0.04
+    # Three after the burst of one, 50ms apart
+    assert asyncio.run(acquire(TokenBucket(rate=20, capacity=1), 4)) >= 0.14
+
+
+def test_queue_resumes_pending_and_retries_failed(tmp_path):
+    path = str(tmp_path / "state" / "queue.json")
+    queue = ScrapeQueue(path)
+    queue.add(["https://a.test/1", "https://a.test/2", "https://a.test/3"])
+    queue.mark_done("https://a.test/1", {"status": 200})
+    queue.mark_failed("https://a.test/2", {"error": "HTTP 500"})
+    queue.save()
+
+    resumed = ScrapeQueue(path)
+    assert resumed.pending == ["https://a.test/3"]
+    resumed.add(["https://a.test/1", "https://a.test/2", "https://a.test/3"])
+    assert resumed.pending == ["https://a.test/3", "https://a.test/2"]
+    assert resumed.failed == {}
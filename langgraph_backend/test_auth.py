@@ -0,0 +1,158 @@
+"""Tests for the verified-token cache and session revocation"""
+
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+from auth import TokenCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(auth, "time", fake)
+    return fake
+
+
+def claims(uid="alice", exp_in=3600, iat_ago=0, now=1_700_000_000):
+    return {"uid": uid, "exp": now + exp_in, "iat": now - iat_ago}
+
+
+def test_entries_expire_after_max_ttl_when_the_token_lives_longer(clock):
+    cache = TokenCache(max_ttl=300)
+    cache.put("token", claims(exp_in=3600))
+    clock.now += 299
+    assert cache.get("token")["uid"] == "alice"
+    clock.now += 1
+    assert cache.get("token") is None
+
+
+def test_entries_expire_with_the_token(clock):
+    cache = TokenCache(max_ttl=300)
+    cache.put("token", claims(exp_in=60))
+    clock.now += 60
+    assert cache.get("token") is None
+    # Already expired tokens are not cached at all
+    cache.put("old", claims(exp_in=0))
+    assert cache._entries == {}
+
+
+def test_tokens_are_stored_only_as_sha256(clock):
+    cache = TokenCache()
+    cache.put("raw.jwt.value", claims())
+    assert list(cache._entries) == [hashlib.sha256(b"raw.jwt.value").hexdigest()]
+    assert "raw.jwt.value" not in repr(cache._entries)
+
+
+def test_least_recently_used_token_is_evicted(clock):
+    cache = TokenCache(max_entries=2)
+    cache.put("a", claims("a"))
+    cache.put("b", claims("b"))
+    cache.get("a")
+    cache.put("c", claims("c"))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_invalidate_user_drops_only_their_tokens(clock):
+    cache = TokenCache()
+    cache.put("alice-phone", claims("alice"))
+    cache.put("alice-laptop", claims("alice"))
+    cache.put("bob", claims("bob"))
+
+    assert cache.invalidate_user("alice") == 2
+    assert cache.get("alice-phone") is None and cache.get("alice-laptop") is None
+    assert cache.get("bob")["uid"] == "bob"
+
+
+def test_tokens_issued_before_a_revocation_are_rejected(clock):
+    cache = TokenCache()
+    cache.invalidate_user("alice")
+    assert cache.is_revoked(claims("alice", iat_ago=1, now=clock.now))
+    assert not cache.is_revoked(claims("alice", now=clock.now))
+    assert not cache.is_revoked(claims("bob", iat_ago=1, now=clock.now))
+    # Revocations older than any live token are forgotten
+    clock.now += auth.ID_TOKEN_LIFETIME + 1
+    cache.invalidate_user("bob")
+    assert set(cache._revoked) == {"bob"}
+
+
+class FakeFirebaseAuth:
+    """Stands in for firebase_admin.auth with a configured app"""
+
+    RevokedIdTokenError = type("RevokedIdTokenError", (Exception,), {})
+    ExpiredIdTokenError = type("ExpiredIdTokenError", (Exception,), {})
+    InvalidIdTokenError = type("InvalidIdTokenError", (Exception,), {})
+
+    def __init__(self, decoded):
+        self.decoded = decoded
+        self.verified = 0
+        self.revoked = []
+
+    def verify_id_token(self, token, app=None, check_revoked=False):
+        self.verified += 1
+        return dict(self.decoded)
+
+    def revoke_refresh_tokens(self, uid, app=None):
+        self.revoked.append(uid)
+
+
+@pytest.fixture
+def firebase(monkeypatch):
+    fake = FakeFirebaseAuth({"uid": "alice", "email": "a@example.com", "exp": 2**40, "iat": 1_000})
+    monkeypatch.setattr(auth, "auth", fake, raising=False)
+    monkeypatch.setattr(auth, "firebase_app", object())
+    monkeypatch.setattr(auth, "token_cache", TokenCache())
+    return fake
+
+
+def test_revoking_sessions_rejects_the_tokens_already_held(firebase):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="alice-token")
+    verify = lambda: asyncio.run(auth.verify_firebase_token(credentials))
+    assert verify()["uid"] == "alice"
+    assert verify()["uid"] == "alice"
+    assert firebase.verified == 1
+
+    assert auth.revoke_user_sessions("alice") == 1
+    assert firebase.revoked == ["alice"]
+    with pytest.raises(HTTPException) as raised:
+        verify()
+    assert raised.value.detail == "Token revoked"
+
+
+def test_revoke_endpoint_signs_the_caller_out(client, monkeypatch):
+    monkeypatch.setenv("ENVIRONMENT", "development")
+    monkeypatch.setattr(auth, "firebase_app", None)
+    response = client.post("/auth/revoke-sessions")
+    assert response.status_code == 200
+    assert response.json() == {"status": "revoked", "cached_tokens_dropped": 0}
+    assert "dev-user" in auth.token_cache._revoked
+
+
+def test_cert_refresh_falls_back_when_firebase_internals_change(firebase):
+    # FakeFirebaseAuth has no _get_client, like a firebase-admin release that moved it
+    assert auth.refresh_signing_certs() is False
+    auth.start_cert_refresh()
+    assert auth._cert_refresh_thread is None
+
+
+def test_cert_refresh_bypasses_the_http_cache(firebase, monkeypatch):
+    requests = []
+    verifier = type("Verifier", (), {"request": lambda self, url, headers=None: requests.append((url, headers))})()
+    client = type("Client", (), {"_token_verifier": verifier})()
+    monkeypatch.setattr(firebase, "_get_client", lambda app: client, raising=False)
+
+    assert auth.refresh_signing_certs() is True
+    assert requests == [(auth.ID_TOKEN_CERT_URL, {"Cache-Control": "no-cache"})]
@@ -0,0 +1,108 @@
+"""Tests for batch advice"""
+
+import numpy as np
+import pytest
+
+import answer_cache
+import batch
+import main
+from answer_cache import AnswerCache
+from batch import run_batch
+from conftest import CONTEXT
+
+VECTORS = {
+    "how can i begin a sip": [1.0, 0.1, 0.0],
+    "how do i start a sip": [1.0, 0.12, 0.0],
+    "what is a sip": [0.0, 1.0, 0.0],
+    "what is term insurance": [0.0, 0.0, 1.0],
+}
+
+
+@pytest.fixture
+def retrieval(monkeypatch):
+    calls = []
+
+    def query_rag_batch(questions):
+        questions = list(questions)
+        calls.append(questions)
+        return [CONTEXT] * len(questions)
+
+    monkeypatch.setattr(batch, "query_rag_batch", query_rag_batch)
+    return calls
+
+
+@pytest.fixture
+def semantic_cache(monkeypatch):
+    embedded = []
+
+    def embed_many(texts):
+        embedded.append(list(texts))
+        return np.array([VECTORS[text] for text in texts])
+
+    cache = AnswerCache(similarity_threshold=0.9, embed_many_fn=embed_many)
+    monkeypatch.setattr(answer_cache, "_answer_cache", cache)
+    return cache, embedded
+
+
+def test_cache_lookup_embeds_the_distinct_questions_once(stub_llm, retrieval, semantic_cache):
+    cache, embedded = semantic_cache
+    cache.put("How can I begin a SIP?", "", {"context": CONTEXT, "result": "begin", "response": "begin"})
+    embedded.clear()
+
+    questions = ["What is a SIP?", "what is a sip", "How do I start a SIP?", "What is term insurance?"]
+    results, stats = run_batch([{"question": question, "userContext": None} for question in questions])
+
+    # One batched embedding for the lookups; later calls embed the new answers as they are cached
+    assert sorted(embedded[0]) == ["how do i start a sip", "what is a sip", "what is term insurance"]
+    assert all(len(texts) == 1 for texts in embedded[1:])
+    assert retrieval == [["What is a SIP?", "What is term insurance?"]]
+    assert (stats["cache_hits"], stats["distinct_questions"], stats["generations"]) == (1, 2, 2)
+
+    assert results[2]["payload"]["response"] == "begin"
+    assert results[2]["payload"]["cached"] is True
+    assert results[0]["payload"]["response"] == results[1]["payload"]["response"]
+    assert results[1]["payload"]["question"] == "what is a sip"
+
+
+def ask_batch(client, questions, **params):
+    return client.post("/financial-advice/batch", params=params,
+                       json={"items": [{"question": question} for question in questions]})
+
+
+def test_batch_endpoint_reports_invalid_items_in_place(client, retrieval):
+    response = ask_batch(client, ["What is a SIP?", "", "How do I start a SIP?"])
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [item["index"] for item in body["results"]] == [0, 1, 2]
+    assert body["results"][1]["error"]["type"] == "ValidationError"
+    assert "response" in body["results"][0]["final"]["tool_use"]
+    assert "response" in body["results"][2]["final"]["tool_use"]
+    assert (body["meta"]["items"], body["meta"]["invalid"], body["meta"]["errors"]) == (3, 1, 1)
+    # Invalid items never reach retrieval
+    assert retrieval == [["What is a SIP?", "How do I start a SIP?"]]
+
+
+def test_batch_endpoint_isolates_a_failing_item(client, retrieval, monkeypatch):
+    generate_response = batch.generate_response
+
+    def flaky(question, rag_context, summary):
+        if "insurance" in question:
+            raise RuntimeError("model unavailable")
+        return generate_response(question, rag_context, summary)
+
+    monkeypatch.setattr(batch, "generate_response", flaky)
+    body = ask_batch(client, ["What is term insurance?", "What is a SIP?", "what is term insurance"]).json()
+
+    assert body["results"][0]["error"] == {"type": "RuntimeError", "detail": "model unavailable"}
+    assert body["results"][2]["error"] == body["results"][0]["error"]
+    assert "response" in body["results"][1]["final"]["tool_use"]
+    assert (body["meta"]["invalid"], body["meta"]["errors"], body["meta"]["generations"]) == (0, 2, 2)
+
+
+def test_batch_endpoint_rejects_empty_and_oversized_batches(client, monkeypatch):
+    assert ask_batch(client, []).status_code == 400
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    response = ask_batch(client, ["a?", "b?", "c?"])
+    assert response.status_code == 400
+    assert "max 2" in response.json()["detail"]
@@ -0,0 +1,111 @@
+"""Tests for the closed-form financial calculators"""
+
+import numpy as np
+import pytest
+
+from tools.calculators import (
+    amortization_schedule, cagr, compound_future_value, emi, portfolio_analysis,
+    required_monthly_investment, roi, sip_future_value, sip_projection, xirr,
+)
+
+
+def test_emi_matches_the_standard_formula():
+    # 10 lakh at 9% for 5 years
+    assert float(emi(1_000_000, 9, 60)) == pytest.approx(20758.36, abs=0.01)
+
+
+def test_emi_at_zero_interest_splits_the_principal_evenly():
+    assert float(emi(120_000, 0, 12)) == pytest.approx(10_000)
+
+
+def test_emi_broadcasts_over_amounts_and_rates():
+    grid = emi([1e6, 2e6, 3e6], [[8], [9], [10]], 240)
+    assert grid.shape == (3, 3)
+    assert grid[1, 1] == pytest.approx(float(emi(2e6, 9, 240)))
+
+
+def test_amortization_schedule_repays_the_loan():
+    schedule = amortization_schedule(500_000, 10, 36)
+    assert schedule["balance"][-1] == pytest.approx(0, abs=1e-6)
+    assert schedule["principal"].sum() == pytest.approx(500_000)
+    assert schedule["total_payment"] == pytest.approx(float(schedule["emi"]) * 36)
+    # Interest share falls as the balance is paid down
+    assert schedule["interest"][0] > schedule["interest"][-1]
+
+
+def test_roi_and_cagr():
+    assert float(roi(100_000, 250_000)) == pytest.approx(150.0)
+    # Doubling in 6 years is about 12.25% a year
+    assert float(cagr(100, 200, 6)) == pytest.approx(12.246, abs=1e-3)
+
+
+def test_compound_future_value_compounds_monthly():
+    assert float(compound_future_value(100_000, 12, 1)) == pytest.approx(100_000 * 1.01 ** 12)
+
+
+def test_sip_future_value_is_an_annuity_due():
+    rate = 0.01
+    expected = 5000 * ((1 + rate) ** 120 - 1) / rate * (1 + rate)
+    assert float(sip_future_value(5000, 12, 120)) == pytest.approx(expected)
+    assert float(sip_future_value(5000, 0, 120)) == pytest.approx(600_000)
+
+
+def test_sip_projection_ends_at_the_future_value():
+    projection = sip_projection(5000, 12, 10)
+    assert projection["invested"][-1] == pytest.approx(600_000)
+    assert projection["value"][-1] == pytest.approx(float(sip_future_value(5000, 12, 120)))
+
+
+def test_required_monthly_investment_reaches_the_target():
+    monthly = float(required_monthly_investment(10_000_000, 12, 180, current_savings=500_000))
+    reached = float(sip_future_value(monthly, 12, 180) + compound_future_value(500_000, 12, 15))
+    assert reached == pytest.approx(10_000_000)
+
+
+def test_xirr_of_a_single_investment_equals_cagr():
+    dates = np.array(["2020-01-01", "2023-01-01"], dtype="datetime64[D]")
+    rate = float(xirr([-100_000, 150_000], dates))
+    days = float((dates[1] - dates[0]).astype(int))
+    assert rate == pytest.approx(((1.5 ** (365 / days)) - 1) * 100, abs=1e-6)
+
+
+def test_xirr_of_staggered_investments():
+    dates = np.array(["2020-01-15", "2021-03-15", "2024-01-15"], dtype="datetime64[D]")
+    amounts = np.array([-50_000, -30_000, 110_000])
+    rate = float(xirr(amounts, dates))
+    years = (dates - dates[0]).astype(float) / 365
+    assert (amounts * (1 + rate / 100) ** -years).sum() == pytest.approx(0, abs=1e-4)
+
+
+@pytest.mark.filterwarnings("error")
+def test_xirr_of_a_long_heavy_loss_converges_without_overflow_warnings():
+    # The first Newton step overshoots past -100% and (0.0001 ** -100) overflows
+    rate = float(xirr([-100, 1], [0, 36500]))
+    assert rate == pytest.approx(((1 / 100) ** (1 / 100) - 1) * 100, abs=1e-6)
+
+
+@pytest.mark.filterwarnings("error")
+def test_xirr_of_diverging_scenarios_is_nan_without_warnings():
+    rng = np.random.default_rng(0)
+    amounts = rng.normal(size=(1000, 6)) * 1000
+    amounts[:, 0] = -np.abs(amounts[:, 0]) - 1
+    days = np.sort(rng.integers(0, 40000, size=(1000, 6)), axis=1)
+    rates = xirr(amounts, days)
+    assert np.isnan(rates).any() and np.isfinite(rates).any()
+    # Every rate reported is a root of its cash flows
+    finite = np.isfinite(rates)
+    years = (days - days[:, :1])[finite] / 365
+    flows = amounts[finite] * (1 + rates[finite, None] / 100) ** -years
+    assert (np.abs(flows.sum(axis=1)) / np.abs(flows).sum(axis=1)).max() < 1e-9
+
+
+def test_xirr_without_a_sign_change_is_nan():
+    assert np.isnan(xirr([-100, -100], [0, 365]))
+
+
+def test_portfolio_analysis_concentration():
+    analysis = portfolio_analysis([50, 25, 25], [40, 30, 30])
+    assert analysis["total_value"] == pytest.approx(100)
+    assert analysis["top_weight"] == pytest.approx(0.5)
+    assert analysis["hhi"] == pytest.approx(0.375)
+    assert analysis["gain"] == pytest.approx(0)
@@ -0,0 +1,112 @@
+"""Tests for the on-disk embedding cache"""
+
+import numpy as np
+import pytest
+
+from tools import local_embeddings, rag_tool
+from tools.embedding_cache import EmbeddingCache, cache_namespace, embedding_key
+from tools.local_embeddings import register_embedder
+
+
+def key(text):
+    return embedding_key("model", "retrieval_document", text)
+
+
+def test_put_then_get(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many([key("a"), key("b")], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many([key("b"), key("c"), key("a")]) == [[3.0, 4.0], None, [1.0, 2.0]]
+    assert len(cache) == 2
+
+
+def test_vectors_survive_a_reload(tmp_path):
+    EmbeddingCache(str(tmp_path)).put_many([key("a")], [[0.5, 0.25, 0.125]])
+    cache = EmbeddingCache(str(tmp_path))
+    assert cache.get_many([key("a")]) == [[0.5, 0.25, 0.125]]
+    # Already cached keys are not appended again
+    cache.put_many([key("a")], [[9.0, 9.0, 9.0]])
+    assert len(EmbeddingCache(str(tmp_path))) == 1
+
+
+def test_writers_see_each_others_rows(tmp_path):
+    first, second = EmbeddingCache(str(tmp_path)), EmbeddingCache(str(tmp_path))
+    first.put_many([key("a")], [[1.0, 0.0]])
+    second.put_many([key("b")], [[0.0, 1.0]])
+    assert EmbeddingCache(str(tmp_path)).get_many([key("a"), key("b")]) == [[1.0, 0.0], [0.0, 1.0]]
+
+
+def test_partially_written_row_is_ignored(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many([key("a"), key("b")], [[1.0, 2.0], [3.0, 4.0]])
+    with open(cache.vectors_path, "r+b") as f:
+        f.truncate(12)
+    reloaded = EmbeddingCache(str(tmp_path))
+    assert reloaded.get_many([key("a"), key("b")]) == [[1.0, 2.0], None]
+    reloaded.put_many([key("b")], [[5.0, 6.0]])
+    assert EmbeddingCache(str(tmp_path)).get_many([key("b")]) == [[5.0, 6.0]]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many([key("a")], [[1.0, 2.0]])
+    with pytest.raises(ValueError):
+        cache.put_many([key("b")], [[1.0, 2.0, 3.0]])
+    assert cache.get_many([key("b")]) == [None]
+
+
+def test_cache_namespace_is_a_safe_directory_name():
+    assert cache_namespace("sentence-transformers", "sentence-transformers/all-MiniLM-L6-v2") == \
+        "sentence-transformers-sentence-transformers-all-MiniLM-L6-v2"
+    assert cache_namespace("gemini", "models/embedding-001") == "gemini-models-embedding-001"
+
+
+class FakeEmbedder:
+    cacheable = True
+    batch_size = 16
+    max_workers = 1
+
+    def __init__(self, name, dim):
+        self.name = name
+        self.dim = dim
+        self.embedding_model = f"fake-{dim}"
+        self.calls = 0
+
+    def embed(self, texts, task_type=None, model_name=None):
+        self.calls += 1
+        return np.full((len(texts), self.dim), 0.5, dtype=np.float32).tolist()
+
+
+@pytest.fixture
+def shared_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_tool, "EMBEDDING_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(rag_tool, "_embedding_caches", {})
+    monkeypatch.setattr(local_embeddings, "_embedder_factories", dict(local_embeddings._embedder_factories))
+    monkeypatch.setattr(local_embeddings, "_embedders", {})
+    return tmp_path
+
+
+def test_switching_backends_over_one_cache_dir(shared_cache_dir):
+    small, large = FakeEmbedder("fake-small", 384), FakeEmbedder("fake-large", 768)
+    register_embedder(small.name, lambda: small)
+    register_embedder(large.name, lambda: large)
+    texts = ["What is a SIP?", "How do index funds work?"]
+
+    for embedder in (small, large, small, large):
+        vectors = rag_tool.GeminiEmbeddings(backend=embedder.name).embed_documents(texts)
+        assert np.shape(vectors) == (2, embedder.dim)
+    # The second pass of each backend is served from its own cache
+    assert (small.calls, large.calls) == (1, 1)
+    assert sorted(path.name for path in shared_cache_dir.iterdir()) == ["fake-large-fake-768", "fake-small-fake-384"]
+
+
+def test_cache_write_failure_still_returns_vectors(shared_cache_dir, capsys):
+    embedder = FakeEmbedder("fake-resized", 384)
+    register_embedder(embedder.name, lambda: embedder)
+    # A cache left over from the same model name at another size
+    EmbeddingCache(str(shared_cache_dir / cache_namespace(embedder.name, embedder.embedding_model))).put_many(
+        [key("old")], [[1.0, 2.0]])
+
+    vectors = rag_tool.GeminiEmbeddings(backend=embedder.name).embed_documents(["What is a SIP?"])
+    assert np.shape(vectors) == (1, 384)
+    assert "Could not write embedding cache" in capsys.readouterr().out
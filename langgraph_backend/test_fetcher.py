@@ -0,0 +1,117 @@
+"""Tests for the async ingestion fetcher, against httpx.MockTransport"""
+
+import asyncio
+
+import httpx
+
+from tools.fetcher import AsyncFetcher, ValidatorStore
+from tools.ingest_docs import fetch_articles
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_per_host_concurrency_is_capped():
+    active, peak = {}, {}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, text="ok")
+
+    async def fetch():
+        async with AsyncFetcher(per_host=2, transport=httpx.MockTransport(handler)) as fetcher:
+            urls = [f"https://{host}/page/{i}" for host in ("a.test", "b.test") for i in range(6)]
+            return await fetcher.fetch_all(urls)
+
+    results = run(fetch())
+    assert all(result.ok for result in results)
+    assert peak == {"a.test": 2, "b.test": 2}
+
+
+def test_unchanged_pages_come_back_as_not_modified(tmp_path):
+    seen = []
+
+    def handler(request):
+        seen.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="article", headers={"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    path = str(tmp_path / "validators.json")
+
+    async def fetch(validators):
+        async with AsyncFetcher(validators=validators, transport=httpx.MockTransport(handler)) as fetcher:
+            return await fetcher.fetch("https://site.test/article")
+
+    validators = ValidatorStore(path)
+    first = run(fetch(validators))
+    assert first.ok and first.text == "article"
+    assert "if-none-match" not in seen[0]
+    validators.save()
+
+    # A later run reads the saved validators and sends them back
+    second = run(fetch(ValidatorStore(path)))
+    assert second.not_modified and not second.ok
+    assert seen[1]["if-none-match"] == '"v1"'
+    assert seen[1]["if-modified-since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def test_unconditional_fetch_ignores_validators(tmp_path):
+    validators = ValidatorStore(str(tmp_path / "validators.json"))
+    validators.update("https://site.test/a", {"etag": '"v1"'})
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        return httpx.Response(200, text="fresh")
+
+    async def fetch():
+        async with AsyncFetcher(validators=validators, transport=httpx.MockTransport(handler)) as fetcher:
+            return await fetcher.fetch("https://site.test/a", conditional=False)
+
+    assert run(fetch()).text == "fresh"
+    assert seen == [None]
+
+
+def test_errors_are_returned_per_url():
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        if request.url.path == "/down":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, text="ok")
+
+    async def fetch():
+        async with AsyncFetcher(transport=httpx.MockTransport(handler)) as fetcher:
+            return await fetcher.fetch_all(["https://site.test/ok", "https://site.test/missing", "https://site.test/down"])
+
+    ok, missing, down = run(fetch())
+    assert ok.ok
+    assert (missing.status, missing.error) == (404, "HTTP 404")
+    assert down.status is None and "connection refused" in down.error
+
+
+def test_fetch_articles_saves_then_skips_unchanged(tmp_path):
+    def handler(request):
+        if request.url.host == "www.google.com":
+            return httpx.Response(200, text='<a href="/url?q=https://blog.test/sip&sa=U">SIP</a>')
+        if request.headers.get("if-none-match") == '"sip-1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text="<p>SIPs invest monthly.</p><p>Start early.</p>", headers={"ETag": '"sip-1"'})
+
+    validators = ValidatorStore(str(tmp_path / "validators.json"))
+    articles_dir = str(tmp_path / "articles")
+
+    async def fetch():
+        async with AsyncFetcher(validators=validators, transport=httpx.MockTransport(handler)) as fetcher:
+            return await fetch_articles(["what is a sip"], articles_dir, fetcher)
+
+    assert run(fetch()) == [("what is a sip", "saved")]
+    with open(tmp_path / "articles" / "what_is_a_sip.txt", encoding="utf-8") as f:
+        assert f.read() == "SIPs invest monthly.\nStart early."
+    assert run(fetch()) == [("what is a sip", "unchanged")]
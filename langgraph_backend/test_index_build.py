@@ -0,0 +1,60 @@
+"""Tests for building the vector index from several processes at once"""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Each child counts its own builds; the sleep holds the build open long
+# enough for the other child to find the index missing as well
+CHILD = """
+import sys, time
+from tools import rag_tool
+
+builds = 0
+build = rag_tool.build_vectorstore
+
+def slow_build(docs=None):
+    global builds
+    builds += 1
+    time.sleep(1)
+    return build(docs)
+
+rag_tool.build_vectorstore = slow_build
+print("ready", flush=True)
+sys.stdin.readline()
+index = rag_tool.load_or_build_vectorstore(sys.argv[1])
+print(builds, len(index), flush=True)
+"""
+
+
+def start_child(path, env):
+    return subprocess.Popen([sys.executable, "-c", CHILD, path], cwd=BACKEND_DIR, env=env,
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+
+def test_concurrent_workers_build_an_empty_index_once(tmp_path):
+    path = str(tmp_path / "index")
+    env = dict(os.environ, EMBEDDINGS_BACKEND="hashing", VECTORSTORE_MMAP="true",
+               EMBEDDING_CACHE_DIR=str(tmp_path / "cache"))
+    children = [start_child(path, env) for _ in range(2)]
+    # Release both children only once they have imported everything
+    for child in children:
+        assert child.stdout.readline().strip() == "ready"
+    for child in children:
+        child.stdin.write("go\n")
+        child.stdin.flush()
+
+    results = []
+    for child in children:
+        out, _ = child.communicate(timeout=120)
+        assert child.returncode == 0
+        builds, size = out.split("\n")[-2].split()
+        results.append((int(builds), int(size)))
+
+    assert sorted(builds for builds, _ in results) == [0, 1]
+    assert results[0][1] == results[1][1] > 0
+    with open(os.path.join(path, "mmap", "meta.json"), encoding="utf-8") as f:
+        assert json.load(f)["count"] == results[0][1]
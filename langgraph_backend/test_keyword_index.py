@@ -0,0 +1,67 @@
+"""Tests for the BM25 keyword index behind the keyword fallback"""
+
+import math
+
+import pytest
+from langchain.docstore.document import Document
+
+from tools.keyword_index import B, K1, KeywordIndex, normalize_token, tokenize
+
+DOCS = [
+    Document(page_content="Mutual funds pool money.\nIndex funds track an index.\nFees matter.",
+             metadata={"source": "funds.txt"}),
+    Document(page_content="A SIP invests every month.\nSIP stands for systematic investment plan.",
+             metadata={"source": "sip.txt"}),
+    Document(page_content="Term insurance pays on death.\nIt has no investment component at all, unlike funds.",
+             metadata={"source": "insurance.txt"}),
+]
+
+
+@pytest.fixture
+def index():
+    return KeywordIndex.build(DOCS, corpus_fingerprint="abc")
+
+
+def test_tokens_fold_plurals_but_not_double_s():
+    assert tokenize("Funds, SIPs and class") == ["fund", "sip", "and", "class"]
+    assert normalize_token("gas") == "gas"
+
+
+def test_postings_and_lines(index):
+    assert index.postings["fund"] == {0: 2, 2: 1}
+    assert index.term_lines["sip"] == {1: [0, 1]}
+    assert index.doc_lengths[1] == len(tokenize(DOCS[1].page_content))
+
+
+def test_scores_follow_bm25(index):
+    score, doc_id = index.search("sip", k=1)[0]
+    assert doc_id == 1
+    n, df, tf = 3, 1, 2
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    length_norm = 1 - B + B * index.doc_lengths[1] / index.avg_doc_length
+    assert score == pytest.approx(idf * tf * (K1 + 1) / (tf + K1 * length_norm))
+
+
+def test_ranking_prefers_more_and_rarer_matches(index):
+    ranked = [doc_id for _, doc_id in index.search("index funds", k=3)]
+    assert ranked == [0, 2]
+    assert index.search("cryptocurrency") == []
+    assert len(index.search("funds sip insurance", k=2)) == 2
+
+
+def test_snippet_returns_matching_lines(index):
+    assert index.snippet(0, "index") == "Index funds track an index."
+    assert index.snippet(1, "systematic plan") == "SIP stands for systematic investment plan."
+    # No matching line: the start of the document
+    assert index.snippet(2, "crypto", max_chars=10) == "Term insur"
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "nested" / "keyword_index.json")
+    index.save(path)
+    loaded = KeywordIndex.load(path)
+
+    assert loaded.corpus_fingerprint == "abc"
+    assert loaded.postings == index.postings
+    assert loaded.search("index funds", k=3) == index.search("index funds", k=3)
+    assert loaded.snippet(1, "month") == index.snippet(1, "month")
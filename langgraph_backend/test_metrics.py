@@ -0,0 +1,109 @@
+"""Tests for latency histograms and request tracing"""
+
+import re
+
+import pytest
+
+import main
+import metrics
+import workflow
+from conftest import CONTEXT
+from metrics import HTTP_METRIC, TRACE_HEADER, Histogram, MetricsRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    fresh = MetricsRegistry()
+    monkeypatch.setattr(metrics, "registry", fresh)
+    monkeypatch.setattr(main, "registry", fresh)
+    return fresh
+
+
+def test_empty_histogram_quantile_is_zero():
+    assert Histogram().quantile(0.99) == 0.0
+
+
+def test_quantile_interpolates_within_a_bucket():
+    histogram = Histogram(buckets=(0.1, 0.25, 0.5))
+    for _ in range(100):
+        histogram.observe(0.2)
+    # All observations sit in (0.1, 0.25], so the median is its midpoint
+    assert histogram.quantile(0.5) == pytest.approx(0.175)
+    assert histogram.quantile(0.0) == pytest.approx(0.1)
+    assert histogram.quantile(1.0) == pytest.approx(0.25)
+
+
+def test_quantile_across_buckets():
+    histogram = Histogram(buckets=(0.0025, 0.005, 0.25, 0.5))
+    for _ in range(50):
+        histogram.observe(0.004)
+        histogram.observe(0.3)
+    assert histogram.quantile(0.5) == pytest.approx(0.005)
+    assert histogram.quantile(0.95) == pytest.approx(0.25 + 0.25 * 45 / 50)
+    assert histogram.sum == pytest.approx(50 * 0.304)
+
+
+def test_values_on_a_bound_fall_in_that_bucket():
+    histogram = Histogram(buckets=(1.0, 2.0))
+    histogram.observe(1.0)
+    assert histogram.counts == [1, 0, 0]
+
+
+def test_overflow_bucket_reports_the_last_bound():
+    histogram = Histogram(buckets=(1.0, 2.0))
+    histogram.observe(100.0)
+    assert histogram.counts == [0, 0, 1]
+    assert histogram.quantile(0.99) == 2.0
+
+
+def test_render_emits_cumulative_buckets_and_counters(registry):
+    registry.observe("stage_seconds", {"stage": "rag"}, 0.003)
+    registry.observe("stage_seconds", {"stage": "rag"}, 0.2)
+    registry.increment("events_total", {"event": 'quote"d'})
+    text = registry.render()
+
+    assert 'stage_seconds_bucket{stage="rag",le="0.0025"} 0' in text
+    assert 'stage_seconds_bucket{stage="rag",le="0.005"} 1' in text
+    assert 'stage_seconds_bucket{stage="rag",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="rag"} 2' in text
+    assert '# TYPE events_total counter' in text
+    assert 'events_total{event="quote\\"d"} 1' in text
+
+
+def test_span_records_duration_and_errors(registry):
+    with pytest.raises(ValueError):
+        with metrics.span("llm"):
+            raise ValueError("boom")
+    summary = registry.summary()
+    assert summary[metrics.STAGE_METRIC]["stage=llm"]["count"] == 1
+    assert summary[metrics.STAGE_ERROR_METRIC]["stage=llm"] == 1
+
+
+def test_incoming_trace_id_is_echoed_and_visible_to_the_workflow(client, registry, monkeypatch):
+    seen = []
+
+    def run_tool_use(state):
+        seen.append(metrics.current_trace_id())
+        return {"context": CONTEXT}
+
+    monkeypatch.setattr(workflow, "run_tool_use", run_tool_use)
+    response = client.post("/financial-advice", json={"question": "What is a SIP?"},
+                           headers={TRACE_HEADER: "req-123"})
+    assert response.headers[TRACE_HEADER] == "req-123"
+    assert seen == ["req-123"]
+
+
+@pytest.mark.parametrize("incoming", [None, "", "has spaces", "x" * 129])
+def test_missing_or_malformed_trace_ids_are_replaced(client, registry, incoming):
+    headers = {TRACE_HEADER: incoming} if incoming is not None else {}
+    response = client.get("/health", headers=headers)
+    assert re.fullmatch(r"[0-9a-f]{32}", response.headers[TRACE_HEADER])
+
+
+def test_requests_are_timed_by_route_template(client, registry):
+    client.get("/health")
+    client.get("/health")
+    client.get("/no-such-route")
+    series = registry.summary()[HTTP_METRIC]
+    assert series["method=GET,route=/health,status=200"]["count"] == 2
+    assert series["method=GET,route=unmatched,status=404"]["count"] == 1
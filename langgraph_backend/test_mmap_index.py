@@ -0,0 +1,77 @@
+"""Tests for the memory-mapped vector index"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from tools import mmap_index
+from tools.mmap_index import MmapVectorIndex
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+
+
+def write_index(path, vectors):
+    texts = [f"chunk {i} ₹" for i in range(len(vectors))]
+    metadatas = [{"source": f"article-{i % 3}.txt"} for i in range(len(vectors))]
+    MmapVectorIndex.write(str(path), vectors, texts, metadatas, {"corpus_fingerprint": "abc"})
+    return MmapVectorIndex(str(path))
+
+
+def test_write_round_trips_texts_metadata_and_meta(tmp_path, vectors):
+    index = write_index(tmp_path, vectors)
+    assert len(index) == 50
+    assert index.text(7) == "chunk 7 ₹"
+    assert index.document(7).metadata == {"source": "article-1.txt"}
+    # Repeated metadata is stored once
+    assert len(index.metadatas) == 3
+    assert index.meta["corpus_fingerprint"] == "abc"
+    assert np.array_equal(index.vectors, vectors)
+    assert not os.path.exists(tmp_path / "meta.json.tmp")
+
+
+def test_search_matches_brute_force_across_blocks(tmp_path, vectors, monkeypatch):
+    monkeypatch.setattr(mmap_index, "SEARCH_BLOCK_ROWS", 7)
+    index = write_index(tmp_path, vectors)
+    queries = vectors[[3, 20]] + 0.01
+
+    distances, ids = index.search(queries, k=5)
+    expected = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+    assert ids[:, 0].tolist() == [3, 20]
+    assert ids.tolist() == np.argsort(expected, axis=1)[:, :5].tolist()
+    assert distances == pytest.approx(np.sort(expected, axis=1)[:, :5], abs=1e-4)
+
+
+def test_search_caps_k_at_the_index_size(tmp_path, vectors):
+    index = write_index(tmp_path, vectors[:3])
+    distances, ids = index.search(vectors[0], k=10)
+    assert ids.shape == (1, 3)
+    with pytest.raises(ValueError):
+        index.search(np.zeros(4), k=1)
+
+
+def test_similarity_search_embeds_the_query(tmp_path, vectors):
+    index = write_index(tmp_path, vectors)
+    index.embed_query = lambda text: vectors[int(text)]
+    docs = index.similarity_search("12", k=2)
+    assert docs[0].page_content == "chunk 12 ₹"
+
+
+def test_inconsistent_files_are_rejected(tmp_path, vectors):
+    write_index(tmp_path, vectors)
+    with open(tmp_path / "meta.json", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["count"] = 51
+    with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError, match="inconsistent"):
+        MmapVectorIndex(str(tmp_path))
+
+
+def test_write_rejects_mismatched_lengths(tmp_path, vectors):
+    with pytest.raises(ValueError):
+        MmapVectorIndex.write(str(tmp_path), vectors, ["only one text"])
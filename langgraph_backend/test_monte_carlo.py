@@ -0,0 +1,77 @@
+"""Tests for the Monte Carlo projections behind retirement and goal questions"""
+
+import numpy as np
+import pytest
+
+from tools.monte_carlo import ValueHistogram, monthly_parameters, simulate
+from agents.simulation_agent import CORPUS_MULTIPLE, build_plan
+
+
+def test_histogram_percentiles_match_numpy():
+    values = np.random.default_rng(7).lognormal(mean=13, sigma=0.6, size=200_000)
+    histogram = ValueHistogram(1)
+    histogram.add(0, values)
+    expected = np.percentile(values, [10, 50, 90])
+    assert histogram.percentiles([10, 50, 90])[0] == pytest.approx(expected, rel=0.01)
+
+
+def test_histograms_merge_by_adding_counts():
+    values = np.random.default_rng(3).lognormal(mean=12, sigma=1, size=10_000)
+    whole, first, second = ValueHistogram(1), ValueHistogram(1), ValueHistogram(1)
+    whole.add(0, values)
+    first.add(0, values[:4000])
+    second.add(0, values[4000:])
+    first.merge(second)
+    assert np.array_equal(first.counts, whole.counts)
+
+
+def test_without_volatility_every_path_compounds_the_same():
+    result = simulate(100_000, 5000, 24, annual_return=12, volatility=0, target=200_000, paths=1000, workers=1)
+    growth = 1.12 ** (1 / 12)
+    expected = 100_000 * growth ** 24 + 5000 * (growth ** 24 - 1) / (growth - 1)
+    assert result["mean"] == pytest.approx(expected)
+    for value in result["percentiles"].values():
+        assert value == pytest.approx(expected, rel=0.01)
+    assert result["success_probability"] == 1.0
+    assert result["below_invested_probability"] == 0.0
+
+
+def test_median_of_a_lump_sum_follows_the_log_return():
+    mu, _ = monthly_parameters(10, 15)
+    result = simulate(1_000_000, 0, 120, annual_return=10, volatility=15, paths=50_000, workers=1)
+    assert result["percentiles"]["p50"] == pytest.approx(1_000_000 * np.exp(mu * 120), rel=0.02)
+    assert result["percentiles"]["p10"] < result["percentiles"]["p50"] < result["percentiles"]["p90"]
+    assert [row["year"] for row in result["yearly"]] == list(range(1, 11))
+
+
+def test_same_seed_gives_the_same_result():
+    kwargs = dict(initial=50_000, monthly_contribution=2000, months=60, annual_return=11, volatility=16,
+                  target=300_000, paths=20_000, workers=1)
+    first, second = simulate(seed=1, **kwargs), simulate(seed=1, **kwargs)
+    assert first["percentiles"] == second["percentiles"]
+    assert first["success_probability"] == second["success_probability"]
+    assert simulate(seed=2, **kwargs)["mean"] != first["mean"]
+
+
+def plan_state(next_step, calculation, user_context=None):
+    return {"next_step": next_step, "calculation": calculation, "userContext": user_context or {}}
+
+
+def test_retirement_target_comes_from_profile_expenses():
+    context = {"userProfile": {"age": 35}, "monthlyData": [{"income": 100_000, "expenses": 40_000}]}
+    plan = build_plan(plan_state("simulate_retirement", {"monthly_contribution": 20_000, "retirement_age": 60}, context))
+    assert plan["target"] == 40_000 * 12 * CORPUS_MULTIPLE
+    assert plan["months"] == 25 * 12
+    assert plan["monthly_contribution"] == 20_000
+
+
+def test_plan_without_a_target_is_rejected():
+    with pytest.raises(ValueError):
+        build_plan(plan_state("simulate_retirement", {"monthly_contribution": 5000, "retirement_age": 60}))
+    with pytest.raises(ValueError):
+        build_plan(plan_state("simulate_goal", {"current_savings": 500_000, "months": 120}))
+
+
+def test_plan_without_money_to_project_is_rejected():
+    with pytest.raises(ValueError):
+        build_plan(plan_state("simulate_goal", {"target": 1_000_000, "months": 120}))
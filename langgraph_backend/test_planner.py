@@ -0,0 +1,114 @@
+"""Tests for routing numeric questions in the planner"""
+
+import pytest
+
+from agents.planner_agent import detect_action, parse_cash_flows, parse_date, parse_money, parse_months
+
+
+def test_emi_question_is_parsed():
+    action, params = detect_action("What is the EMI on a 20 lakh home loan at 8.5% for 20 years?")
+    assert action == "calculate_emi"
+    assert params == {"principal": 2_000_000, "annual_rate": 8.5, "months": 240}
+
+
+def test_sip_projection_is_monthly():
+    action, params = detect_action("If I start a SIP of 5000 at 12% what will it become in 10 years?")
+    assert action == "project_investment"
+    assert params["amount"] == 5000 and params["monthly"] and params["months"] == 120
+
+
+def test_cagr_question_is_parsed():
+    action, params = detect_action("I invested 1 lakh and it is now worth 2 lakh after 6 years, what is my CAGR?")
+    assert action == "calculate_roi"
+    assert (params["initial"], params["final"], params["months"]) == (100_000, 200_000, 72)
+
+
+def test_goal_separates_savings_from_the_target():
+    action, params = detect_action("How much should I save to reach 50 lakh in 15 years? I have 2 lakh saved.")
+    assert action == "set_goal"
+    assert params["target"] == 5_000_000
+    assert params["current_savings"] == 200_000
+    assert params["months"] == 180
+
+
+def test_xirr_question_is_parsed():
+    question = ("What is my XIRR if I invested 50000 on 15 Jan 2020 and 30000 on 2021-03-15, "
+                "and it is worth 110000 on 15/01/2024?")
+    action, params = detect_action(question)
+    assert action == "calculate_xirr"
+    assert params["cash_flows"] == [
+        {"date": "2020-01-15", "amount": -50_000},
+        {"date": "2021-03-15", "amount": -30_000},
+        {"date": "2024-01-15", "amount": 110_000},
+    ]
+
+
+def test_xirr_without_dated_flows_goes_to_rag():
+    assert detect_action("How is XIRR different from CAGR?") == ("use_rag", {})
+
+
+@pytest.mark.parametrize("question", [
+    # An age is not an investment horizon
+    "I am 25 years old and earn 40000 per month, how much SIP should I start?",
+    # A count of children is not an amount
+    "I have 3 kids aged 5, 8 and 12, how much should I save for their education?",
+    # Inflation erodes value, it does not grow it
+    "What will 10 lakh be worth in 20 years with 6% inflation?",
+    # Prepaying versus investing needs a comparison, not a bare EMI
+    "Should I prepay my 30 lakh home loan at 9% for 20 years or invest the EMI amount?",
+    # Salary is income, not savings or a target
+    "My salary is 80000 per month, how much should I invest to reach my goal in 10 years?",
+])
+def test_ambiguous_questions_go_to_rag(question):
+    assert detect_action(question) == ("use_rag", {})
+
+
+def test_salary_is_not_counted_as_savings():
+    money = parse_money("my salary is 1 lakh a month and i have 5 lakh saved")
+    assert [amount["value"] for amount in money] == [100_000, 500_000]
+    assert money[0]["income"] and not money[0]["savings"]
+    assert money[1]["savings"] and not money[1]["income"]
+
+
+def test_parse_months_ignores_ages():
+    assert parse_months("i am 30 years old") is None
+    assert parse_months("a 30-year-old investing for 15 years") == 180
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2021-03-15", "2021-03-15"),
+    ("15/03/2021", "2021-03-15"),
+    ("15 mar 2021", "2021-03-15"),
+    ("march 15, 2021", "2021-03-15"),
+    ("march 2021", "2021-03-01"),
+])
+def test_parse_date_formats(text, expected):
+    assert str(parse_date(text)) == expected
+
+
+def test_parse_date_rejects_invalid_dates():
+    with pytest.raises(ValueError):
+        parse_date("31/02/2021")
+
+
+def test_cash_flows_need_an_investment_and_a_return():
+    assert parse_cash_flows("i invested 50000 on 2020-01-15") is None
+
+
+def test_monthly_amount_is_a_contribution_not_the_target():
+    action, params = detect_action("Can I retire at 60 if I invest 5000 per month?")
+    assert action == "simulate_retirement"
+    assert params["monthly_contribution"] == 5000
+    assert params["target"] is None
+    assert params["retirement_age"] == 60
+
+
+def test_simulation_roles_are_parsed():
+    action, params = detect_action("Am I on track to reach 1 crore in 15 years with 3 lakh saved and a SIP of 20000?")
+    assert action == "simulate_goal"
+    assert (params["target"], params["current_savings"], params["monthly_contribution"]) == (10_000_000, 300_000, 20_000)
+    assert params["months"] == 180
+
+
+def test_simulation_without_a_clear_goal_goes_to_rag():
+    assert detect_action("What is the probability that 5 lakh grows in 10 years?") == ("use_rag", {})
@@ -0,0 +1,63 @@
+"""Tests for per-user / per-address rate limiting"""
+
+import pytest
+
+import auth
+import main
+from auth import TokenCache
+
+
+class FakeFirebaseAuth:
+    """Treats the bearer token as the uid"""
+
+    ExpiredIdTokenError = RevokedIdTokenError = InvalidIdTokenError = type("TokenError", (Exception,), {})
+
+    def verify_id_token(self, token, app=None, check_revoked=False):
+        return {"uid": token, "exp": 2**40, "iat": 0}
+
+
+@pytest.fixture
+def limited_client(client, monkeypatch):
+    monkeypatch.setattr(main.limiter, "enabled", True)
+    monkeypatch.setattr(auth, "auth", FakeFirebaseAuth(), raising=False)
+    monkeypatch.setattr(auth, "firebase_app", object())
+    monkeypatch.setattr(auth, "token_cache", TokenCache())
+    main.limiter.reset()
+    yield client
+    main.limiter.reset()
+
+
+def ask(client, token=None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return client.post("/financial-advice", json={"question": "What is a SIP?"}, headers=headers)
+
+
+def test_each_user_gets_their_own_limit(limited_client):
+    for _ in range(10):
+        assert ask(limited_client, "alice").status_code == 200
+    assert ask(limited_client, "alice").status_code == 429
+    # Another user behind the same address is unaffected
+    assert ask(limited_client, "bob").status_code == 200
+    # And so are anonymous callers from that address
+    assert ask(limited_client).status_code == 200
+
+
+def test_anonymous_callers_are_limited_by_address(limited_client):
+    for _ in range(10):
+        assert ask(limited_client).status_code == 200
+    assert ask(limited_client).status_code == 429
+    assert ask(limited_client, "alice").status_code == 200
+
+
+def test_rate_limit_key():
+    class State:
+        user = {"uid": "alice"}
+
+    class FakeRequest:
+        state = State()
+        client = type("Client", (), {"host": "10.0.0.1"})()
+        headers = {}
+
+    assert main.rate_limit_key(FakeRequest()) == "user:alice"
+    FakeRequest.state.user = None
+    assert main.rate_limit_key(FakeRequest()) == "10.0.0.1"
@@ -0,0 +1,81 @@
+"""Tests for JSON / MessagePack request and response negotiation"""
+
+import numpy as np
+import orjson
+import ormsgpack
+
+import serialization
+from serialization import OrjsonResponse, is_msgpack
+
+QUESTION = {"question": "What is a SIP?"}
+MSGPACK = {"content-type": "application/msgpack"}
+
+
+def answer(body):
+    return body["final"]["tool_use"]["response"]
+
+
+def test_json_in_json_out(client):
+    response = client.post("/financial-advice", json=QUESTION)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "Accept" in response.headers["vary"]
+    assert answer(response.json())
+
+
+def test_msgpack_in_msgpack_out(client):
+    response = client.post("/financial-advice", content=ormsgpack.packb(QUESTION),
+                           headers=dict(MSGPACK, accept="application/msgpack"))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert answer(ormsgpack.unpackb(response.content)) == answer(client.post("/financial-advice", json=QUESTION).json())
+
+
+def test_msgpack_in_json_out_without_accept(client):
+    response = client.post("/financial-advice", content=ormsgpack.packb(QUESTION), headers=MSGPACK)
+    assert response.status_code == 200
+    assert answer(response.json())
+
+
+def test_accept_lists_msgpack_among_other_types(client):
+    response = client.post("/financial-advice", json=QUESTION,
+                           headers={"accept": "application/json;q=0.5, application/x-msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+
+
+def test_malformed_msgpack_body_is_a_400(client):
+    response = client.post("/financial-advice", content=b"\xc1\xc1", headers=MSGPACK)
+    assert response.status_code == 400
+
+
+def test_msgpack_body_of_the_wrong_shape_fails_validation(client):
+    response = client.post("/financial-advice", content=ormsgpack.packb([1, 2]), headers=MSGPACK)
+    assert response.status_code == 422
+
+
+def test_malformed_json_body_is_rejected(client):
+    response = client.post("/financial-advice", content=b"{bad",
+                           headers={"content-type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+
+
+def test_msgpack_without_ormsgpack_is_a_415(client, monkeypatch):
+    monkeypatch.setattr(serialization, "ormsgpack", None)
+    response = client.post("/financial-advice", content=ormsgpack.packb(QUESTION), headers=MSGPACK)
+    assert response.status_code == 415
+    # And the Accept header then falls back to JSON
+    response = client.post("/financial-advice", json=QUESTION, headers={"accept": "application/msgpack"})
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_media_type_matching():
+    assert is_msgpack("application/vnd.msgpack; charset=binary")
+    assert is_msgpack("Application/MsgPack")
+    assert not is_msgpack("application/json")
+    assert not is_msgpack(None)
+
+
+def test_orjson_response_renders_numpy_and_int_keys():
+    body = OrjsonResponse({1: np.arange(3, dtype=np.int64), "rate": np.float64(0.5)}).body
+    assert orjson.loads(body) == {"1": [0, 1, 2], "rate": 0.5}
@@ -0,0 +1,128 @@
+"""Tests for single-flight call coalescing"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tools.singleflight as singleflight
+from tools.singleflight import CallAbandoned, SingleFlight
+
+
+@pytest.fixture
+def events(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(singleflight, "increment", recorded.append)
+    return recorded
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+class BlockingCall:
+    """fn for SingleFlight.do that blocks until released and counts its runs"""
+
+    def __init__(self, result="answer", error=None):
+        self.result = result
+        self.error = error
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_calls_share_one_run(events):
+    flight = SingleFlight("test")
+    call = BlockingCall()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flight.do, "key", call) for _ in range(5)]
+        wait_for(lambda: len(events) == 4)
+        call.release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["answer"] * 5
+    assert call.calls == 1
+    assert events == ["test_coalesced"] * 4
+    assert flight.in_flight() == 0
+
+
+def test_different_keys_run_separately(events):
+    flight = SingleFlight("test")
+    calls = []
+    assert flight.do("a", calls.append, "a") is None
+    assert flight.do("b", calls.append, "b") is None
+    assert calls == ["a", "b"]
+    assert events == []
+
+
+def test_results_are_not_kept_after_the_call(events):
+    flight = SingleFlight("test")
+    counter = iter(range(10))
+    assert flight.do("key", next, counter) == 0
+    assert flight.do("key", next, counter) == 1
+
+
+def test_errors_reach_every_waiter(events):
+    flight = SingleFlight("test")
+    call = BlockingCall(error=RuntimeError("backend down"))
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "key", call) for _ in range(3)]
+        wait_for(lambda: len(events) == 2)
+        call.release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="backend down"):
+                future.result()
+    assert call.calls == 1
+
+
+def test_waiters_run_the_call_when_the_leader_abandons_it(events):
+    flight = SingleFlight("test")
+    future, leader = flight.join("key")
+    assert leader
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        waiter = pool.submit(flight.do, "key", lambda: "retried")
+        wait_for(lambda: len(events) == 1)
+        flight.fail("key", future, CallAbandoned())
+        assert waiter.result(timeout=5) == "retried"
+
+
+def test_interrupted_leader_abandons_instead_of_failing_waiters(events):
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def interrupted():
+        release.wait(5)
+        raise KeyboardInterrupt
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", interrupted)
+        wait_for(lambda: flight.in_flight() == 1)
+        waiter = pool.submit(flight.do, "key", lambda: "retried")
+        wait_for(lambda: len(events) == 1)
+        release.set()
+        with pytest.raises(KeyboardInterrupt):
+            leader.result(timeout=5)
+        assert waiter.result(timeout=5) == "retried"
+
+
+def test_disabled_runs_every_call(events):
+    flight = SingleFlight("test", enabled=False)
+    call = BlockingCall()
+    call.release.set()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        results = list(pool.map(lambda _: flight.do("key", call), range(3)))
+    assert results == ["answer"] * 3
+    assert call.calls == 3
+    assert events == []
+    assert flight.in_flight() == 0
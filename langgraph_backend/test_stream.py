@@ -0,0 +1,74 @@
+"""Tests for the Server-Sent Events advice endpoint"""
+
+import orjson
+
+import workflow
+from conftest import CONTEXT
+
+
+def read_events(response) -> list:
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block.strip():
+            continue
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], orjson.loads(lines["data"])))
+    return events
+
+
+def test_tokens_arrive_in_order_before_the_final_answer(client, stub_llm):
+    response = client.post("/financial-advice/stream", json={"question": "What is a SIP?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = read_events(response)
+    names = [name for name, _ in events]
+    assert names[:2] == ["planner", "retrieval"]
+    assert names[-2:] == ["tool_use", "done"]
+    assert set(names[2:-2]) == {"token"}
+
+    tokens = "".join(data["text"] for name, data in events if name == "token")
+    answer = events[-2][1]["response"]
+    assert tokens == answer
+    assert answer.startswith("Stub answer")
+    # Compact payloads by default
+    assert events[1][1] == {"context_chars": len(CONTEXT), "cached": False}
+    assert set(events[0][1]) == {"question", "plan"}
+
+
+def test_repeated_question_is_served_from_the_cache(client):
+    first = read_events(client.post("/financial-advice/stream", json={"question": "What is a SIP?"}))
+    second = read_events(client.post("/financial-advice/stream", json={"question": "what is a sip"}))
+
+    assert [name for name, _ in second] == ["planner", "retrieval", "token", "tool_use", "done"]
+    assert second[1][1]["cached"] is True
+    assert second[-2][1]["cached"] is True
+    assert second[-2][1]["response"] == first[-2][1]["response"]
+
+
+def test_calculation_streams_the_calculator_answer(client):
+    events = read_events(client.post("/financial-advice/stream",
+                                     json={"question": "What is the EMI on a 20 lakh loan at 8.5% for 20 years?"}))
+    assert [name for name, _ in events] == ["planner", "token", "calculator", "done"]
+    assert events[2][1]["structuredData"]["type"] == "calculate_emi"
+
+
+def test_failure_is_reported_as_an_error_event(client, monkeypatch):
+    def broken_planner(state):
+        raise RuntimeError("planner down")
+
+    monkeypatch.setattr(workflow, "planner_node", broken_planner)
+    events = read_events(client.post("/financial-advice/stream", json={"question": "What is a SIP?"}))
+    assert events == [("error", {"detail": "Failed to generate advice"}), ("done", {})]
+
+
+def test_empty_question_is_rejected(client):
+    assert client.post("/financial-advice/stream", json={"question": "  "}).status_code == 400
+
+
+def test_verbose_events_do_not_echo_the_user_context(client):
+    context = {"transactions": [{"amount": 100, "category": "food"}] * 50}
+    events = read_events(client.post("/financial-advice/stream?verbose=true",
+                                     json={"question": "What is a SIP?", "userContext": context}))
+    assert events[0][0] == "planner"
+    assert all("userContext" not in data for _, data in events)
@@ -0,0 +1,97 @@
+"""Tests for the userContext summary added to the prompt"""
+
+import numpy as np
+import pytest
+
+from user_context import USER_CONTEXT_MAX_CHARS, month_key, numeric_column, summarize_user_context
+
+
+def test_mixed_numeric_and_formatted_amounts():
+    context = {"transactions": [
+        {"amount": 50000, "date": "2025-01-05", "category": "Salary"},
+        {"amount": "-1,250.50", "date": "2025-01-10", "category": "Rent"},
+        {"amount": "₹-750", "date": "15/02/2025", "category": "Food"},
+        {"amount": "n/a", "date": "2025-02-20", "category": "Food"},
+        {"amount": -500.0, "date": {"seconds": 1739577600}, "category": "Food"},
+    ]}
+    summary = summarize_user_context(context)
+    assert "- Recent Income: $50,000.00" in summary
+    assert "- Recent Expenses: $2,500.50" in summary
+    # The unparseable amount is not counted
+    assert "- Net Cash Flow: $47,499.50 over 4 transactions" in summary
+    assert "2025-01: in $50,000.00, out $1,250.50; 2025-02: in $0.00, out $1,250.00" in summary
+    assert "- Top Expense Categories: Rent $1,250.50 (50%), Food $1,250.00 (50%)" in summary
+
+
+def test_older_type_field_sets_the_sign():
+    context = {"transactions": [
+        {"amount": "1000", "type": "income"},
+        {"amount": 300, "type": "expense"},
+    ]}
+    summary = summarize_user_context(context)
+    assert "- Net Cash Flow: $700.00 over 2 transactions" in summary
+
+
+def test_numeric_column_parses_each_form():
+    column = numeric_column([1, "2.5", "1,000", None, "abc"])
+    assert column[:3].tolist() == [1.0, 2.5, 1000.0]
+    assert np.isnan(column[3]) and np.isnan(column[4])
+
+
+def test_month_key_formats():
+    assert month_key("2025-03-31T10:00:00Z") == "2025-03"
+    assert month_key("1/3/2025") == "2025-03"
+    assert month_key({"_seconds": 0}) == "1970-01"
+    assert month_key("yesterday") == ""
+
+
+@pytest.mark.parametrize("context", [None, {}, [], {"userProfile": {}, "transactions": [],
+                                                   "holdings": [], "monthlyData": []}])
+def test_empty_context_gives_no_summary(context):
+    assert summarize_user_context(context) == ""
+
+
+def test_empty_sections_are_left_out():
+    summary = summarize_user_context({
+        "userProfile": {"age": 30},
+        "transactions": [],
+        "holdings": ["not a holding"],
+        "monthlyData": None,
+    })
+    assert "- Age: 30" in summary
+    assert "Transactions" not in summary and "Cash Flow" not in summary
+    assert "Holdings" not in summary and "Monthly Averages" not in summary
+
+
+def test_holdings_and_monthly_data():
+    summary = summarize_user_context({
+        "holdings": [
+            {"name": "Index Fund", "quantity": "10", "avgPrice": 100, "currentValue": 1500},
+            {"name": "Bond Fund", "value": "500"},
+        ],
+        "monthlyData": [
+            {"month": "2025-02", "income": 1000, "expenses": 700},
+            {"month": "2025-01", "income": 1000, "expenses": 800, "savings": "200"},
+        ],
+    })
+    assert "- Total Investment Holdings: $2,000.00" in summary
+    assert "- Invested Amount: $1,000.00, Unrealized Gain: $500.00 (+50.0%)" in summary
+    assert "- Largest Positions: Index Fund 75.0%, Bond Fund 25.0%" in summary
+    assert "- Savings Rate: 25.0%" in summary
+    assert "- Savings Trend: rising by $100.00 per month" in summary
+
+
+def test_summary_is_capped_at_whole_lines():
+    transactions = [
+        {"amount": -(i + 1), "date": f"2024-{i % 12 + 1:02d}-01", "category": f"Category {i}"}
+        for i in range(5000)
+    ]
+    context = {"userProfile": {"age": 30, "income": 90000, "occupation": "Engineer"},
+               "transactions": transactions}
+    full = summarize_user_context(context, max_chars=100_000)
+    capped = summarize_user_context(context, max_chars=200)
+
+    assert len(capped) <= 200
+    assert full.startswith(capped)
+    assert capped.endswith("\n")
+    assert len(summarize_user_context(context)) <= USER_CONTEXT_MAX_CHARS
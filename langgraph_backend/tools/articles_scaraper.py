@@ -1,10 +1,25 @@
 # article_scraper.py
 
-import requests
-from bs4 import BeautifulSoup
 import os
 import re
+import sys
+import json
 import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup
+
+# Allow running as a script: make the langgraph_backend package root importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.fetcher import AsyncFetcher
+
+# lxml is several times faster than the stdlib parser; fall back when it is not installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
 
 # More reliable financial article URLs
 ARTICLE_URLS = [
@@ -15,8 +30,16 @@ ARTICLE_URLS = [
     "https://www.investopedia.com/terms/r/retirement-planning.asp"
 ]
 
-SAVE_DIR = "data/articles"
-os.makedirs(SAVE_DIR, exist_ok=True)
+# Anchored to langgraph_backend/data whatever the working directory; created when a scrape runs
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+SAVE_DIR = os.path.join(DATA_DIR, 'articles')
+# Progress of the current scrape, so an interrupted run can resume where it stopped
+QUEUE_FILE = os.path.join(DATA_DIR, 'scrape_queue.json')
+
+# Defaults for polite crawling: requests per second and burst size per host.
+# A host whose robots.txt asks for a longer Crawl-delay is crawled at that pace instead
+RATE_PER_HOST = 4.0
+BURST_PER_HOST = 4
 
 def clean_filename(title):
     """Clean title for use as filename"""
@@ -58,84 +81,225 @@ def extract_investopedia_content(soup):
     
     return content
 
-def fetch_articles():
-    """Fetch articles using requests and BeautifulSoup"""
-    headers = {
-        'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                      'AppleWebKit/537.36 (KHTML, like Gecko) '
-                      'Chrome/91.0.4472.124 Safari/537.36')
-    }
-    
-    successful_scrapes = 0
-    
-    for url in ARTICLE_URLS:
-        try:
-            print(f"[🔄] Fetching: {url}")
-            
-            # Fetch the webpage
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract title
-            title_tag = soup.find('title')
-            title = title_tag.get_text().strip() if title_tag else "Untitled"
-            
-            # Extract content based on domain
-            if 'investopedia.com' in url:
-                content = extract_investopedia_content(soup)
+def extract_generic_content(soup):
+    """Extract content from non-Investopedia pages"""
+    content_selectors = ['article', '.content', 'main', '.post-content']
+    for selector in content_selectors:
+        content_elem = soup.select_one(selector)
+        if content_elem:
+            return content_elem.get_text(separator='\n', strip=True)
+
+    paragraphs = soup.find_all('p')
+    return '\n\n'.join([
+        p.get_text().strip() for p in paragraphs 
+        if p.get_text().strip()
+    ])
+
+def parse_article(url, html):
+    """
+    Parse one page into its title and content. Runs in a worker process,
+    so it only takes and returns plain picklable values.
+    """
+    start = time.perf_counter()
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    # Extract title
+    title_tag = soup.find('title')
+    title = title_tag.get_text().strip() if title_tag else "Untitled"
+
+    # Extract content based on domain
+    if 'investopedia.com' in url:
+        content = extract_investopedia_content(soup)
+    else:
+        content = extract_generic_content(soup)
+
+    return {"title": title, "content": content or "", "parse_seconds": time.perf_counter() - start}
+
+def write_article(save_dir, title, url, content):
+    """Save an article with the header that load_documents expects"""
+    clean_title = clean_filename(title)
+    path = os.path.join(save_dir, f"{clean_title}.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Title: {title}\n")
+        f.write(f"URL: {url}\n")
+        f.write(f"Scraped: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"{'='*50}\n\n")
+        f.write(content)
+    return path
+
+class ScrapeQueue:
+    """
+    Resumable work queue persisted as JSON. Each finished URL keeps its
+    fetch/parse timings. A run that is interrupted resumes with the URLs
+    still pending; failed URLs are retried.
+    """
+
+    def __init__(self, path=QUEUE_FILE):
+        self.path = path
+        self.pending = []
+        self.done = {}
+        self.failed = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.pending = state.get("pending", [])
+            self.done = state.get("done", {})
+            self.failed = state.get("failed", {})
+
+    def add(self, urls):
+        """Queue URLs that have not been scraped yet; failed ones are queued again"""
+        queued = set(self.pending)
+        for url in urls:
+            if url not in self.done and url not in queued:
+                self.pending.append(url)
+                queued.add(url)
+                self.failed.pop(url, None)
+
+    def mark_done(self, url, record):
+        self.pending.remove(url)
+        self.done[url] = record
+
+    def mark_failed(self, url, record):
+        self.pending.remove(url)
+        self.failed[url] = record
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"pending": self.pending, "done": self.done, "failed": self.failed}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+async def scrape(urls, save_dir=SAVE_DIR, queue_path=QUEUE_FILE, rate_per_host=RATE_PER_HOST,
+                 burst=BURST_PER_HOST, concurrency=32, per_host=4, parse_workers=None, transport=None,
+                 respect_robots=True):
+    """
+    Fetch and save every URL not already scraped. Requests to each host are
+    rate limited with a token bucket, slowed further to the host's robots.txt
+    Crawl-delay and skipping disallowed URLs (respect_robots); HTML parsing runs in a process pool
+    (parse_workers=0 parses in a thread instead). Returns the ScrapeQueue.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    queue = ScrapeQueue(queue_path)
+    if not queue.pending:
+        # The last run finished, so this is a new scrape rather than a resume
+        queue = ScrapeQueue(None)
+        queue.path = queue_path
+    queue.add(urls)
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers != 0 else None
+    completed = 0
+
+    async def work(url):
+        nonlocal completed
+        print(f"[🔄] Fetching: {url}")
+        result = await fetcher.fetch(url, conditional=False)
+        record = {"status": result.status, "fetch_seconds": round(result.elapsed, 4)}
+        if not result.ok:
+            print(f"[❌] Network error fetching {url}: {result.error}")
+            queue.mark_failed(url, dict(record, error=result.error))
+        else:
+            try:
+                parsed = await loop.run_in_executor(pool, parse_article, url, result.text)
+            except Exception as e:
+                print(f"[❌] Failed to parse {url}: {e}")
+                queue.mark_failed(url, dict(record, error=f"parse error: {e}"))
             else:
-                # Generic content extraction
-                content_selectors = ['article', '.content', 'main', '.post-content']
-                content = None
-                for selector in content_selectors:
-                    content_elem = soup.select_one(selector)
-                    if content_elem:
-                        content = content_elem.get_text(separator='\n', strip=True)
-                        break
-                
-                if not content:
-                    paragraphs = soup.find_all('p')
-                    content = '\n\n'.join([
-                        p.get_text().strip() for p in paragraphs 
-                        if p.get_text().strip()
-                    ])
-            
-            if not content or len(content) < 200:
-                print(f"[⚠️] Insufficient content found for {url}")
-                continue
-            
-            # Clean filename and save
-            clean_title = clean_filename(title)
-            path = os.path.join(SAVE_DIR, f"{clean_title}.txt")
-            
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(f"Title: {title}\n")
-                f.write(f"URL: {url}\n")
-                f.write(f"Scraped: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"{'='*50}\n\n")
-                f.write(content)
-            
-            print(f"[✅] Saved: {clean_title}.txt ({len(content)} characters)")
-            successful_scrapes += 1
-            
-            # Be respectful - add delay between requests
-            time.sleep(2)
-            
-        except requests.RequestException as e:
-            print(f"[❌] Network error fetching {url}: {e}")
-        except Exception as e:
-            print(f"[❌] Failed to fetch {url}: {e}")
-    
+                record.update(bytes=len(result.text), parse_seconds=round(parsed["parse_seconds"], 4))
+                content = parsed["content"]
+                if len(content) < 200:
+                    print(f"[⚠️] Insufficient content found for {url}")
+                    queue.mark_failed(url, dict(record, error="insufficient content"))
+                else:
+                    path = write_article(save_dir, parsed["title"], url, content)
+                    print(f"[✅] Saved: {os.path.basename(path)} ({len(content)} characters)")
+                    queue.mark_done(url, dict(record, file=os.path.basename(path)))
+
+        # Checkpoint regularly so a crash loses little work
+        completed += 1
+        if completed % 20 == 0:
+            queue.save()
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def bounded(url):
+        async with limit:
+            await work(url)
+
+    try:
+        async with AsyncFetcher(max_connections=concurrency, per_host=per_host,
+                                rate_per_host=rate_per_host, burst=burst,
+                                transport=transport, respect_robots=respect_robots) as fetcher:
+            await asyncio.gather(*(bounded(url) for url in list(queue.pending)))
+    finally:
+        queue.save()
+        if pool:
+            pool.shutdown()
+    return queue
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def print_summary(queue, urls):
+    urls = set(urls)
+    done = [r for u, r in queue.done.items() if u in urls]
+    failed = [r for u, r in queue.failed.items() if u in urls]
+    fetch_times = [r["fetch_seconds"] for r in done + failed if r.get("fetch_seconds") is not None]
+    parse_times = [r["parse_seconds"] for r in done + failed if r.get("parse_seconds") is not None]
+
     print(f"\n📊 Scraping Summary:")
-    print(f"   Total URLs: {len(ARTICLE_URLS)}")
-    print(f"   Successful: {successful_scrapes}")
-    print(f"   Failed: {len(ARTICLE_URLS) - successful_scrapes}")
+    print(f"   Total URLs: {len(urls)}")
+    print(f"   Successful: {len(done)}")
+    print(f"   Failed: {len(failed)}")
+    print(f"   Fetch time p50/p95: {percentile(fetch_times, 50):.2f}s / {percentile(fetch_times, 95):.2f}s")
+    print(f"   Parse time p50/p95: {percentile(parse_times, 50):.3f}s / {percentile(parse_times, 95):.3f}s")
+
+def fetch_articles(urls=ARTICLE_URLS, **kwargs):
+    """Fetch articles and print a summary; see scrape() for options"""
+    queue = asyncio.run(scrape(urls, **kwargs))
+    print_summary(queue, urls)
+    return queue
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape financial articles into data/articles.")
+    parser.add_argument("--urls-file", help="file with one URL per line (defaults to ARTICLE_URLS)")
+    parser.add_argument("--save-dir", default=SAVE_DIR)
+    parser.add_argument("--queue", default=QUEUE_FILE, help="resumable queue state file")
+    parser.add_argument("--fresh", action="store_true", help="discard the saved queue and start over")
+    parser.add_argument("--rate", type=float, default=RATE_PER_HOST, help="requests per second per host")
+    parser.add_argument("--ignore-robots", action="store_true", help="do not read robots.txt (own or test hosts only)")
+    parser.add_argument("--burst", type=float, default=BURST_PER_HOST, help="burst size per host")
+    parser.add_argument("--concurrency", type=int, default=32, help="max requests in flight")
+    parser.add_argument("--per-host", type=int, default=4, help="max requests in flight per host")
+    parser.add_argument("--parse-workers", type=int, default=None, help="parser processes (0 = parse in a thread)")
+    args = parser.parse_args(argv)
+
+    urls = ARTICLE_URLS
+    if args.urls_file:
+        with open(args.urls_file, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if args.fresh and os.path.exists(args.queue):
+        os.remove(args.queue)
 
-if __name__ == "__main__":
     print("🚀 Starting financial article scraping...")
-    print(f"📁 Saving articles to: {os.path.abspath(SAVE_DIR)}")
-    fetch_articles()
+    print(f"📁 Saving articles to: {os.path.abspath(args.save_dir)}")
+    fetch_articles(
+        urls,
+        save_dir=args.save_dir,
+        queue_path=args.queue,
+        rate_per_host=args.rate,
+        burst=args.burst,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        parse_workers=args.parse_workers,
+        respect_robots=not args.ignore_robots,
+    )
     print("✨ Article scraping completed!")
+
+if __name__ == "__main__":
+    main()
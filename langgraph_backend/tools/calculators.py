@@ -0,0 +1,193 @@
+"""
+Vectorized financial calculators behind the calculator graph node.
+
+Every function accepts scalars or NumPy arrays and broadcasts them, so a
+batch of scenarios (say, five loan amounts against three rates) is computed
+in a single call: emi([1e6, 2e6, 3e6], [[8], [9], [10]], 240) returns a 3x3
+grid. Rates are annual percentages (8.5 means 8.5%) and periods are months
+unless the name says otherwise.
+"""
+
+import numpy as np
+
+# Annual return assumed for projections when the question does not give one
+DEFAULT_ANNUAL_RETURN = 12.0
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+
+
+def monthly_rate(annual_rate):
+    return np.asarray(annual_rate, dtype=np.float64) / 1200.0
+
+
+def emi(principal, annual_rate, months):
+    """Equal monthly installment that repays principal over months"""
+    principal = np.asarray(principal, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    rate = monthly_rate(annual_rate)
+    growth = np.power(1 + rate, months)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment = principal * rate * growth / (growth - 1)
+    return np.where(rate == 0, principal / months, payment)
+
+
+def amortization_schedule(principal, annual_rate, months) -> dict:
+    """
+    Month-by-month schedule for one loan or a batch of loans. Arrays have the
+    broadcast shape of the inputs plus a trailing month axis as long as the
+    longest loan; months after a loan is repaid are zero.
+    """
+    principal = np.asarray(principal, dtype=np.float64)
+    rate = monthly_rate(annual_rate)
+    months = np.asarray(months)
+    payment = emi(principal, annual_rate, months)
+    principal, rate, months, payment = np.broadcast_arrays(principal, rate, months, payment)
+
+    k = np.arange(int(months.max()) + 1)
+    growth = np.power(1 + rate[..., None], k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Closed-form balance after k payments
+        balance = principal[..., None] * growth - payment[..., None] * (growth - 1) / rate[..., None]
+    balance = np.where(rate[..., None] == 0, principal[..., None] - payment[..., None] * k, balance)
+    balance = np.where(k <= months[..., None], np.clip(balance, 0, None), 0.0)
+
+    opening = balance[..., :-1]
+    active = k[1:] <= months[..., None]
+    interest = np.where(active, opening * rate[..., None], 0.0)
+    principal_paid = np.where(active, opening - balance[..., 1:], 0.0)
+    return {
+        "month": k[1:],
+        "payment": interest + principal_paid,
+        "interest": interest,
+        "principal": principal_paid,
+        "balance": balance[..., 1:],
+        "emi": payment,
+        "total_interest": interest.sum(axis=-1),
+        "total_payment": (interest + principal_paid).sum(axis=-1),
+    }
+
+
+def roi(initial, final):
+    """Total return in percent"""
+    initial = np.asarray(initial, dtype=np.float64)
+    return (np.asarray(final, dtype=np.float64) - initial) / initial * 100
+
+
+def cagr(initial, final, years):
+    """Compound annual growth rate in percent"""
+    initial = np.asarray(initial, dtype=np.float64)
+    ratio = np.asarray(final, dtype=np.float64) / initial
+    return (np.power(ratio, 1 / np.asarray(years, dtype=np.float64)) - 1) * 100
+
+
+def xirr(amounts, dates):
+    """
+    Annualized internal rate of return, in percent, of irregular cash flows
+    (investments negative, withdrawals and current value positive). The last
+    axis holds the cash flows of one scenario; dates are datetime64 values or
+    day offsets. Newton's method runs on all scenarios at once; scenarios
+    that do not converge come back as NaN.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        days = (dates - dates[..., :1]).astype("timedelta64[D]").astype(np.float64)
+    else:
+        days = dates.astype(np.float64) - dates[..., :1].astype(np.float64)
+    years = np.broadcast_to(days / 365.0, amounts.shape)
+
+    rate = np.full(amounts.shape[:-1], 0.1)
+    converged = np.zeros(rate.shape, dtype=bool)
+    for _ in range(XIRR_MAX_ITERATIONS):
+        # Scenarios that diverge may overflow on the way; they end up NaN
+        with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+            discount = np.power(1 + rate[..., None], -years)
+            value = (amounts * discount).sum(axis=-1)
+            slope = (-years * amounts * discount / (1 + rate[..., None])).sum(axis=-1)
+            step = np.where(converged, 0.0, value / slope)
+            next_rate = rate - np.nan_to_num(step)
+            # A step past -100% goes halfway there instead, so rates stay valid
+            rate = np.where(next_rate > -1, next_rate, (rate - 1) / 2)
+        converged |= np.abs(step) < XIRR_TOLERANCE
+        if converged.all():
+            break
+    return np.where(converged, rate, np.nan) * 100
+
+
+def compound_future_value(principal, annual_rate, years, compounds_per_year=12):
+    """Value of a lump sum after years of compound interest"""
+    periods = np.asarray(compounds_per_year, dtype=np.float64)
+    rate = np.asarray(annual_rate, dtype=np.float64) / 100 / periods
+    return np.asarray(principal, dtype=np.float64) * np.power(1 + rate, periods * np.asarray(years, dtype=np.float64))
+
+
+def sip_future_value(monthly, annual_rate, months, annuity_due=True):
+    """
+    Value of a monthly SIP after months. annuity_due means each installment is
+    invested at the start of the month, the usual mutual fund SIP convention.
+    """
+    monthly = np.asarray(monthly, dtype=np.float64)
+    months = np.asarray(months, dtype=np.float64)
+    rate = monthly_rate(annual_rate)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = monthly * (np.power(1 + rate, months) - 1) / rate
+    value = value * (1 + rate) if annuity_due else value
+    return np.where(rate == 0, monthly * months, value)
+
+
+def sip_projection(monthly, annual_rate, years, annuity_due=True) -> dict:
+    """Year-end invested amount and value of a monthly SIP, one column per year"""
+    months = 12 * np.arange(1, int(np.max(years)) + 1)
+    monthly = np.asarray(monthly, dtype=np.float64)[..., None]
+    rate = np.asarray(annual_rate, dtype=np.float64)[..., None]
+    return {
+        "year": months // 12,
+        "invested": monthly * months,
+        "value": sip_future_value(monthly, rate, months, annuity_due),
+    }
+
+
+def required_monthly_investment(target, annual_rate, months, current_savings=0.0, annuity_due=True):
+    """
+    Monthly amount to invest to reach target after months, on top of
+    current_savings growing at the same rate. Zero if savings already suffice.
+    """
+    months = np.asarray(months, dtype=np.float64)
+    rate = monthly_rate(annual_rate)
+    growth = np.power(1 + rate, months)
+    remaining = np.asarray(target, dtype=np.float64) - np.asarray(current_savings, dtype=np.float64) * growth
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = (growth - 1) / rate * ((1 + rate) if annuity_due else 1)
+    factor = np.where(rate == 0, months, factor)
+    return np.clip(remaining / factor, 0, None)
+
+
+def portfolio_analysis(values, costs=None) -> dict:
+    """
+    Allocation and concentration of portfolios; the last axis holds the
+    positions of one portfolio. HHI is the sum of squared weights (1/n when
+    evenly spread, 1.0 for a single position) and effective_holdings its
+    inverse.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    total = values.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(total[..., None] > 0, values / total[..., None], 0.0)
+        hhi = np.square(weights).sum(axis=-1)
+        result = {
+            "total_value": total,
+            "weights": weights,
+            "top_weight": weights.max(axis=-1, initial=0.0),
+            "hhi": hhi,
+            "effective_holdings": np.where(hhi > 0, 1 / hhi, 0.0),
+        }
+    if costs is not None:
+        costs = np.asarray(costs, dtype=np.float64)
+        known = ~np.isnan(costs)
+        invested = np.where(known, costs, 0.0).sum(axis=-1)
+        gain = np.where(known, values - costs, 0.0).sum(axis=-1)
+        result["invested"] = invested
+        result["gain"] = gain
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result["gain_pct"] = np.where(invested > 0, gain / invested * 100, np.nan)
+    return result
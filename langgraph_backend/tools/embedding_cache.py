@@ -0,0 +1,152 @@
+"""
+Persistent, content-addressed cache for embedding vectors.
+
+Vectors are keyed by sha256(model name, task type, text) and stored as
+float32 rows in an append-only file that is read through a memory map.
+A second append-only file lists the key of each row, so the cache needs
+no separate index rebuild and survives partial writes.
+
+    cache/
+        <backend>-<model>/    # one cache per embedding model (see cache_namespace)
+            vectors.f32       # row-major float32, one row per key
+            keys.txt          # one hex key per line, line number == row number
+            meta.json         # vector dimension
+
+Models differ in vector size, so each gets its own directory instead of
+sharing one file of fixed-width rows.
+
+Writers take an exclusive file lock and re-read the files first, so
+several workers or ingestion runs can share one cache directory.
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', 'vectorstores', 'embedding_cache')
+
+
+def cache_namespace(backend_name: str, model_name: str) -> str:
+    """Directory name for the vectors of one backend and model"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", f"{backend_name}-{model_name}").strip("-.")
+
+
+def embedding_key(model_name: str, task_type: str, text: str) -> str:
+    """Content address of one embedding"""
+    digest = hashlib.sha256()
+    for part in (model_name, task_type, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.keys_path = os.path.join(cache_dir, "keys.txt")
+        self.meta_path = os.path.join(cache_dir, "meta.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._dim = None
+        self._vectors = None
+        self._load()
+
+    def _load(self):
+        self._rows = {}
+        self._dim = None
+        self._vectors = None
+        if not os.path.exists(self.meta_path):
+            return
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self._dim = json.load(f)["dim"]
+            keys = []
+            if os.path.exists(self.keys_path):
+                with open(self.keys_path, "r", encoding="utf-8") as f:
+                    keys = f.read().split("\n")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable embedding cache: {e}")
+            self._dim = None
+            return
+
+        # Only trust rows that were fully written to both files
+        row_bytes = self._dim * 4
+        complete_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        valid_keys = 0
+        while valid_keys < len(keys) and len(keys[valid_keys]) == 64:
+            valid_keys += 1
+        rows = min(complete_rows, valid_keys)
+        self._rows = {key: row for row, key in enumerate(keys[:rows])}
+        self._map_vectors(rows)
+
+    def _map_vectors(self, rows: int):
+        if rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+        else:
+            self._vectors = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, keys):
+        """Return cached vectors as lists, or None for each miss"""
+        with self._lock:
+            return [
+                self._vectors[self._rows[key]].tolist() if key in self._rows else None
+                for key in keys
+            ]
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def put_many(self, keys, vectors):
+        """Append new vectors; keys that are already cached are skipped"""
+        with self._lock, self._file_lock():
+            # Pick up rows appended by other processes since we last looked
+            self._load()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    new[key] = vector
+            if not new:
+                return
+            array = np.asarray(list(new.values()), dtype=np.float32)
+            if self._dim is None:
+                self._dim = array.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self._dim}, f)
+            elif array.shape[1] != self._dim:
+                raise ValueError(f"Embedding dimension {array.shape[1]} does not match cache dimension {self._dim}")
+
+            # Drop anything past the last complete row, e.g. from an interrupted write
+            first_row = len(self._rows)
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(first_row * self._dim * 4)
+                f.write(array.tobytes())
+            with open(self.keys_path, "a", encoding="utf-8") as f:
+                f.truncate(first_row * 65)
+                f.write("".join(f"{key}\n" for key in new))
+
+            for offset, key in enumerate(new):
+                self._rows[key] = first_row + offset
+            self._map_vectors(len(self._rows))
@@ -0,0 +1,229 @@
+"""
+Async HTTP fetching for the ingestion pipeline.
+
+One pooled httpx.AsyncClient is shared by every request, with a cap on
+concurrent requests per host and an optional token-bucket rate limit per
+host, capped by the Crawl-delay / Request-rate in the host's robots.txt
+when respect_robots is set. ETag / Last-Modified validators from earlier runs are sent back as
+conditional headers, so pages that have not changed come back as 304 and
+can be skipped.
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import httpx
+
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                   'AppleWebKit/537.36 (KHTML, like Gecko) '
+                   'Chrome/91.0.4472.124 Safari/537.36')
+}
+DEFAULT_VALIDATORS_PATH = os.path.join(os.path.dirname(__file__), '..', 'vectorstores', 'http_validators.json')
+
+
+class FetchResult:
+    def __init__(self, url, status=None, text="", not_modified=False, error=None, elapsed=0.0):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.not_modified = not_modified
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.not_modified and self.status is not None and self.status < 400
+
+
+class ValidatorStore:
+    """ETag / Last-Modified per URL, persisted as JSON between runs"""
+
+    def __init__(self, path: str = DEFAULT_VALIDATORS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._validators = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._validators = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[⚠️] Ignoring unreadable validator cache: {e}")
+
+    def conditional_headers(self, url: str) -> dict:
+        with self._lock:
+            validators = self._validators.get(url, {})
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    def update(self, url: str, response_headers):
+        etag = response_headers.get("etag")
+        last_modified = response_headers.get("last-modified")
+        with self._lock:
+            if etag or last_modified:
+                self._validators[url] = {"etag": etag, "last_modified": last_modified}
+            else:
+                self._validators.pop(url, None)
+
+    def forget(self, url: str):
+        """Drop validators so the next fetch is unconditional (e.g. the saved copy was lost)"""
+        with self._lock:
+            self._validators.pop(url, None)
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self._validators, f, indent=2)
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncFetcher:
+    """
+    Usage:
+        async with AsyncFetcher(per_host=4) as fetcher:
+            results = await fetcher.fetch_all(urls)
+    """
+
+    def __init__(self, max_connections: int = 20, per_host: int = 4, timeout: float = 15.0,
+                 validators: ValidatorStore = None, headers: dict = None, transport=None,
+                 rate_per_host: float = None, burst: float = 1.0, respect_robots: bool = False):
+        """
+        rate_per_host limits requests per second to each host (None = unlimited).
+        With respect_robots, each host's robots.txt is read first: disallowed
+        URLs are not fetched and a slower Crawl-delay / Request-rate wins.
+        transport lets tests and offline runs plug in e.g. httpx.MockTransport.
+        """
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.respect_robots = respect_robots
+        self.timeout = timeout
+        self.validators = validators
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.transport = transport
+        self._client = None
+        self._host_limits = {}
+        self._host_buckets = {}
+        self._robots = {}
+        self._robots_locks = {}
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            follow_redirects=True,
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    async def _robots_for(self, url: str):
+        """The host's parsed robots.txt, fetched once per host; None when it has none"""
+        parsed = urlparse(url)
+        host = parsed.netloc
+        if host in self._robots:
+            return self._robots[host]
+        lock = self._robots_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            if host not in self._robots:
+                robots = None
+                try:
+                    response = await self._client.get(f"{parsed.scheme}://{host}/robots.txt")
+                    if response.status_code == 200:
+                        robots = RobotFileParser()
+                        robots.parse(response.text.splitlines())
+                except httpx.HTTPError as e:
+                    print(f"[⚠️] Could not read robots.txt for {host}: {e}")
+                self._robots[host] = robots
+        return self._robots[host]
+
+    def _host_rate(self, robots):
+        """rate_per_host, lowered to the host's Crawl-delay or Request-rate when it asks for less"""
+        rates = [self.rate_per_host] if self.rate_per_host else []
+        if robots is not None:
+            agent = self.headers.get("User-Agent", "*")
+            delay = robots.crawl_delay(agent)
+            if delay:
+                rates.append(1.0 / float(delay))
+            request_rate = robots.request_rate(agent)
+            if request_rate and request_rate.requests:
+                rates.append(request_rate.requests / request_rate.seconds)
+        return min(rates) if rates else None
+
+    async def _throttle(self, url: str, robots=None):
+        host = urlparse(url).netloc
+        if host not in self._host_buckets:
+            rate = self._host_rate(robots)
+            self._host_buckets[host] = TokenBucket(rate, self.burst) if rate else None
+        if self._host_buckets[host] is not None:
+            await self._host_buckets[host].acquire()
+
+    async def fetch(self, url: str, conditional: bool = True) -> FetchResult:
+        robots = await self._robots_for(url) if self.respect_robots else None
+        if robots is not None and not robots.can_fetch(self.headers.get("User-Agent", "*"), url):
+            return FetchResult(url, error="disallowed by robots.txt")
+        headers = self.validators.conditional_headers(url) if (conditional and self.validators) else {}
+        await self._throttle(url, robots)
+        start = time.perf_counter()
+        async with self._host_limit(url):
+            try:
+                response = await self._client.get(url, headers=headers)
+            except httpx.HTTPError as e:
+                return FetchResult(url, error=str(e) or e.__class__.__name__, elapsed=time.perf_counter() - start)
+        elapsed = time.perf_counter() - start
+
+        if response.status_code == 304:
+            return FetchResult(url, status=304, not_modified=True, elapsed=elapsed)
+        if response.status_code >= 400:
+            return FetchResult(url, status=response.status_code, error=f"HTTP {response.status_code}", elapsed=elapsed)
+        if conditional and self.validators:
+            self.validators.update(url, response.headers)
+        return FetchResult(url, status=response.status_code, text=response.text, elapsed=elapsed)
+
+    async def fetch_all(self, urls, conditional: bool = True):
+        return await asyncio.gather(*(self.fetch(url, conditional) for url in urls))
@@ -2,28 +2,38 @@
 """
 FinanceAI Document Ingestion Script
 
-This script processes financial documents (PDF/TXT) and creates a FAISS vector store
-using Google Gemini embeddings for efficient similarity search.
+This script collects financial articles (fetched from the web or imported from
+a local directory of TXT/HTML files) and updates the FAISS vector store and
+keyword index using Google Gemini embeddings (or the in-process backend set by
+EMBEDDINGS_BACKEND) for efficient similarity search.
 
 Usage:
-    python ingest_docs.py --path data/
+    python ingest_docs.py                      # fetch ARTICLE_KEYWORDS, then index
+    python ingest_docs.py --path data/         # import local .txt/.html files, no network
+    python ingest_docs.py --no-fetch --full    # rebuild the index from saved articles
+
+Importing this module has no side effects; use ingest() or main() from code.
 """
 import os
-import requests
+import sys
+import asyncio
+import argparse
+from urllib.parse import urljoin, urlparse, parse_qs, quote_plus
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.docstore.document import Document
+
+# Allow running as a script: make the langgraph_backend package root importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.rag_tool import (
+    load_documents, update_vectorstore,
+    build_keyword_index, save_keyword_index,
+    ARTICLES_DIR, VECTORSTORE_DIR
+)
+from tools.fetcher import AsyncFetcher, ValidatorStore
 
 # === Load environment variables from root .env ===
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 
-# === Setup directories ===
-ARTICLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'articles')
-os.makedirs(ARTICLES_DIR, exist_ok=True)
-
 # === Sample article URLs or keywords ===
 ARTICLE_KEYWORDS = [
     "how to save money as a student",
@@ -31,53 +41,155 @@ ARTICLE_KEYWORDS = [
     "best investment plan for 2025",
 ]
 
+LOCAL_EXTENSIONS = ('.txt', '.html', '.htm')
+
 # === Google Custom Search API (optional alternative to scraping) ===
 # But here we’ll use simple scraping for now
 
-def fetch_and_save_article(query: str):
-    search_url = f"https://www.google.com/search?q={query.replace(' ', '+')}&num=1"
-    headers = {
-        "User-Agent": "Mozilla/5.0"
-    }
-    response = requests.get(search_url, headers=headers)
+def search_url(query: str) -> str:
+    return f"https://www.google.com/search?q={quote_plus(query)}&num=1"
 
-    soup = BeautifulSoup(response.text, "html.parser")
+
+def first_result_url(search_html: str, base_url: str):
+    """URL of the first link on a search results page, unwrapping /url?q= redirects"""
+    soup = BeautifulSoup(search_html, "html.parser")
     first_result = soup.find("a")
+    if not first_result or "href" not in first_result.attrs:
+        return None
+    url = urljoin(base_url, first_result["href"])
+    parsed = urlparse(url)
+    if parsed.path == "/url" and "q" in parse_qs(parsed.query):
+        url = parse_qs(parsed.query)["q"][0]
+    return url
+
+
+def extract_text(html: str) -> str:
+    """Article text: every paragraph, one per line"""
+    soup = BeautifulSoup(html, "html.parser")
+    return "\n".join(p.get_text() for p in soup.find_all("p"))
+
+
+def article_filename(name: str) -> str:
+    return f"{name.replace(' ', '_')}.txt"
+
+
+def save_article(name: str, content: str, articles_dir: str = ARTICLES_DIR) -> str:
+    os.makedirs(articles_dir, exist_ok=True)
+    filename = os.path.join(articles_dir, article_filename(name))
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(content)
+    return filename
+
+
+async def fetch_articles(queries, articles_dir: str = ARTICLES_DIR, fetcher: AsyncFetcher = None):
+    """
+    Look up every query and download its first result concurrently.
+    Unchanged articles (HTTP 304) are skipped. Returns per-query outcomes.
+    """
+    async def fetch_one(query):
+        search = await fetcher.fetch(search_url(query), conditional=False)
+        if not search.ok:
+            return query, f"search failed: {search.error}"
+        url = first_result_url(search.text, search.url)
+        if not url:
+            return query, "no result"
+
+        # A 304 is only useful while the saved copy still exists
+        if not os.path.exists(os.path.join(articles_dir, article_filename(query))) and fetcher.validators:
+            fetcher.validators.forget(url)
+        article = await fetcher.fetch(url)
+        if article.not_modified:
+            return query, "unchanged"
+        if not article.ok:
+            return query, f"fetch failed: {article.error}"
+        save_article(query, extract_text(article.text), articles_dir)
+        return query, "saved"
+
+    return await asyncio.gather(*(fetch_one(query) for query in queries))
+
+
+def import_local_articles(path: str, articles_dir: str = ARTICLES_DIR):
+    """Copy .txt files and the text of .html files under path into the articles directory"""
+    imported = []
+    for root, _, files in os.walk(path):
+        for file_name in sorted(files):
+            name, ext = os.path.splitext(file_name)
+            if ext.lower() not in LOCAL_EXTENSIONS:
+                continue
+            source = os.path.join(root, file_name)
+            if os.path.abspath(root) == os.path.abspath(articles_dir) and ext.lower() == '.txt':
+                continue  # already in place
+            with open(source, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            if ext.lower() != '.txt':
+                content = extract_text(content)
+            if content.strip():
+                imported.append(save_article(name, content, articles_dir))
+    return imported
+
+
+def ingest(path: str = None, queries=None, fetch: bool = True, full_rebuild: bool = False,
+           articles_dir: str = ARTICLES_DIR, index_dir: str = VECTORSTORE_DIR,
+           max_connections: int = 20, per_host: int = 4, transport=None) -> dict:
+    """
+    Collect articles and bring the vector store and keyword index up to date.
+    With path, articles are imported from that directory and nothing is fetched.
+    """
+    summary = {}
+    if path:
+        summary["imported"] = len(import_local_articles(path, articles_dir))
+        print(f"[+] Imported {summary['imported']} local articles from {path}")
+    elif fetch:
+        validators = ValidatorStore()
+
+        async def run():
+            async with AsyncFetcher(max_connections=max_connections, per_host=per_host,
+                                    validators=validators, transport=transport) as fetcher:
+                return await fetch_articles(queries or ARTICLE_KEYWORDS, articles_dir, fetcher)
+
+        outcomes = asyncio.run(run())
+        validators.save()
+        for query, outcome in outcomes:
+            print(f"[{'+' if outcome in ('saved', 'unchanged') else '!'}] {query}: {outcome}")
+        summary["fetched"] = dict(outcomes)
+
+    # Uses the same chunking and embedding settings as rag_tool, which loads this index at query time.
+    # Only new or changed articles are embedded unless full_rebuild is set.
+    docs = load_documents(articles_dir)
+    _, stats = update_vectorstore(docs, index_dir, full_rebuild=full_rebuild)
+    print(f"[📊] {stats['mode'].title()} update: {stats['added']} added, {stats['changed']} changed, "
+          f"{stats['removed']} removed, {stats['unchanged']} unchanged")
+
+    # Build the BM25 keyword index used by the fallback retriever
+    save_keyword_index(build_keyword_index(docs), index_dir)
+    summary["index"] = stats
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch financial articles and update the RAG indexes.")
+    parser.add_argument("--path", help="import .txt/.html files from this directory instead of fetching")
+    parser.add_argument("--query", action="append", help="search query to fetch (repeatable); defaults to ARTICLE_KEYWORDS")
+    parser.add_argument("--no-fetch", action="store_true", help="only re-index the saved articles")
+    parser.add_argument("--full", action="store_true", help="rebuild the vector store from scratch")
+    parser.add_argument("--articles-dir", default=ARTICLES_DIR, help="where articles are stored")
+    parser.add_argument("--index-dir", default=VECTORSTORE_DIR, help="where the indexes are saved")
+    parser.add_argument("--concurrency", type=int, default=20, help="max concurrent HTTP connections")
+    parser.add_argument("--per-host", type=int, default=4, help="max concurrent requests per host")
+    args = parser.parse_args(argv)
+
+    ingest(
+        path=args.path,
+        queries=args.query,
+        fetch=not args.no_fetch,
+        full_rebuild=args.full,
+        articles_dir=args.articles_dir,
+        index_dir=args.index_dir,
+        max_connections=args.concurrency,
+        per_host=args.per_host,
+    )
+    print("[✅] Ingestion completed. Embeddings stored in vectorstore.")
+
 
-    if first_result and "href" in first_result.attrs:
-        url = first_result["href"]
-        article_response = requests.get(url, headers=headers)
-        article_soup = BeautifulSoup(article_response.text, "html.parser")
-        paragraphs = article_soup.find_all("p")
-        content = "\n".join([p.get_text() for p in paragraphs])
-
-        filename = os.path.join(ARTICLES_DIR, f"{query.replace(' ', '_')}.txt")
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"[+] Saved article for: {query}")
-    else:
-        print(f"[!] Could not fetch article for: {query}")
-
-# === Step 1: Download Articles ===
-for query in ARTICLE_KEYWORDS:
-    fetch_and_save_article(query)
-
-# === Step 2: Load & Split Articles ===
-def load_articles():
-    documents = []
-    for file_name in os.listdir(ARTICLES_DIR):
-        with open(os.path.join(ARTICLES_DIR, file_name), "r", encoding="utf-8") as f:
-            content = f.read()
-            documents.append(Document(page_content=content, metadata={"source": file_name}))
-    return documents
-
-docs = load_articles()
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-chunks = splitter.split_documents(docs)
-
-# === Step 3: Generate Embeddings & Store in FAISS ===
-embedding = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=os.getenv("GOOGLE_API_KEY"))
-db = FAISS.from_documents(chunks, embedding)
-db.save_local(os.path.join(os.path.dirname(__file__), '..', 'vectorstores', 'rag_articles'))
-
-print("[✅] Ingestion completed. Embeddings stored in vectorstore.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+BM25 inverted index over the article corpus, used by the keyword fallback
+retriever when the vectorstore is unavailable.
+
+The index is built once from the loaded documents and persisted as JSON
+next to the FAISS index. It keeps each document's text and line offsets,
+plus the lines every term occurs on, so a query never touches the disk
+and snippets are cut from stored offsets instead of re-splitting text.
+"""
+
+import os
+import re
+import json
+import math
+from collections import Counter, defaultdict
+
+TOKEN_RE = re.compile(r"\w+")
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def normalize_token(token: str) -> str:
+    """Lowercase and fold simple plurals so 'funds' matches 'fund'"""
+    token = token.lower()
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        token = token[:-1]
+    return token
+
+
+def tokenize(text: str):
+    return [normalize_token(t) for t in TOKEN_RE.findall(text)]
+
+
+class KeywordIndex:
+    def __init__(self, documents, line_offsets, postings, term_lines, corpus_fingerprint=""):
+        """
+        documents:    [{"source": str, "text": str}]
+        line_offsets: per document, [[start, end], ...] of each line
+        postings:     term -> {doc_id: term frequency}
+        term_lines:   term -> {doc_id: [line numbers containing the term]}
+        """
+        self.documents = documents
+        self.line_offsets = line_offsets
+        self.postings = postings
+        self.term_lines = term_lines
+        self.corpus_fingerprint = corpus_fingerprint
+        self.doc_lengths = [0] * len(documents)
+        for term_postings in postings.values():
+            for doc_id, tf in term_postings.items():
+                self.doc_lengths[doc_id] += tf
+        self.avg_doc_length = (sum(self.doc_lengths) / len(documents)) if documents else 0.0
+        self.idf = {
+            term: math.log(1 + (len(documents) - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for term, term_postings in postings.items()
+        }
+
+    @classmethod
+    def build(cls, docs, corpus_fingerprint: str = ""):
+        """Index langchain Documents (one entry per article)"""
+        documents, line_offsets = [], []
+        postings = defaultdict(dict)
+        term_lines = defaultdict(dict)
+        for doc_id, doc in enumerate(docs):
+            text = doc.page_content
+            documents.append({"source": doc.metadata.get("source", ""), "text": text})
+            offsets = []
+            counts = Counter()
+            start = 0
+            for line_no, line in enumerate(text.split("\n")):
+                offsets.append([start, start + len(line)])
+                start += len(line) + 1
+                line_terms = tokenize(line)
+                counts.update(line_terms)
+                for term in set(line_terms):
+                    term_lines[term].setdefault(doc_id, []).append(line_no)
+            line_offsets.append(offsets)
+            for term, tf in counts.items():
+                postings[term][doc_id] = tf
+        return cls(documents, line_offsets, dict(postings), dict(term_lines), corpus_fingerprint)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "corpus_fingerprint": self.corpus_fingerprint,
+                "documents": self.documents,
+                "line_offsets": self.line_offsets,
+                "postings": self.postings,
+                "term_lines": self.term_lines,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # JSON object keys are strings; doc ids are list positions
+        postings = {
+            term: {int(doc_id): tf for doc_id, tf in term_postings.items()}
+            for term, term_postings in data["postings"].items()
+        }
+        term_lines = {
+            term: {int(doc_id): lines for doc_id, lines in doc_lines.items()}
+            for term, doc_lines in data["term_lines"].items()
+        }
+        return cls(data["documents"], data["line_offsets"], postings, term_lines, data.get("corpus_fingerprint", ""))
+
+    def search(self, query: str, k: int = 2):
+        """Return up to k (score, doc_id) pairs ranked by BM25"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in term_postings.items():
+                length_norm = 1 - B + B * self.doc_lengths[doc_id] / self.avg_doc_length
+                scores[doc_id] += idf * tf * (K1 + 1) / (tf + K1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(score, doc_id) for doc_id, score in ranked[:k]]
+
+    def snippet(self, doc_id: int, query: str, max_chars: int = 500) -> str:
+        """Lines of the document that contain query terms, up to about max_chars"""
+        text = self.documents[doc_id]["text"]
+        matching = set()
+        for term in set(tokenize(query)):
+            matching.update(self.term_lines.get(term, {}).get(doc_id, ()))
+
+        relevant_lines = []
+        length = 0
+        for line_no in sorted(matching):
+            start, end = self.line_offsets[doc_id][line_no]
+            relevant_lines.append(text[start:end])
+            length += end - start + 1
+            if length > max_chars:
+                break
+
+        if relevant_lines:
+            return "\n".join(relevant_lines)
+        # Fallback to first max_chars chars
+        return text[:max_chars]
@@ -0,0 +1,147 @@
+"""
+Process-wide LLM and embedding clients.
+
+Nodes and retrievers call get_llm() instead of configuring google.generativeai
+themselves, so the SDK is configured once, the model object (and its
+underlying connection) is reused across requests, and the backend can be
+swapped without touching node code.
+
+Backends:
+    gemini  Google Gemini via google.generativeai (default)
+    stub    Deterministic offline backend for tests and benchmarks; no network
+
+Select one with LLM_BACKEND, or register another with register_backend().
+"""
+
+import os
+import time
+import hashlib
+import threading
+import numpy as np
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+# Per-request timeouts in seconds
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT") or 60)
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT") or 30)
+# Simulated latency for the stub backend, in milliseconds
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS") or 0)
+
+
+class LLMBackend:
+    """Interface every backend implements"""
+
+    name = "base"
+
+    def generate(self, prompt: str) -> str:
+        """Return the full answer text ('' when the model returned nothing)"""
+        raise NotImplementedError
+
+    def stream(self, prompt: str):
+        """Yield pieces of the answer as they are generated"""
+        yield self.generate(prompt)
+
+    def embed(self, texts, task_type: str, model_name: str):
+        """Return one embedding per text"""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = LLM_MODEL, timeout: float = LLM_TIMEOUT,
+                 embed_timeout: float = EMBED_TIMEOUT):
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self._genai = genai
+        self._model = genai.GenerativeModel(model_name)
+        self.model_name = model_name
+        self.timeout = timeout
+        self.embed_timeout = embed_timeout
+
+    def generate(self, prompt: str) -> str:
+        response = self._model.generate_content(prompt, request_options={"timeout": self.timeout})
+        return response.text
+
+    def stream(self, prompt: str):
+        response = self._model.generate_content(prompt, stream=True, request_options={"timeout": self.timeout})
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    def embed(self, texts, task_type: str, model_name: str):
+        result = self._genai.embed_content(
+            model=model_name,
+            content=list(texts),
+            task_type=task_type,
+            request_options={"timeout": self.embed_timeout},
+        )
+        return result["embedding"]
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic answers and embeddings derived from a hash of the input,
+    with optional simulated latency. Identical texts always get identical
+    vectors, so retrieval over a stub-built index is repeatable.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms: float = STUB_LATENCY_MS, dim: int = 768):
+        self.latency = latency_ms / 1000.0
+        self.dim = dim
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def generate(self, prompt: str) -> str:
+        self._wait()
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"Stub answer {digest}: build an emergency fund, pay down high-interest debt, and invest regularly in diversified low-cost funds."
+
+    def stream(self, prompt: str):
+        for word in self.generate(prompt).split(" "):
+            yield word + " "
+
+    def embed(self, texts, task_type: str, model_name: str):
+        self._wait()
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+
+_backend_factories = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(name: str, factory):
+    """Make a backend available to get_llm(name) / LLM_BACKEND"""
+    _backend_factories[name] = factory
+
+
+def get_llm(name: str = None) -> LLMBackend:
+    """Shared backend instance for this process, created on first use"""
+    name = name or LLM_BACKEND
+    if name not in _backends:
+        with _backends_lock:
+            if name not in _backends:
+                if name not in _backend_factories:
+                    raise ValueError(f"Unknown LLM backend '{name}'")
+                _backends[name] = _backend_factories[name]()
+    return _backends[name]
+
+
+def set_llm(backend: LLMBackend, name: str = None):
+    """Install a ready-made backend, e.g. a StubBackend with custom latency in a benchmark"""
+    with _backends_lock:
+        _backends[name or LLM_BACKEND] = backend
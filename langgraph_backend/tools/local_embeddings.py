@@ -0,0 +1,126 @@
+"""
+In-process embedding backends, so an index can be built and queried without
+a network round trip per query.
+
+Backends:
+    hashing                Signed feature hashing of word unigrams and bigrams
+                           with sublinear term frequency. No model download and
+                           no extra dependencies; fast enough for query time.
+    sentence-transformers  A sentence-transformers model on the CPU (optional,
+                           pip install sentence-transformers)
+
+Each backend has the same embed(texts, task_type, model_name) method as the
+LLM backends, so GeminiEmbeddings batches, times and caches it the same way.
+Its batch_size and max_workers size the thread pool used for documents.
+"""
+
+import os
+import re
+import zlib
+import threading
+from collections import Counter
+import numpy as np
+
+# Vector size of the hashing backend (a power of two spreads the hashes evenly)
+LOCAL_EMBEDDINGS_DIM = int(os.getenv("LOCAL_EMBEDDINGS_DIM") or 512)
+# Model used by the sentence-transformers backend
+LOCAL_EMBEDDINGS_MODEL = os.getenv("LOCAL_EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Texts per batch and batches embedded at once when indexing documents
+LOCAL_EMBED_BATCH_SIZE = int(os.getenv("LOCAL_EMBED_BATCH_SIZE") or 256)
+LOCAL_EMBED_WORKERS = int(os.getenv("LOCAL_EMBED_WORKERS") or os.cpu_count() or 1)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """
+    Every unigram and bigram is hashed with crc32: the low bits pick the
+    dimension and the top bit the sign, so collisions tend to cancel out.
+    Counts are weighted 1 + log(tf) and rows are L2-normalized. Stateless,
+    so identical texts get identical vectors in every process.
+    """
+
+    name = "hashing"
+    # Recomputing is cheaper than a disk lookup
+    cacheable = False
+
+    def __init__(self, dim: int = LOCAL_EMBEDDINGS_DIM, batch_size: int = LOCAL_EMBED_BATCH_SIZE,
+                 max_workers: int = LOCAL_EMBED_WORKERS):
+        self.dim = dim
+        self.embedding_model = f"hashing-{dim}"
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    @staticmethod
+    def features(text: str) -> list:
+        tokens = TOKEN_RE.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts, task_type: str = None, model_name: str = None):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(self.features(text))
+            if not counts:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in counts),
+                                 dtype=np.uint32, count=len(counts))
+            weights = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+            signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs * weights)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1)
+        return vectors.tolist()
+
+
+class SentenceTransformerEmbedder:
+    """A sentence-transformers model, loaded once per process"""
+
+    name = "sentence-transformers"
+    cacheable = True
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDINGS_MODEL, batch_size: int = LOCAL_EMBED_BATCH_SIZE,
+                 max_workers: int = LOCAL_EMBED_WORKERS):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The sentence-transformers embedding backend needs: pip install sentence-transformers"
+            ) from e
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.embedding_model = model_name
+        self.batch_size = batch_size
+        # torch already spreads one batch across cores
+        self.max_workers = min(max_workers, 2)
+
+    def embed(self, texts, task_type: str = None, model_name: str = None):
+        vectors = self._model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                     normalize_embeddings=True, show_progress_bar=False)
+        return vectors.astype(np.float32).tolist()
+
+
+_embedder_factories = {
+    "hashing": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def is_local_embedder(name: str) -> bool:
+    return name in _embedder_factories
+
+
+def register_embedder(name: str, factory):
+    """Make an in-process embedder available as EMBEDDINGS_BACKEND=name"""
+    _embedder_factories[name] = factory
+
+
+def get_local_embedder(name: str):
+    """Shared embedder instance for this process, created on first use"""
+    if name not in _embedders:
+        with _embedders_lock:
+            if name not in _embedders:
+                if name not in _embedder_factories:
+                    raise ValueError(f"Unknown embedding backend '{name}'")
+                _embedders[name] = _embedder_factories[name]()
+    return _embedders[name]
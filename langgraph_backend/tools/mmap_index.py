@@ -0,0 +1,170 @@
+"""
+Read-only vector index whose data lives in memory-mapped files.
+
+A LangChain FAISS store keeps every chunk as a Python Document in a pickled
+docstore, so each server worker holds its own copy of the whole corpus.
+This format keeps the vectors and the chunk texts in flat files that every
+worker maps read-only, so all workers on a machine share one copy in the
+page cache and per-process memory stays small regardless of corpus size.
+
+Files in the index directory:
+    vectors.npy       float32 [n, dim], row i is chunk i
+    norms.npy         float32 [n], squared L2 norm of each row
+    texts.bin         UTF-8 chunk texts back to back
+    offsets.npy       int64 [n + 1], chunk i is texts.bin[offsets[i]:offsets[i + 1]]
+    metadata_ids.npy  int32 [n], position of the chunk's metadata in meta.json
+    meta.json         dim, count, the distinct metadata dicts, and caller-supplied fields
+
+Distances are squared L2, matching the default LangChain FAISS index, so the
+two return the same ranking.
+"""
+
+import os
+import json
+import numpy as np
+from langchain.docstore.document import Document
+
+META_FILE = "meta.json"
+# Rows scored per step, which bounds the scratch memory of a search
+SEARCH_BLOCK_ROWS = 65536
+
+
+def _load_array(path: str, dtype):
+    array = np.load(path, mmap_mode="r")
+    if array.dtype != dtype:
+        raise ValueError(f"{os.path.basename(path)} has dtype {array.dtype}, expected {dtype}")
+    return array
+
+
+class MmapVectorIndex:
+    def __init__(self, path: str, embed_query=None):
+        """
+        Open the index in path. embed_query(text) -> vector is only needed
+        for the text-query methods (similarity_search and friends).
+        """
+        self.path = path
+        self.embed_query = embed_query
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = _load_array(os.path.join(path, "vectors.npy"), np.float32)
+        self.norms = _load_array(os.path.join(path, "norms.npy"), np.float32)
+        self.offsets = _load_array(os.path.join(path, "offsets.npy"), np.int64)
+        self.metadata_ids = _load_array(os.path.join(path, "metadata_ids.npy"), np.int32)
+        self.metadatas = self.meta.get("metadatas", [])
+        texts_path = os.path.join(path, "texts.bin")
+        if os.path.getsize(texts_path):
+            self.texts = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            self.texts = np.zeros(0, dtype=np.uint8)
+
+        count = self.meta["count"]
+        if (
+            self.vectors.shape != (count, self.meta["dim"])
+            or len(self.norms) != count
+            or len(self.offsets) != count + 1
+            or len(self.metadata_ids) != count
+            or (count and self.offsets[-1] != len(self.texts))
+        ):
+            raise ValueError(f"Memory-mapped index in {path} is incomplete or inconsistent")
+
+    @staticmethod
+    def write(path: str, vectors, texts, metadatas=None, meta: dict = None):
+        """
+        Write an index for vectors[i] / texts[i] / metadatas[i]. meta.json is
+        written last, so a reader never sees a new meta.json with old arrays.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(texts):
+            raise ValueError("Expected one vector per text")
+        metadatas = metadatas if metadatas is not None else [{}] * len(texts)
+
+        distinct, metadata_ids = {}, np.empty(len(texts), dtype=np.int32)
+        for i, metadata in enumerate(metadatas):
+            key = json.dumps(metadata or {}, sort_keys=True)
+            metadata_ids[i] = distinct.setdefault(key, len(distinct))
+
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+        os.makedirs(path, exist_ok=True)
+
+        def replace(name, write_fn):
+            # Workers that already mapped the old file keep reading it until they reopen
+            tmp_path = os.path.join(path, name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                write_fn(f)
+            os.replace(tmp_path, os.path.join(path, name))
+
+        replace("vectors.npy", lambda f: np.save(f, vectors))
+        replace("norms.npy", lambda f: np.save(f, np.einsum("ij,ij->i", vectors, vectors)))
+        replace("texts.bin", lambda f: f.writelines(encoded))
+        replace("offsets.npy", lambda f: np.save(f, offsets))
+        replace("metadata_ids.npy", lambda f: np.save(f, metadata_ids))
+        full_meta = dict(
+            meta or {},
+            dim=int(vectors.shape[1]),
+            count=len(texts),
+            metadatas=[json.loads(key) for key in distinct],
+        )
+        replace(META_FILE, lambda f: f.write(json.dumps(full_meta, indent=2).encode("utf-8")))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def text(self, i: int) -> str:
+        return bytes(self.texts[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def document(self, i: int) -> Document:
+        """Chunk i as a Document, created on demand"""
+        return Document(page_content=self.text(i), metadata=dict(self.metadatas[self.metadata_ids[i]]))
+
+    def search(self, queries, k: int = 4):
+        """
+        Exact nearest neighbours for a batch of query vectors.
+        Returns (distances, ids), both [len(queries), k], nearest first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if queries.shape[1] != self.vectors.shape[1]:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.vectors.shape[1]}")
+        k = min(k, len(self))
+        best_distances = np.zeros((len(queries), 0), dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        if k <= 0:
+            return best_distances, best_ids
+
+        query_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            distances = self.norms[start:start + len(block)] - 2 * (queries @ block.T) + query_norms
+            take = min(k, len(block))
+            ids = np.argpartition(distances, take - 1, axis=1)[:, :take]
+            best_distances = np.concatenate([best_distances, np.take_along_axis(distances, ids, axis=1)], axis=1)
+            best_ids = np.concatenate([best_ids, ids + start], axis=1)
+            if best_ids.shape[1] > k:
+                keep = np.argpartition(best_distances, k - 1, axis=1)[:, :k]
+                best_distances = np.take_along_axis(best_distances, keep, axis=1)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        return np.take_along_axis(best_distances, order, axis=1), np.take_along_axis(best_ids, order, axis=1)
+
+    def similarity_search_by_vectors(self, vectors, k: int = 4):
+        """One list of (Document, distance) pairs per query vector"""
+        distances, ids = self.search(vectors, k)
+        return [
+            [(self.document(int(i)), float(d)) for d, i in zip(row_distances, row_ids)]
+            for row_distances, row_ids in zip(distances, ids)
+        ]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4):
+        return [doc for doc, _ in self.similarity_search_by_vectors([embedding], k)[0]]
+
+    def similarity_search_with_score(self, query: str, k: int = 4):
+        if self.embed_query is None:
+            raise ValueError("This index was opened without an embed_query function")
+        return self.similarity_search_by_vectors([self.embed_query(query)], k)[0]
+
+    def similarity_search(self, query: str, k: int = 4):
+        """Same call shape as the LangChain FAISS store"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
@@ -4,22 +4,95 @@ A simple RAG tool using FAISS and Langchain to retrieve relevant chunks from doc
 """
 
 import os
+import json
+import pickle
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import CharacterTextSplitter
+from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.docstore.document import Document
-import google.generativeai as genai
+from langchain_core.embeddings import Embeddings
+from google.api_core import exceptions as google_exceptions
+from tools.llm_client import get_llm
+from tools.embedding_cache import EmbeddingCache, cache_namespace, embedding_key, DEFAULT_CACHE_DIR
+from tools.keyword_index import KeywordIndex
+from tools.mmap_index import MmapVectorIndex
+from tools.local_embeddings import is_local_embedder, get_local_embedder
+from tools.singleflight import SingleFlight
+from metrics import increment, span
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking
+    fcntl = None
+
 # Load environment variables from root .env file
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 
+# Index settings - a saved index built with different settings is treated as stale
+# Embedding backend: empty uses the LLM backend (Gemini API); "hashing" or
+# "sentence-transformers" embed in-process, with no network call per query
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "")
+# Model for API embeddings; local backends name their own model
+EMBEDDINGS_MODEL = os.getenv("EMBEDDINGS_MODEL", "models/embedding-001")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE") or 1000)
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP") or 200)
+
+# Where ingest_docs.py and the server persist the FAISS index
+VECTORSTORE_DIR = os.getenv("VECTORSTORE_DIR") or os.path.join(os.path.dirname(__file__), '..', 'vectorstores', 'rag_articles')
+INDEX_META_FILE = "index_meta.json"
+KEYWORD_INDEX_FILE = "keyword_index.json"
+# Per-article content hashes and chunk ids, used for incremental updates
+MANIFEST_FILE = "manifest.json"
+# Held while a process builds or updates the index, so workers starting together build it once
+INDEX_LOCK_FILE = ".build.lock"
+# Read-only memory-mapped export of the index, shared by all worker processes
+MMAP_INDEX_DIR = "mmap"
+# Serve queries from the memory-mapped export instead of a per-process FAISS store
+VECTORSTORE_MMAP = os.getenv("VECTORSTORE_MMAP", "true").lower() == "true"
+
+# Document embedding: texts per API request (Gemini accepts up to 100),
+# batches in flight at once, and retries on quota/availability errors
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE") or 100)
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY") or 4)
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES") or 5)
+
+# Errors worth retrying with backoff; anything else fails the batch immediately
+RETRYABLE_EMBED_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+# On-disk cache of document embeddings, one subdirectory per model; set EMBEDDING_CACHE_DIR to "" to disable
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_CACHE_DIR)
+_embedding_caches = {}
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(namespace: str):
+    """Shared EmbeddingCache for one model (see cache_namespace), or None when caching is disabled"""
+    if not EMBEDDING_CACHE_DIR:
+        return None
+    if namespace not in _embedding_caches:
+        with _embedding_cache_lock:
+            if namespace not in _embedding_caches:
+                _embedding_caches[namespace] = EmbeddingCache(os.path.join(EMBEDDING_CACHE_DIR, namespace))
+    return _embedding_caches[namespace]
+
 # Example: Load documents from a local file (can be replaced with any loader)
-def load_documents():
+ARTICLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'articles')
+
+def load_documents(articles_dir: str = ARTICLES_DIR):
     """Load actual financial articles from the data/articles directory"""
-    import os
     documents = []
-    articles_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'articles')
     
     if os.path.exists(articles_dir):
         for filename in os.listdir(articles_dir):
@@ -50,44 +123,445 @@ def load_documents():
     return documents
 
 
+def get_embedding_backend(name: str = None):
+    """The object whose embed() computes vectors: an in-process embedder, or the LLM backend"""
+    name = name or EMBEDDINGS_BACKEND
+    if is_local_embedder(name):
+        return get_local_embedder(name)
+    return get_llm(name or None)
+
+
+def embeddings_model(backend) -> str:
+    return getattr(backend, "embedding_model", EMBEDDINGS_MODEL)
+
+
+_queries_in_flight = SingleFlight("embed_query")
+
+
+class GeminiEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_name: str = None,
+        batch_size: int = None,
+        max_workers: int = None,
+        max_retries: int = EMBED_MAX_RETRIES,
+        progress=None,
+        use_cache: bool = True,
+        backend: str = None,
+    ):
+        """
+        backend names the embedding backend (default EMBEDDINGS_BACKEND);
+        batch size and concurrency default to the backend's own, or to
+        EMBED_BATCH_SIZE/EMBED_CONCURRENCY for the API.
+        progress is an optional callback(embedded, total) called after each
+        document batch finishes; by default progress is printed for
+        multi-batch jobs. With use_cache, document embeddings are looked up
+        in the on-disk embedding cache and only misses reach the API.
+        """
+        self.backend = get_embedding_backend(backend)
+        self.model_name = model_name or embeddings_model(self.backend)
+        self.batch_size = max(1, batch_size or getattr(self.backend, "batch_size", EMBED_BATCH_SIZE))
+        self.max_workers = max(1, max_workers or getattr(self.backend, "max_workers", EMBED_CONCURRENCY))
+        self.max_retries = max_retries
+        self.progress = progress
+        cacheable = getattr(self.backend, "cacheable", True)
+        self.cache = None
+        if use_cache and cacheable:
+            self.cache = get_embedding_cache(cache_namespace(self.backend.name, self.model_name))
 
-class GeminiEmbeddings:
-    def __init__(self, api_key: str = None, model_name: str = "models/embedding-001"):
-        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
-        self.model_name = model_name
-        genai.configure(api_key=self.api_key)
+    def _embed_batch(self, texts, task_type):
+        """Embed several texts in one request, backing off on quota errors"""
+        delay = 1.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("embed_batch"):
+                    return self.backend.embed(texts, task_type, self.model_name)
+            except RETRYABLE_EMBED_ERRORS as e:
+                increment("embed_retries")
+                if attempt == self.max_retries:
+                    raise
+                wait = delay + random.uniform(0, delay)
+                print(f"Embedding request failed ({e.__class__.__name__}), retrying in {wait:.1f}s")
+                time.sleep(wait)
+                delay = min(delay * 2, 60)
+
+    def _report_progress(self, embedded, total, batches):
+        if self.progress:
+            self.progress(embedded, total)
+        elif batches > 1:
+            print(f"[🔄] Embedded {embedded}/{total} chunks")
 
     def embed_documents(self, texts):
         # Filter out empty strings
         texts = [t for t in texts if t and t.strip()]
         if not texts:
             return []
-        embeddings = [genai.embed_content(model=self.model_name, content=t, task_type="retrieval_document")["embedding"] for t in texts]
+
+        if self.cache is None:
+            return self._embed_uncached(texts)
+
+        # Vectors from different backends are not interchangeable
+        model_key = f"{self.backend.name}:{self.model_name}"
+        keys = [embedding_key(model_key, "retrieval_document", t) for t in texts]
+        embeddings = self.cache.get_many(keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            print(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+            fresh = self._embed_uncached([texts[i] for i in missing])
+            for i, embedding in zip(missing, fresh):
+                embeddings[i] = embedding
+            try:
+                self.cache.put_many([keys[i] for i in missing], fresh)
+            except (OSError, ValueError) as e:
+                # ValueError: the cache holds vectors of another size, e.g. written before a model change
+                print(f"Could not write embedding cache: {e}")
         return embeddings
 
+    def _embed_uncached(self, texts, task_type="retrieval_document"):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = [None] * len(batches)
+        embedded = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            futures = {
+                pool.submit(self._embed_batch, batch, task_type): i
+                for i, batch in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                embedded += len(batches[i])
+                self._report_progress(embedded, len(texts), len(batches))
+
+        return [embedding for batch in results for embedding in batch]
+
+    def _embed_query(self, text):
+        with span("embed_query"):
+            return self.backend.embed([text], "retrieval_query", self.model_name)[0]
+
     def embed_query(self, text):
         if not text or not text.strip():
             raise ValueError("Query text for embedding is empty.")
-        embedding = genai.embed_content(model=self.model_name, content=text, task_type="retrieval_query")["embedding"]
-        return embedding
+        # Identical queries embedded at the same moment share one request
+        key = (self.backend.name, self.model_name, text)
+        return _queries_in_flight.do(key, self._embed_query, text)
+
+    def embed_queries(self, texts):
+        """Embed many queries in batched requests instead of one request per query"""
+        texts = list(texts)
+        if not texts:
+            return []
+        if any(not text or not text.strip() for text in texts):
+            raise ValueError("Query text for embedding is empty.")
+        return self._embed_uncached(texts, "retrieval_query")
 
     def __call__(self, text):
         return self.embed_query(text)
 
-def build_vectorstore():
-    docs = load_documents()
-    text_splitter = CharacterTextSplitter(chunk_size=100, chunk_overlap=0)
-    split_docs = text_splitter.split_documents(docs)
+def split_documents(docs):
+    """Split articles into the chunks that get embedded"""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return text_splitter.split_documents(docs)
+
+
+def index_settings() -> dict:
+    """Settings that must match for a saved index to be reused"""
+    backend = get_embedding_backend()
+    return {
+        "embeddings_backend": backend.name,
+        "embeddings_model": embeddings_model(backend),
+        "splitter": "RecursiveCharacterTextSplitter",
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+
+
+def corpus_fingerprint(docs) -> str:
+    """Hash of every source document, so edited or added articles invalidate the index"""
+    digest = hashlib.sha256()
+    for doc in sorted(docs, key=lambda d: (d.metadata.get("source", ""), d.page_content)):
+        digest.update(doc.metadata.get("source", "").encode("utf-8"))
+        digest.update(hashlib.sha256(doc.page_content.encode("utf-8")).digest())
+    return digest.hexdigest()
+
+
+def document_key(doc) -> str:
+    """Stable identity of a source article"""
+    return doc.metadata.get("source") or hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_documents(docs):
+    """
+    Split each article and give every chunk an id derived from the article
+    and its content hash. Returns (chunks, ids, manifest entries per article).
+    """
+    chunks, ids, entries = [], [], {}
+    for doc in docs:
+        key = document_key(doc)
+        content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+        doc_chunks = split_documents([doc])
+        doc_ids = [f"{key}:{content_hash[:12]}:{i}" for i in range(len(doc_chunks))]
+        chunks.extend(doc_chunks)
+        ids.extend(doc_ids)
+        entries[key] = {"sha256": content_hash, "chunk_ids": doc_ids}
+    return chunks, ids, entries
+
+
+def build_vectorstore(docs=None):
+    docs = docs if docs is not None else load_documents()
+    chunks, ids, _ = chunk_documents(docs)
     embeddings = GeminiEmbeddings()
-    return FAISS.from_documents(split_docs, embeddings)
+    return FAISS.from_documents(chunks, embeddings, ids=ids)
+
+
+def save_vectorstore(vectorstore, docs, path: str = VECTORSTORE_DIR):
+    """
+    Persist the index together with the settings, corpus and manifest it was
+    built from, plus its memory-mapped export. Callers hold index_build_lock.
+    """
+    vectorstore.save_local(path)
+    meta = dict(index_settings(), corpus_fingerprint=corpus_fingerprint(docs), created=time.strftime('%Y-%m-%d %H:%M:%S'))
+    with open(os.path.join(path, INDEX_META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    _, _, entries = chunk_documents(docs)
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"settings": index_settings(), "documents": entries}, f, indent=2)
+    export_mmap_index(vectorstore, docs, path)
+
+
+def export_mmap_index(vectorstore, docs, path: str = VECTORSTORE_DIR):
+    """Write the FAISS store's vectors and chunks in the shared memory-mapped format"""
+    index = vectorstore.index
+    vectors = index.reconstruct_n(0, index.ntotal) if index.ntotal else np.zeros((0, index.d), dtype=np.float32)
+    chunks = [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        for i in range(index.ntotal)
+    ]
+    MmapVectorIndex.write(
+        os.path.join(path, MMAP_INDEX_DIR),
+        vectors,
+        [chunk.page_content for chunk in chunks],
+        [chunk.metadata for chunk in chunks],
+        dict(index_settings(), corpus_fingerprint=corpus_fingerprint(docs)),
+    )
+
+
+def stale_settings(meta: dict, docs) -> list:
+    """Index settings (or the corpus) that changed since meta was written"""
+    expected = dict(index_settings(), corpus_fingerprint=corpus_fingerprint(docs))
+    return [key for key, value in expected.items() if meta.get(key) != value]
+
+
+def index_embeddings(meta: dict) -> GeminiEmbeddings:
+    """Embedder for a saved index, from the backend and model recorded in its settings"""
+    return GeminiEmbeddings(model_name=meta.get("embeddings_model"), backend=meta.get("embeddings_backend"))
+
+
+def query_embeddings(vectorstore) -> GeminiEmbeddings:
+    """The embedder attached to a store, so queries land in the vector space it was built in"""
+    embeddings = getattr(vectorstore, "embedding_function", None) or getattr(vectorstore, "embed_query", None)
+    return embeddings if isinstance(embeddings, GeminiEmbeddings) else GeminiEmbeddings()
+
+
+def read_vectorstore(path: str = VECTORSTORE_DIR, mmap: bool = True):
+    """Open the saved FAISS index; with mmap=True the vectors are memory-mapped instead of copied"""
+    import faiss
+    index_path = os.path.join(path, "index.faiss")
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP if mmap else 0)
+    except RuntimeError:
+        # Not every index type supports memory-mapped reads
+        index = faiss.read_index(index_path)
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(GeminiEmbeddings(), index, docstore, index_to_docstore_id)
+
+
+def load_vectorstore(docs, path: str = VECTORSTORE_DIR, mmap: bool = True):
+    """
+    Open the saved index if it exists and was built from the current
+    settings and articles. Returns None when the index is missing or stale.
+    """
+    meta_path = os.path.join(path, INDEX_META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read index metadata: {e}")
+        return None
+
+    stale = stale_settings(meta, docs)
+    if stale:
+        print(f"Saved index is stale ({', '.join(stale)} changed), updating")
+        return None
+    return read_vectorstore(path, mmap)
+
+
+def load_mmap_index(docs, path: str = VECTORSTORE_DIR):
+    """Open the memory-mapped export if it exists and is current, otherwise None"""
+    mmap_path = os.path.join(path, MMAP_INDEX_DIR)
+    if not os.path.exists(os.path.join(mmap_path, "meta.json")):
+        return None
+    try:
+        index = MmapVectorIndex(mmap_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not open memory-mapped index: {e}")
+        return None
+    if stale_settings(index.meta, docs):
+        return None
+    index.embed_query = index_embeddings(index.meta)
+    return index
+
+
+def load_manifest(path: str = VECTORSTORE_DIR):
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read index manifest: {e}")
+        return None
+
+
+@contextmanager
+def index_build_lock(path: str = VECTORSTORE_DIR):
+    """
+    Exclusive lock, across processes, on building or updating the index in
+    path. A read-only deploy, where the lock file cannot be created, builds
+    in memory only and so goes unlocked.
+    """
+    try:
+        os.makedirs(path, exist_ok=True)
+        lock_file = open(os.path.join(path, INDEX_LOCK_FILE), "a")
+    except OSError as e:
+        print(f"Could not lock vectorstore: {e}")
+        yield
+        return
+    with lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def update_vectorstore(docs=None, path: str = VECTORSTORE_DIR, full_rebuild: bool = False):
+    """
+    Bring the saved index in line with the articles, re-embedding only new
+    or changed articles and deleting the vectors of removed ones. Falls back
+    to a full build when there is no usable manifest or the index settings
+    changed. Returns (vectorstore, stats) and saves the result.
+    """
+    docs = docs if docs is not None else load_documents()
+    with index_build_lock(path):
+        return _update_vectorstore(docs, path, full_rebuild)
+
+
+def _update_vectorstore(docs, path, full_rebuild):
+    """update_vectorstore, for callers already holding index_build_lock"""
+    manifest = None if full_rebuild else load_manifest(path)
+    if (
+        manifest is None
+        or manifest.get("settings") != index_settings()
+        or not os.path.exists(os.path.join(path, "index.faiss"))
+    ):
+        vectorstore = build_vectorstore(docs)
+        stats = {"mode": "full", "added": len(docs), "changed": 0, "removed": 0, "unchanged": 0}
+        _try_save_vectorstore(vectorstore, docs, path)
+        return vectorstore, stats
+
+    previous = manifest.get("documents", {})
+    current = {document_key(doc): doc for doc in docs}
+    current_hashes = {
+        key: hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+        for key, doc in current.items()
+    }
+    added = [key for key in current if key not in previous]
+    changed = [key for key in current if key in previous and previous[key]["sha256"] != current_hashes[key]]
+    removed = [key for key in previous if key not in current]
+    stats = {
+        "mode": "incremental",
+        "added": len(added),
+        "changed": len(changed),
+        "removed": len(removed),
+        "unchanged": len(current) - len(added) - len(changed),
+    }
+
+    # The mutable copy is needed for deletes, so no memory-mapping here
+    vectorstore = read_vectorstore(path, mmap=False)
+    stale_ids = [chunk_id for key in changed + removed for chunk_id in previous[key]["chunk_ids"]]
+    if stale_ids:
+        vectorstore.delete(stale_ids)
+    new_docs = [current[key] for key in added + changed]
+    if new_docs:
+        chunks, ids, _ = chunk_documents(new_docs)
+        vectorstore.add_documents(chunks, ids=ids)
+
+    _try_save_vectorstore(vectorstore, docs, path)
+    return vectorstore, stats
+
+
+def _try_save_vectorstore(vectorstore, docs, path):
+    try:
+        save_vectorstore(vectorstore, docs, path)
+    except OSError as e:
+        # A read-only deploy can still serve from the in-memory index
+        print(f"Could not save vectorstore: {e}")
+
+
+def load_or_build_vectorstore(path: str = VECTORSTORE_DIR):
+    """
+    Reuse the saved index when it is current, otherwise update and save it.
+    With VECTORSTORE_MMAP, queries are served from the memory-mapped export
+    whenever one is available, so workers share its pages.
+    """
+    docs = load_documents()
+    # The export is replaced file by file with meta.json last, so it is safe to open unlocked
+    if VECTORSTORE_MMAP:
+        index = load_mmap_index(docs, path)
+        if index is not None:
+            return index
+
+    # One process builds while the others wait, then finds the saved index current
+    with index_build_lock(path):
+        if VECTORSTORE_MMAP:
+            index = load_mmap_index(docs, path)
+            if index is not None:
+                return index
+
+        vectorstore = load_vectorstore(docs, path)
+        if vectorstore is None:
+            vectorstore, stats = _update_vectorstore(docs, path, full_rebuild=False)
+            print(f"Vectorstore updated: {stats}")
+        elif VECTORSTORE_MMAP:
+            # Index saved before the export existed
+            try:
+                export_mmap_index(vectorstore, docs, path)
+            except OSError as e:
+                print(f"Could not export memory-mapped index: {e}")
+
+    if VECTORSTORE_MMAP:
+        index = load_mmap_index(docs, path)
+        if index is not None:
+            return index
+    return vectorstore
 
 # Cache the vectorstore in memory for demo
 _vectorstore = None
+# Graph runs execute on a thread pool, so only one thread may build the store
+_vectorstore_lock = threading.Lock()
 
 def get_vectorstore():
     global _vectorstore
     if _vectorstore is None:
-        _vectorstore = build_vectorstore()
+        with _vectorstore_lock:
+            if _vectorstore is None:
+                _vectorstore = load_or_build_vectorstore()
     return _vectorstore
 
 def query_rag(query: str, k: int = 2) -> str:
@@ -98,59 +572,109 @@ def query_rag(query: str, k: int = 2) -> str:
     try:
         # Try to use the full vectorstore approach
         vs = get_vectorstore()
-        docs = vs.similarity_search(query, k=k)
+        vector = query_embeddings(vs).embed_query(query)
+        with span("vector_search"):
+            docs = vs.similarity_search_by_vector(vector, k=k)
         return "\n".join([d.page_content for d in docs])
     except Exception as e:
         print(f"Vectorstore failed: {e}")
+        increment("vectorstore_fallback")
         # Fallback to simple keyword matching
         return query_rag_simple(query, k)
 
 
-def query_rag_simple(query: str, k: int = 2) -> str:
+def search_by_vectors(vectorstore, vectors, k: int = 2) -> list:
+    """
+    Nearest chunks for a batch of query vectors in one matrix search, on
+    either the memory-mapped index or a FAISS store. One list of Documents
+    per vector.
+    """
+    if isinstance(vectorstore, MmapVectorIndex):
+        return [[doc for doc, _ in hits] for hits in vectorstore.similarity_search_by_vectors(vectors, k)]
+    _, ids = vectorstore.index.search(np.asarray(vectors, dtype=np.float32), k)
+    return [
+        [vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(i)]) for i in row if i != -1]
+        for row in ids
+    ]
+
+
+def query_rag_batch(queries, k: int = 2) -> list:
     """
-    Simple keyword-based retrieval as fallback.
+    query_rag for many queries at once: one batched embedding call and one
+    matrix search instead of a round trip per query. Falls back to keyword
+    matching when the vectorstore or embeddings fail.
     """
+    queries = list(queries)
+    if not queries:
+        return []
+    try:
+        vs = get_vectorstore()
+        vectors = query_embeddings(vs).embed_queries(queries)
+        with span("vector_search_batch"):
+            results = search_by_vectors(vs, vectors, k)
+        return ["\n".join(d.page_content for d in docs) for docs in results]
+    except Exception as e:
+        print(f"Batch vectorstore search failed: {e}")
+        increment("vectorstore_fallback", len(queries))
+        return [query_rag_simple(query, k) for query in queries]
+
+
+def build_keyword_index(docs):
+    return KeywordIndex.build(docs, corpus_fingerprint(docs))
+
+
+def save_keyword_index(keyword_index, path: str = VECTORSTORE_DIR):
+    keyword_index.save(os.path.join(path, KEYWORD_INDEX_FILE))
+
+
+def load_or_build_keyword_index(path: str = VECTORSTORE_DIR):
+    """Reuse the saved keyword index when it matches the articles, otherwise rebuild and save it"""
     docs = load_documents()
-    query_lower = query.lower()
-    
-    # Score documents based on keyword matches
-    scored_docs = []
-    for doc in docs:
-        content_lower = doc.page_content.lower()
-        score = 0
-        for word in query_lower.split():
-            if word in content_lower:
-                score += content_lower.count(word)
-        if score > 0:
-            scored_docs.append((score, doc))
-    
-    # Sort by score and return top k
-    scored_docs.sort(key=lambda x: x[0], reverse=True)
-    top_docs = scored_docs[:k]
+    fingerprint = corpus_fingerprint(docs)
+    index_path = os.path.join(path, KEYWORD_INDEX_FILE)
+    if os.path.exists(index_path):
+        try:
+            keyword_index = KeywordIndex.load(index_path)
+            if keyword_index.corpus_fingerprint == fingerprint:
+                return keyword_index
+            print("Saved keyword index is stale, rebuilding")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read keyword index: {e}")
+
+    keyword_index = KeywordIndex.build(docs, fingerprint)
+    try:
+        save_keyword_index(keyword_index, path)
+    except OSError as e:
+        print(f"Could not save keyword index: {e}")
+    return keyword_index
+
+
+_keyword_index = None
+_keyword_index_lock = threading.Lock()
+
+def get_keyword_index():
+    global _keyword_index
+    if _keyword_index is None:
+        with _keyword_index_lock:
+            if _keyword_index is None:
+                _keyword_index = load_or_build_keyword_index()
+    return _keyword_index
+
+
+def query_rag_simple(query: str, k: int = 2) -> str:
+    """
+    Simple keyword-based retrieval as fallback, ranked by BM25 over the
+    in-memory keyword index.
+    """
+    keyword_index = get_keyword_index()
+    with span("keyword_search"):
+        top_docs = keyword_index.search(query, k)
     
     if not top_docs:
         return "No relevant financial information found for your query."
     
-    # Return concatenated content from top documents
-    results = []
-    for score, doc in top_docs:
-        # Extract first few paragraphs
-        content = doc.page_content
-        # Find relevant sections (first 1000 chars that contain query words)
-        lines = content.split('\n')
-        relevant_lines = []
-        for line in lines:
-            if any(word in line.lower() for word in query_lower.split()):
-                relevant_lines.append(line)
-                if len('\n'.join(relevant_lines)) > 500:
-                    break
-        
-        if relevant_lines:
-            results.append('\n'.join(relevant_lines))
-        else:
-            # Fallback to first 500 chars
-            results.append(content[:500])
-    
+    # Return the relevant lines (about 500 chars) from each top document
+    results = [keyword_index.snippet(doc_id, query) for score, doc_id in top_docs]
     return "\n\n---\n\n".join(results)
 
 
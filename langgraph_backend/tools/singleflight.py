@@ -0,0 +1,84 @@
+"""
+Single-flight call coalescing.
+
+While a call for some key is running, further calls with the same key wait
+for it and receive its result (or its exception) instead of running again.
+Nothing is kept once the call finishes, so unlike a cache a result is never
+served after it was produced; it only absorbs bursts of identical work,
+such as many users asking a trending question at the same moment.
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+from metrics import increment
+
+# Set to false to run every call independently
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+
+class CallAbandoned(Exception):
+    """The leading call stopped without a result (e.g. its stream was closed); waiters run it themselves"""
+
+
+class SingleFlight:
+    def __init__(self, name: str, enabled: bool = SINGLEFLIGHT_ENABLED):
+        """name labels the shared-call counter (<name>_coalesced) in /metrics"""
+        self.name = name
+        self.enabled = enabled
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def join(self, key):
+        """
+        Returns (future, leader). The leader must run the call and end it with
+        resolve() or fail(); everyone else waits on future.result().
+        """
+        if not self.enabled:
+            return Future(), True
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            increment(f"{self.name}_coalesced")
+        return future, leader
+
+    def resolve(self, key, future: Future, result):
+        self._finish(key, future)
+        future.set_result(result)
+
+    def fail(self, key, future: Future, error: BaseException):
+        self._finish(key, future)
+        future.set_exception(error)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing the run with any in-flight call for key"""
+        while True:
+            future, leader = self.join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except CallAbandoned:
+                continue
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            # Interrupts belong to the leader's thread, not to the waiters
+            self.fail(key, future, e if isinstance(e, Exception) else CallAbandoned())
+            raise
+        self.resolve(key, future, result)
+        return result
+
+    def _finish(self, key, future: Future):
+        # Callers arriving from now on start a fresh call
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,259 @@
+"""
+Summarize the userContext sent with an advice request into the short
+"User's Financial Profile" block that is added to the prompt.
+
+Transactions, holdings and monthlyData can run to tens of thousands of
+rows, so each list is turned into a few NumPy columns once and aggregated
+with vectorized operations: income and expenses per month and category,
+portfolio totals and weights, and monthly trends. The output has a fixed
+number of lines per section and is capped at USER_CONTEXT_MAX_CHARS, so the
+prompt stays the same size no matter how much history the client sends.
+
+Both the frontend shapes (signed transaction amounts, holdings with
+quantity / avgPrice / currentValue) and the older type / value fields are
+understood.
+"""
+import os
+import re
+import time
+from collections.abc import Hashable
+import numpy as np
+
+# Upper bound on the summary length in characters
+USER_CONTEXT_MAX_CHARS = int(os.getenv("USER_CONTEXT_MAX_CHARS") or 2000)
+# Rows listed per section
+MAX_MONTHS_LISTED = 6
+MAX_CATEGORIES_LISTED = 5
+MAX_POSITIONS_LISTED = 5
+
+NON_NUMERIC_RE = re.compile(r"[^0-9.\-]")
+DMY_RE = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})")
+ISO_MONTH_RE = re.compile(r"^(\d{4})-(\d{2})")
+# Sign applied to the amount of transactions that carry the older type field
+TYPE_SIGNS = {"income": 1.0, "expense": -1.0}
+
+
+def to_float(value) -> float:
+    """Parse numbers sent as strings such as '1,250.50' or '₹1,250'; NaN if unparseable"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    if not isinstance(value, str):
+        return np.nan
+    try:
+        return float(NON_NUMERIC_RE.sub("", value))
+    except ValueError:
+        return np.nan
+
+
+def numeric_column(values) -> np.ndarray:
+    """float64 column; NaN for missing or unparseable values"""
+    try:
+        # Numbers, numeric strings and None (NaN) convert in one call
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    # Formatted strings: each distinct value is parsed once
+    ids, distinct = factorize(values)
+    return np.array([to_float(v) for v in distinct], dtype=np.float64)[ids]
+
+
+def factorize(values):
+    """Integer code per value and the distinct values in first-seen order"""
+    codes = {}
+    try:
+        return np.array([codes.setdefault(v, len(codes)) for v in values], dtype=np.int64), list(codes)
+    except TypeError:
+        pass
+    # Unhashable values (e.g. serialized Firestore timestamps) are keyed by their repr
+    codes, distinct, ids = {}, [], []
+    for v in values:
+        key = v if isinstance(v, Hashable) else repr(v)
+        if key not in codes:
+            codes[key] = len(distinct)
+            distinct.append(v)
+        ids.append(codes[key])
+    return np.array(ids, dtype=np.int64), distinct
+
+
+def month_key(date) -> str:
+    """'YYYY-MM' for ISO dates, DD/MM/YYYY dates and Firestore timestamps, '' when unknown"""
+    if isinstance(date, dict):
+        seconds = date.get("seconds", date.get("_seconds"))
+        return time.strftime("%Y-%m", time.gmtime(seconds)) if isinstance(seconds, (int, float)) else ""
+    date = str(date or "").strip()
+    match = ISO_MONTH_RE.match(date)
+    if match:
+        return f"{match.group(1)}-{match.group(2)}"
+    match = DMY_RE.match(date)
+    if match:
+        return f"{match.group(3)}-{int(match.group(2)):02d}"
+    return ""
+
+
+def month_ids(dates):
+    """
+    Month index per date (-1 when unknown) and the sorted 'YYYY-MM' labels.
+    Each distinct date string is parsed once.
+    """
+    date_ids, distinct_dates = factorize(dates)
+    months = [month_key(d) for d in distinct_dates]
+    labels = sorted(set(months) - {""})
+    position = {label: i for i, label in enumerate(labels)}
+    lookup = np.array([position.get(m, -1) for m in months], dtype=np.int64)
+    return lookup[date_ids], labels
+
+
+def nan_mean(values: np.ndarray) -> float:
+    """Mean of the known values, 0 when there are none"""
+    known = values[~np.isnan(values)]
+    return float(known.mean()) if len(known) else 0.0
+
+
+def money(value: float) -> str:
+    return f"-${-value:,.2f}" if value < 0 else f"${value:,.2f}"
+
+
+def summarize_transactions(transactions) -> list:
+    rows = [t for t in transactions if isinstance(t, dict)]
+    if not rows:
+        return []
+    amounts = numeric_column([t.get("amount") for t in rows])
+    # Older clients send positive amounts with type income/expense
+    type_ids, types = factorize([t.get("type") for t in rows])
+    if types != [None]:
+        signs = np.array([TYPE_SIGNS.get(kind, 0.0) for kind in types])[type_ids]
+        amounts = np.where(signs != 0, signs * np.abs(amounts), amounts)
+    valid = ~np.isnan(amounts)
+    amounts = np.where(valid, amounts, 0.0)
+    income = np.where(amounts > 0, amounts, 0.0)
+    expenses = np.where(amounts < 0, -amounts, 0.0)
+
+    lines = [
+        f"- Recent Income: {money(income.sum())}",
+        f"- Recent Expenses: {money(expenses.sum())}",
+        f"- Net Cash Flow: {money(amounts.sum())} over {int(valid.sum())} transactions",
+    ]
+
+    months, labels = month_ids([t.get("date") for t in rows])
+    known = months >= 0
+    if known.any():
+        month_income = np.bincount(months[known], weights=income[known], minlength=len(labels))
+        month_expenses = np.bincount(months[known], weights=expenses[known], minlength=len(labels))
+        listed = [
+            f"{label}: in {money(month_income[i])}, out {money(month_expenses[i])}"
+            for i, label in list(enumerate(labels))[-MAX_MONTHS_LISTED:]
+        ]
+        lines.append(f"- Average Monthly Spending: {money(month_expenses.mean())} across {len(labels)} months")
+        lines.append(f"- Recent Months: {'; '.join(listed)}")
+
+    categories, labels = factorize([t.get("category") or "" for t in rows])
+    totals = np.bincount(categories, weights=expenses, minlength=len(labels))
+    if "" in labels:
+        totals[labels.index("")] = 0
+    top = [i for i in np.argsort(totals)[::-1][:MAX_CATEGORIES_LISTED] if totals[i] > 0]
+    if top:
+        listed = [f"{labels[i]} {money(totals[i])} ({totals[i] / expenses.sum():.0%})" for i in top]
+        lines.append(f"- Top Expense Categories: {', '.join(listed)}")
+    return lines
+
+
+def summarize_holdings(holdings) -> list:
+    rows = [h for h in holdings if isinstance(h, dict)]
+    if not rows:
+        return []
+    # Frontend rows carry currentValue; older clients sent value
+    values = numeric_column([h.get("currentValue", h.get("value")) for h in rows])
+    values = np.where(np.isnan(values), 0.0, values)
+    quantities = numeric_column([h.get("quantity") for h in rows])
+    avg_prices = numeric_column([h.get("avgPrice") for h in rows])
+    cost = quantities * avg_prices
+
+    total = values.sum()
+    lines = [
+        f"- Total Investment Holdings: {money(total)}",
+        f"- Number of Holdings: {len(rows)}",
+    ]
+    has_cost = ~np.isnan(cost)
+    if has_cost.any():
+        invested = cost[has_cost].sum()
+        gain = values[has_cost].sum() - invested
+        gain_pct = f" ({gain / invested:+.1%})" if invested else ""
+        lines.append(f"- Invested Amount: {money(invested)}, Unrealized Gain: {money(gain)}{gain_pct}")
+    if total > 0:
+        weights = values / total
+        top = np.argsort(values)[::-1][:MAX_POSITIONS_LISTED]
+        names = [str(rows[i].get("name") or rows[i].get("symbol") or f"Holding {i + 1}") for i in top]
+        listed = [f"{name} {weights[i]:.1%}" for name, i in zip(names, top)]
+        lines.append(f"- Largest Positions: {', '.join(listed)}")
+        # Herfindahl index: 1/n for an evenly spread portfolio, 1.0 for a single position
+        lines.append(f"- Concentration: top holding {weights.max():.1%}, HHI {np.square(weights).sum():.2f}")
+    return lines
+
+
+def summarize_monthly_data(monthly_data) -> list:
+    rows = [m for m in monthly_data if isinstance(m, dict)]
+    if not rows:
+        return []
+    rows.sort(key=lambda m: str(m.get("month", "")))
+    income = numeric_column([m.get("income") for m in rows])
+    expenses = numeric_column([m.get("expenses") for m in rows])
+    savings = numeric_column([m.get("savings") for m in rows])
+    # Savings is income minus expenses when the client did not send it
+    savings = np.where(np.isnan(savings), income - expenses, savings)
+
+    lines = [
+        f"- Monthly Averages ({len(rows)} months): income {money(nan_mean(income))}, "
+        f"expenses {money(nan_mean(expenses))}, savings {money(nan_mean(savings))}"
+    ]
+    total_income = np.nansum(income)
+    if total_income > 0:
+        lines.append(f"- Savings Rate: {np.nansum(savings) / total_income:.1%}")
+    known = ~np.isnan(savings)
+    if known.sum() >= 2:
+        # Least-squares slope of savings per month
+        slope = np.polyfit(np.arange(len(rows))[known], savings[known], 1)[0]
+        direction = "rising" if slope > 0 else "falling" if slope < 0 else "flat"
+        lines.append(f"- Savings Trend: {direction} by {money(abs(slope))} per month")
+    return lines
+
+
+def summarize_user_context(user_context, max_chars: int = USER_CONTEXT_MAX_CHARS) -> str:
+    """Prepare user financial data summary for the AI"""
+    if not user_context or not isinstance(user_context, dict):
+        return ""
+    user_profile = user_context.get("userProfile") or {}
+    detailed_profile = user_context.get("detailedProfile") or {}
+
+    lines = []
+    # Basic profile info
+    if user_profile:
+        lines.append(f"- Age: {user_profile.get('age', 'Not specified')}")
+        lines.append(f"- Income: ${user_profile.get('income', 'Not specified')}")
+        lines.append(f"- Occupation: {user_profile.get('occupation', 'Not specified')}")
+
+    # Detailed profile info
+    if detailed_profile:
+        lines.append(f"- Employment Status: {detailed_profile.get('employmentStatus', 'Not specified')}")
+        lines.append(f"- Financial Goals: {detailed_profile.get('financialGoals', 'Not specified')}")
+        lines.append(f"- Risk Tolerance: {detailed_profile.get('riskTolerance', 'Not specified')}")
+        lines.append(f"- Investment Experience: {detailed_profile.get('investmentExperience', 'Not specified')}")
+        for key, label in (("currentDebt", "Current Debt"), ("emergencyFund", "Emergency Fund"),
+                           ("retirementSavings", "Retirement Savings")):
+            if detailed_profile.get(key):
+                lines.append(f"- {label}: ${detailed_profile.get(key)}")
+
+    lines += summarize_transactions(user_context.get("transactions") or [])
+    lines += summarize_holdings(user_context.get("holdings") or [])
+    lines += summarize_monthly_data(user_context.get("monthlyData") or [])
+    if not lines:
+        return ""
+
+    # Keep whole lines within the budget
+    summary = "\n\nUser's Financial Profile:\n"
+    for line in lines:
+        if len(summary) + len(line) + 1 > max_chars:
+            break
+        summary += line + "\n"
+    return summary
@@ -1,22 +1,35 @@
 """
-Create a LangGraph agent workflow with two nodes:
+Create a LangGraph agent workflow with four nodes:
 1. 'planner' node using planner_node from planner_agent
 2. 'tool_use' node using tool_use_node from tool_use_agent
+3. 'calculator' node using calculator_node from calculator_agent
+4. 'simulation' node using simulation_node from simulation_agent
 
 The state is managed with a custom AgentState class that holds messages.
 
 Flow logic:
 - Start at 'planner'
 - If planner response includes "final answer", end the graph
+- Numeric questions (EMI, ROI, projections, goals, portfolio) go to 'calculator'
+- Retirement and goal probability questions go to 'simulation'
 - Else go to 'tool_use'
-- After 'tool_use', return to 'planner'
+- The graph ends after 'tool_use', 'calculator' or 'simulation'; a calculator
+  or simulation that cannot answer falls back to the tool_use answer itself
 
 Use langgraph.graph.StateGraph to compile and return the graph.
 """
 
+import time
 from langgraph.graph import StateGraph
-from agents.planner_agent import run_planner
+from agents.planner_agent import CALCULATOR_ACTIONS, SIMULATION_ACTIONS, run_planner
+from agents.calculator_agent import run_calculator
+from agents.simulation_agent import run_simulation
 from agents.tool_use_agent import run_tool_use
+from answer_cache import get_answer_cache, normalize_question, profile_fingerprint
+from user_context import summarize_user_context
+from tools.llm_client import get_llm
+from tools.singleflight import CallAbandoned, SingleFlight
+from metrics import increment, observe, span, timed
 
 class AgentState:
     def __init__(self, messages=None):
@@ -29,79 +42,31 @@ class AgentState:
     def from_dict(cls, d):
         return cls(messages=d.get("messages", []))
 
+@timed("planner")
 def planner_node(state: dict) -> dict:
-    result = run_planner(state)
-    # The planner decides to use tools for better answers
-    result["next"] = "tool_use"
+    # Each node's output replaces the graph state, so carry the request
+    # fields (e.g. userContext) forward for the next node; the API strips
+    # them from the steps it returns
+    result = dict(state, **run_planner(state))
+    # Calculations are answered exactly and projections by simulation;
+    # everything else uses tools for better answers
+    if result.get("next_step") in CALCULATOR_ACTIONS:
+        result["next"] = "calculator"
+    elif result.get("next_step") in SIMULATION_ACTIONS:
+        result["next"] = "simulation"
+    else:
+        result["next"] = "tool_use"
     return result
 
 
-def tool_use_node(state: dict) -> dict:
-    # Get context from RAG tool
-    tool_result = run_tool_use(state)
-    
-    # Combine planner's analysis with RAG context
-    question = state.get("question", "")
-    rag_context = tool_result.get("context", "")
-    user_context = state.get("userContext", {})
-    
-    # Import AI model to generate proper response
-    import os
-    import google.generativeai as genai
-    
-    # Configure Google AI
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    
-    # Prepare user financial data summary for the AI
-    user_data_summary = ""
-    if user_context and isinstance(user_context, dict):
-        user_profile = user_context.get("userProfile", {})
-        detailed_profile = user_context.get("detailedProfile", {})
-        transactions = user_context.get("transactions", [])
-        holdings = user_context.get("holdings", [])
-        monthly_data = user_context.get("monthlyData", [])
-        
-        if user_profile or detailed_profile:
-            user_data_summary = "\n\nUser's Financial Profile:\n"
-            
-            # Basic profile info
-            if user_profile:
-                user_data_summary += f"- Age: {user_profile.get('age', 'Not specified')}\n"
-                user_data_summary += f"- Income: ${user_profile.get('income', 'Not specified')}\n"
-                user_data_summary += f"- Occupation: {user_profile.get('occupation', 'Not specified')}\n"
-            
-            # Detailed profile info
-            if detailed_profile:
-                user_data_summary += f"- Employment Status: {detailed_profile.get('employmentStatus', 'Not specified')}\n"
-                user_data_summary += f"- Financial Goals: {detailed_profile.get('financialGoals', 'Not specified')}\n"
-                user_data_summary += f"- Risk Tolerance: {detailed_profile.get('riskTolerance', 'Not specified')}\n"
-                user_data_summary += f"- Investment Experience: {detailed_profile.get('investmentExperience', 'Not specified')}\n"
-                
-                if detailed_profile.get('currentDebt'):
-                    user_data_summary += f"- Current Debt: ${detailed_profile.get('currentDebt')}\n"
-                if detailed_profile.get('emergencyFund'):
-                    user_data_summary += f"- Emergency Fund: ${detailed_profile.get('emergencyFund')}\n"
-                if detailed_profile.get('retirementSavings'):
-                    user_data_summary += f"- Retirement Savings: ${detailed_profile.get('retirementSavings')}\n"
-            
-            # Transaction summary
-            if transactions and len(transactions) > 0:
-                total_income = sum(t.get('amount', 0) for t in transactions if t.get('type') == 'income')
-                total_expenses = sum(t.get('amount', 0) for t in transactions if t.get('type') == 'expense')
-                user_data_summary += f"- Recent Income: ${total_income}\n"
-                user_data_summary += f"- Recent Expenses: ${total_expenses}\n"
-            
-            # Holdings summary
-            if holdings and len(holdings) > 0:
-                total_value = sum(h.get('value', 0) for h in holdings)
-                user_data_summary += f"- Total Investment Holdings: ${total_value}\n"
-                user_data_summary += f"- Number of Holdings: {len(holdings)}\n"
-    
-    # Generate enhanced response using RAG context
-    if rag_context and len(rag_context) > 100:
-        # Create a prompt for the AI to analyze the content and provide a user-friendly response
-        prompt = f"""You are a helpful financial advisor AI. A user has asked: "{question}"
+def has_enough_context(rag_context: str) -> bool:
+    """Only ask the AI for an answer when retrieval found substantial content"""
+    return bool(rag_context) and len(rag_context) > 100
+
+
+def build_prompt(question: str, rag_context: str, user_data_summary: str) -> str:
+    """Create a prompt for the AI to analyze the content and provide a user-friendly response"""
+    return f"""You are a helpful financial advisor AI. A user has asked: "{question}"
 
 I've found the following relevant financial information from reliable sources:
 {rag_context}{user_data_summary}
@@ -117,15 +82,11 @@ Please provide a clear, helpful, and user-friendly response to the user's questi
 
 Do not include source URLs, scraped dates, or technical metadata in your response. Focus on being helpful and educational."""
 
-        try:
-            # Generate response using AI
-            ai_response = model.generate_content(prompt)
-            response = ai_response.text if ai_response.text else "I apologize, but I couldn't generate a proper response at this time. Please try rephrasing your question."
-        except Exception as e:
-            print(f"Error generating AI response: {e}")
-            # Fallback to a structured response based on question type
-            if "investment" in question.lower() or "invest" in question.lower():
-                response = """Here are some excellent investment strategies for beginners:
+
+def generation_error_response(question: str) -> str:
+    """Fallback to a structured response based on question type"""
+    if "investment" in question.lower() or "invest" in question.lower():
+        return """Here are some excellent investment strategies for beginners:
 
 **1. Start with Index Funds**
 - Low fees and instant diversification
@@ -153,28 +114,227 @@ Do not include source URLs, scraped dates, or technical metadata in your respons
 - Provides financial security before investing
 
 Remember: start early, stay consistent, and focus on low-cost, diversified options. Time in the market beats timing the market!"""
-            else:
-                response = f"For your question about '{question}', I recommend starting with the fundamentals of personal finance. Consider building an emergency fund, paying off high-interest debt, and then exploring investment options that match your risk tolerance and time horizon."
-    else:
-        # Fallback response when no context is available
-        if "planning" in question.lower():
-            response = "Financial planning involves setting goals, creating budgets, managing investments, and preparing for retirement. It's essential to assess your current financial situation, define objectives, and develop strategies to achieve them."
-        elif "investment" in question.lower():
-            response = "Investment strategies should align with your risk tolerance and time horizon. Consider diversifying across asset classes, regularly reviewing your portfolio, and consulting with financial advisors for personalized advice."
-        elif "retirement" in question.lower():
-            response = "Retirement planning requires starting early, maximizing employer contributions, considering tax-advantaged accounts like 401(k) and IRA, and calculating how much you'll need based on your desired lifestyle."
-        else:
-            response = f"For your question about '{question}', I recommend consulting with a financial advisor to get personalized advice based on your specific financial situation and goals."
-    
+    return f"For your question about '{question}', I recommend starting with the fundamentals of personal finance. Consider building an emergency fund, paying off high-interest debt, and then exploring investment options that match your risk tolerance and time horizon."
+
+
+def no_context_response(question: str) -> str:
+    """Fallback response when no context is available"""
+    if "planning" in question.lower():
+        return "Financial planning involves setting goals, creating budgets, managing investments, and preparing for retirement. It's essential to assess your current financial situation, define objectives, and develop strategies to achieve them."
+    elif "investment" in question.lower():
+        return "Investment strategies should align with your risk tolerance and time horizon. Consider diversifying across asset classes, regularly reviewing your portfolio, and consulting with financial advisors for personalized advice."
+    elif "retirement" in question.lower():
+        return "Retirement planning requires starting early, maximizing employer contributions, considering tax-advantaged accounts like 401(k) and IRA, and calculating how much you'll need based on your desired lifestyle."
+    return f"For your question about '{question}', I recommend consulting with a financial advisor to get personalized advice based on your specific financial situation and goals."
+
+
+def generate_response(question: str, rag_context: str, user_data_summary: str):
+    """
+    Generate enhanced response using RAG context.
+    Returns (response, from_model); from_model is False for fallback answers.
+    """
+    if not has_enough_context(rag_context):
+        increment("no_context_fallback")
+        return no_context_response(question), False
+
+    prompt = build_prompt(question, rag_context, user_data_summary)
+    try:
+        # Generate response using AI
+        with span("llm_generate"):
+            text = get_llm().generate(prompt)
+        if text:
+            return text, True
+        increment("llm_empty_response")
+        return "I apologize, but I couldn't generate a proper response at this time. Please try rephrasing your question.", False
+    except Exception as e:
+        print(f"Error generating AI response: {e}")
+        increment("llm_errors")
+        return generation_error_response(question), False
+
+
+def stream_response(question: str, rag_context: str, user_data_summary: str):
+    """
+    Same as generate_response, but yields (text, from_model) pieces as
+    Gemini generates the answer. Fallback answers are yielded as a single piece.
+    """
+    if not has_enough_context(rag_context):
+        increment("no_context_fallback")
+        yield no_context_response(question), False
+        return
+
+    prompt = build_prompt(question, rag_context, user_data_summary)
+    emitted = False
+    start = time.perf_counter()
+    try:
+        for text in get_llm().stream(prompt):
+            if text:
+                if not emitted:
+                    observe("llm_first_token", time.perf_counter() - start)
+                emitted = True
+                yield text, True
+        observe("llm_stream", time.perf_counter() - start)
+    except Exception as e:
+        print(f"Error streaming AI response: {e}")
+        increment("llm_errors")
+        # Only fall back if the user has not already seen part of an answer
+        if not emitted:
+            yield generation_error_response(question), False
+            return
+        # A truncated answer must not be cached
+        yield "", False
+    if not emitted:
+        increment("llm_empty_response")
+        yield "I apologize, but I couldn't generate a proper response at this time. Please try rephrasing your question.", False
+
+
+# Concurrent requests for the same question and profile share one retrieval + generation
+_answers_in_flight = SingleFlight("answer")
+
+
+def prepare_answer(state: dict) -> dict:
+    """The question, profile summary and fingerprint for state, and a recent answer to reuse if any"""
+    question = state.get("question", "")
+    user_data_summary = summarize_user_context(state.get("userContext", {}))
+    fingerprint = profile_fingerprint(user_data_summary)
     return {
         "question": question,
-        "context": rag_context,
-        "result": response,
-        "response": response,
-        "final": True
+        "summary": user_data_summary,
+        "fingerprint": fingerprint,
+        "key": (normalize_question(question), fingerprint),
+        "cached": get_answer_cache().get(question, fingerprint),
     }
 
 
+def finish_answer(question: str, fingerprint: str, rag_context: str, response: str, from_model: bool) -> dict:
+    """Build the answer, caching it when it came from the model"""
+    answer = {"context": rag_context, "result": response, "response": response}
+    if from_model:
+        get_answer_cache().put(question, fingerprint, answer)
+    return answer
+
+
+def answer_payload(question: str, answer: dict, cached: bool = False) -> dict:
+    """The tool_use node's output for an answer"""
+    payload = dict(answer, question=question, final=True)
+    if cached:
+        payload["cached"] = True
+    return payload
+
+
+def answer_question(state: dict, user_data_summary: str, fingerprint: str) -> dict:
+    """Retrieve context and generate the answer"""
+    question = state.get("question", "")
+    # Get context from RAG tool
+    rag_context = run_tool_use(state).get("context", "")
+    response, from_model = generate_response(question, rag_context, user_data_summary)
+    return finish_answer(question, fingerprint, rag_context, response, from_model)
+
+
+@timed("tool_use")
+def tool_use_node(state: dict) -> dict:
+    prepared = prepare_answer(state)
+    # Reuse a recent answer to the same question for the same profile
+    if prepared["cached"] is not None:
+        return answer_payload(prepared["question"], prepared["cached"], cached=True)
+
+    answer = _answers_in_flight.do(prepared["key"], answer_question, state,
+                                   prepared["summary"], prepared["fingerprint"])
+    return answer_payload(prepared["question"], answer)
+
+
+# Nodes that answer without retrieval, and the function that produces their answer
+DIRECT_ANSWERS = {"calculator": run_calculator, "simulation": run_simulation}
+
+
+def direct_answer(node: str, state: dict):
+    """The calculator or simulation answer for state, or None when that node cannot answer it"""
+    try:
+        return DIRECT_ANSWERS[node](state)
+    except Exception as e:
+        # Inputs the calculators cannot use, or nothing to project, still get
+        # an answer from retrieval + LLM
+        print(f"{node.capitalize()} failed for '{state.get('question', '')}': {e}")
+        increment(f"{node}_fallback")
+        return None
+
+
+@timed("calculator")
+def calculator_node(state: dict) -> dict:
+    return direct_answer("calculator", state) or tool_use_node(state)
+
+
+@timed("simulation")
+def simulation_node(state: dict) -> dict:
+    return direct_answer("simulation", state) or tool_use_node(state)
+
+
+def stream_answer(state: dict, prepared: dict):
+    """
+    The streaming counterpart of answer_question for the request leading
+    this question's flight: yields the 'retrieval' and 'token' events and
+    returns the finished answer.
+    """
+    question = prepared["question"]
+    rag_context = run_tool_use(state).get("context", "")
+    yield "retrieval", {"question": question, "context": rag_context}
+
+    pieces = []
+    from_model = True
+    for text, piece_from_model in stream_response(question, rag_context, prepared["summary"]):
+        from_model = from_model and piece_from_model
+        if text:
+            pieces.append(text)
+            yield "token", {"text": text}
+    return finish_answer(question, prepared["fingerprint"], rag_context, "".join(pieces), from_model)
+
+
+def stream_advice(state: dict):
+    """
+    Run the workflow step by step and yield (event, data) pairs as each
+    step finishes: 'planner', 'retrieval', one 'token' per generated piece
+    of the answer, and finally 'tool_use' with the same payload the graph
+    produces for that node. Calculations and simulations yield their answer
+    as one 'token' and then 'calculator' or 'simulation' instead. Cached
+    answers, and answers shared with an identical request already in
+    flight, arrive as one 'token'.
+    """
+    planner_result = planner_node(state)
+    yield "planner", planner_result
+    next_node = should_continue(planner_result)
+    if next_node in DIRECT_ANSWERS:
+        with span(next_node):
+            result = direct_answer(next_node, planner_result)
+        if result is not None:
+            yield "token", {"text": result["response"]}
+            yield next_node, result
+            return
+    elif next_node != "tool_use":
+        return
+
+    prepared = prepare_answer(state)
+    question = prepared["question"]
+    answer, cached = prepared["cached"], True
+    while answer is None:
+        future, leader = _answers_in_flight.join(prepared["key"])
+        if leader:
+            try:
+                answer = yield from stream_answer(state, prepared)
+            except BaseException as e:
+                _answers_in_flight.fail(prepared["key"], future, e if isinstance(e, Exception) else CallAbandoned())
+                raise
+            _answers_in_flight.resolve(prepared["key"], future, answer)
+            yield "tool_use", answer_payload(question, answer)
+            return
+        try:
+            answer, cached = future.result(), False
+        except CallAbandoned:
+            continue
+
+    yield "retrieval", {"question": question, "context": answer["context"], "cached": cached}
+    yield "token", {"text": answer["result"]}
+    yield "tool_use", answer_payload(question, answer, cached)
+
+
 def should_continue(state: dict) -> str:
     """Determine next step in the workflow"""
     if state.get("final"):
@@ -188,6 +348,8 @@ def get_workflow_graph():
     # Add nodes
     graph.add_node("planner", planner_node)
     graph.add_node("tool_use", tool_use_node)
+    graph.add_node("calculator", calculator_node)
+    graph.add_node("simulation", simulation_node)
     
     # Set entry point
     graph.set_entry_point("planner")
@@ -198,11 +360,15 @@ def get_workflow_graph():
         should_continue,
         {
             "tool_use": "tool_use",
+            "calculator": "calculator",
+            "simulation": "simulation",
             "end": "__end__"
         }
     )
     
     # Tool use always ends
     graph.add_edge("tool_use", "__end__")
+    graph.add_edge("calculator", "__end__")
+    graph.add_edge("simulation", "__end__")
     
     return graph.compile()
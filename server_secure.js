@@ -87,7 +87,8 @@ app.post('/api/advisor', async (req, res) => {
     
     // Extract the final result from the LangGraph workflow - Python backend now handles proper formatting
     const data_final = data.final || {};
-    const tool_use = data_final.tool_use || {};
+    // Calculations and simulations are answered by their own nodes instead of tool_use
+    const tool_use = data_final.tool_use || data_final.calculator || data_final.simulation || {};
     
     // Get the AI-generated response directly from the Python backend
     const result = tool_use.response || tool_use.result || 